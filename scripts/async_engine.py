@@ -0,0 +1,186 @@
+"""
+Interfaz asíncrona del motor matemático de MathMaster
+Ejecuta la generación y la calificación en un pool de hilos o de procesos para no bloquear el bucle de eventos
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional, Union
+
+from math_engine import MathEngine
+
+class EngineBusyError(RuntimeError):
+    """Se superó el máximo de llamadas pendientes: la petición se rechaza en lugar de encolarla"""
+
+# Motor de cada proceso del pool (modo 'process'), creado por _init_worker
+_WORKER_ENGINE: Optional[MathEngine] = None
+
+def _init_worker(engine_kwargs: Dict[str, Any]):
+    """Construye el motor del proceso con los mismos parámetros que el del proceso principal"""
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = MathEngine(**engine_kwargs)
+
+def _call_in_worker(method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """Ejecuta un método del motor del proceso y devuelve un resultado serializable"""
+    result = getattr(_WORKER_ENGINE, method)(*args, **kwargs)
+    return result.to_dicts() if method == 'check_batch' else result
+
+def _check_batch_rows(engine: MathEngine, topic: str, submissions: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """check_batch con los resultados ya construidos, como en el modo 'process'"""
+    return engine.check_batch(topic, submissions).to_dicts()
+
+# Marca para distinguir "sin argumento" de timeout=None (sin límite)
+_DEFAULT = object()
+
+class AsyncMathEngine:
+    """Envoltorio asíncrono de MathEngine
+    
+    Cada llamada se ejecuta en un pool: con executor='thread' (por defecto) los hilos comparten
+    un único MathEngine, que es seguro entre hilos; con executor='process' cada proceso construye
+    su propio motor, lo que exige el modo sin estado (stateless=True) para que cualquier proceso
+    pueda calificar los ejercicios que generó otro. También se acepta un Executor de hilos propio.
+    
+    max_concurrency limita las llamadas en ejecución a la vez y max_pending las que pueden estar
+    esperando o en ejecución; por encima de ese límite la llamada falla con EngineBusyError.
+    timeout (por llamada o por defecto) corta la espera con asyncio.TimeoutError; el trabajo ya
+    iniciado no puede interrumpirse y su plaza no se libera hasta que termina.
+    """
+    
+    def __init__(self, executor: Union[str, Executor] = 'thread', max_workers: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, max_pending: Optional[int] = None,
+                 timeout: Optional[float] = None, engine: Optional[MathEngine] = None, **engine_kwargs):
+        self._owns_executor = not isinstance(executor, Executor)
+        if executor == 'process':
+            if engine is not None:
+                raise ValueError("El modo 'process' construye su propio motor en cada proceso: no admite engine")
+            if not engine_kwargs.get('stateless'):
+                raise ValueError("El modo 'process' requiere stateless=True: el almacén de ejercicios no se comparte entre procesos")
+            if engine_kwargs.get('seed') is not None or engine_kwargs.get('rng') is not None:
+                raise ValueError("El modo 'process' no admite seed ni rng: todos los procesos repetirían la misma secuencia")
+        elif executor != 'thread' and self._owns_executor:
+            raise ValueError("executor debe ser 'thread', 'process' o un Executor de hilos")
+        
+        self.engine = engine if engine is not None else MathEngine(**engine_kwargs)
+        self._processes = executor == 'process'
+        if executor == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='mathmaster')
+        elif executor == 'process':
+            self._executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(engine_kwargs,))
+        else:
+            self._executor = executor
+        
+        self.max_concurrency = max_concurrency or max_workers or getattr(self._executor, '_max_workers', 1)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+    
+    async def _run(self, method: str, *args, timeout: Any = _DEFAULT, **kwargs) -> Any:
+        """Ejecuta engine.method en el pool respetando los límites de concurrencia y el timeout"""
+        if self.max_pending is not None and self._pending >= self.max_pending:
+            self.rejected += 1
+            raise EngineBusyError(f"Demasiadas llamadas pendientes ({self._pending})")
+        
+        self._pending += 1
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self._pending -= 1
+            raise
+        
+        self._running += 1
+        loop = asyncio.get_running_loop()
+        if self._processes:
+            future = loop.run_in_executor(self._executor, _call_in_worker, method, args, kwargs)
+        elif method == 'check_batch':
+            future = loop.run_in_executor(self._executor, _check_batch_rows, self.engine, *args)
+        else:
+            call = functools.partial(getattr(self.engine, method), *args, **kwargs)
+            future = loop.run_in_executor(self._executor, call)
+        # La plaza se libera cuando el trabajo termina de verdad, no cuando el llamante deja de esperar
+        future.add_done_callback(self._release)
+        
+        timeout = self.timeout if timeout is _DEFAULT else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+    
+    def _release(self, future: asyncio.Future):
+        self._running -= 1
+        self._pending -= 1
+        self.completed += 1
+        self._slots.release()
+        if not future.cancelled():
+            # Consume la excepción de un trabajo cuyo llamante ya no espera (timeout o cancelación)
+            future.exception()
+    
+    async def generate_exercise(self, topic: str, difficulty: int = 1, locale: Optional[str] = None,
+                                timeout: Any = _DEFAULT) -> Dict[str, Any]:
+        """Genera un ejercicio para el tema especificado (ver MathEngine.generate_exercise)"""
+        return await self._run('generate_exercise', topic, difficulty, locale, timeout=timeout)
+    
+    async def generate_batch(self, topic: str, difficulty: int = 1, n: int = 1,
+                             weights: Optional[Dict[str, float]] = None, seed: Optional[int] = None,
+                             locale: Optional[str] = None, timeout: Any = _DEFAULT) -> List[Dict[str, Any]]:
+        """Genera n ejercicios del tema en una sola llamada (ver MathEngine.generate_batch)"""
+        return await self._run('generate_batch', topic, difficulty, n, weights, seed, locale, timeout=timeout)
+    
+    async def check_answer(self, topic: str, exercise_id: str, user_answer: Any,
+                           locale: Optional[str] = None, timeout: Any = _DEFAULT) -> Dict[str, Any]:
+        """Verifica la respuesta del usuario (ver MathEngine.check_answer)"""
+        return await self._run('check_answer', topic, exercise_id, user_answer, locale, timeout=timeout)
+    
+    async def check_batch(self, topic: str, submissions: List[Tuple[str, Any]],
+                          timeout: Any = _DEFAULT) -> List[Dict[str, Any]]:
+        """Califica en bloque pares (exercise_id, respuesta)
+        
+        Devuelve los resultados ya construidos (BatchGradeResult.to_dicts()), de modo que la
+        retroalimentación también se genera fuera del bucle de eventos.
+        """
+        return await self._run('check_batch', topic, submissions, timeout=timeout)
+    
+    async def get_exercise(self, topic: str, exercise_id: str, locale: Optional[str] = None,
+                           timeout: Any = _DEFAULT) -> Dict[str, Any]:
+        """Devuelve un ejercicio ya generado (ver MathEngine.get_exercise)"""
+        return await self._run('get_exercise', topic, exercise_id, locale, timeout=timeout)
+    
+    async def replay_exercise(self, topic: str, difficulty: int, index: int, locale: Optional[str] = None,
+                              timeout: Any = _DEFAULT) -> Dict[str, Any]:
+        """Regenera el ejercicio número index de una sesión con semilla (ver MathEngine.replay_exercise)"""
+        return await self._run('replay_exercise', topic, difficulty, index, locale, timeout=timeout)
+    
+    def exercise_types(self, topic: str) -> List[Dict[str, Any]]:
+        """Tipos de ejercicio registrados en el tema (consulta inmediata, sin pasar por el pool)"""
+        return self.engine.exercise_types(topic)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Llamadas en espera y en ejecución, completadas, rechazadas y que superaron el timeout"""
+        return {
+            'pending': self._pending,
+            'running': self._running,
+            'max_concurrency': self.max_concurrency,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+    
+    def close(self, wait: bool = True):
+        """Cierra el pool propio (un Executor recibido lo cierra quien lo creó) y el motor (reserva y almacén)"""
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self.engine.close()
+    
+    async def __aenter__(self) -> 'AsyncMathEngine':
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        # Esperar a los trabajos en curso sin bloquear el bucle
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
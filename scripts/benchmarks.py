@@ -0,0 +1,939 @@
+"""
+Microbenchmarks para el motor matemático de MathMaster
+Uso: python scripts/benchmarks.py {ids,batch,grade,pool,memory,render,fractions,expressions,tables,threads,async,bulk,export,store,suite,metrics,profile,memo,startup} [-n N] [--save RESULTADOS.json] [--compare BASE.json]
+"""
+
+import argparse
+import asyncio
+import functools
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from fractions import Fraction
+from typing import Dict, List, Tuple, Any, Callable
+
+from async_engine import AsyncMathEngine
+from bulk_generate import generate_bank
+from math_engine import AnswerTables, EngineProfiler, ExerciseIdAllocator, ExerciseStore, MathEngine, SQLiteExerciseStore, optional_backend
+from math_engine import _frac_add, _frac_div, _frac_mul, _frac_normalize, _frac_sub, _parse_fraction
+from math_engine import _canonical_expression, _expected_expression, _expressions_equivalent, _sympy_equivalent
+
+def _measure(fn: Callable[[], Any], n: int) -> Dict[str, float]:
+    """Ejecuta fn n veces y devuelve el tiempo total y las operaciones por segundo"""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'ops_per_sec': n / elapsed if elapsed else float('inf')}
+
+def bench_ids(n: int = 1000000) -> Dict[str, Any]:
+    """Compara el asignador de ids con el esquema anterior basado en randint"""
+    allocator = ExerciseIdAllocator()
+    next_id = allocator.next_id
+    
+    results = {
+        'allocator': _measure(lambda: next_id('cn'), n),
+        'legacy_randint': _measure(lambda: f"cn_{random.randint(1000, 9999)}", n)
+    }
+    
+    # Colisiones: ids repetidos dentro de la muestra generada
+    sample = min(n, 100000)
+    new_ids = [next_id('cn') for _ in range(sample)]
+    legacy_ids = [f"cn_{random.randint(1000, 9999)}" for _ in range(sample)]
+    results['allocator']['collisions'] = sample - len(set(new_ids))
+    results['legacy_randint']['collisions'] = sample - len(set(legacy_ids))
+    results['sample'] = sample
+    return results
+
+def bench_batch(n: int = 10000) -> Dict[str, Any]:
+    """Compara generate_batch con n llamadas a generate_exercise para cada tema"""
+    # NumPy se importa bajo demanda: cargarlo antes para no cronometrar su importación
+    optional_backend('numpy')
+    results = {}
+    for topic in MathEngine().topics:
+        single_engine = MathEngine(store_capacity=n)
+        start = time.perf_counter()
+        for _ in range(n):
+            single_engine.generate_exercise(topic, 2)
+        single = time.perf_counter() - start
+        
+        batch_engine = MathEngine(store_capacity=n)
+        start = time.perf_counter()
+        batch_engine.generate_batch(topic, 2, n)
+        batch = time.perf_counter() - start
+        
+        results[topic] = {
+            'single_ops_per_sec': n / single,
+            'batch_ops_per_sec': n / batch,
+            'speedup': single / batch
+        }
+    return results
+
+def bench_grade(n: int = 10000) -> Dict[str, Any]:
+    """Compara check_batch con n llamadas a check_answer para cada tema"""
+    optional_backend('numpy')
+    results = {}
+    engine = MathEngine(store_capacity=n * len(MathEngine().topics))
+    for topic in engine.topics:
+        exercises = engine.generate_batch(topic, 2, n)
+        submissions = [(exercise['id'], exercise['correct_answer'])
+                       for exercise in exercises if 'correct_answer' in exercise]
+        
+        start = time.perf_counter()
+        for exercise_id, answer in submissions:
+            engine.check_answer(topic, exercise_id, answer)
+        single = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        engine.check_batch(topic, submissions)
+        batch = time.perf_counter() - start
+        
+        results[topic] = {
+            'single_ops_per_sec': len(submissions) / single,
+            'batch_ops_per_sec': len(submissions) / batch,
+            'speedup': single / batch
+        }
+    return results
+
+def bench_pool(n: int = 10000) -> Dict[str, Any]:
+    """Compara servir n ejercicios desde una reserva precalentada con generarlos en la petición"""
+    results = {}
+    for topic in MathEngine().topics:
+        inline_engine = MathEngine(store_capacity=n)
+        inline = _measure(lambda: inline_engine.generate_exercise(topic, 2), n)
+        
+        pooled_engine = MathEngine(store_capacity=n, pool_size=n)
+        pooled_engine.pool.warm(topic, 2)
+        pooled = _measure(lambda: pooled_engine.generate_exercise(topic, 2), n)
+        pooled_engine.pool.close()
+        
+        results[topic] = {
+            'inline_ops_per_sec': inline['ops_per_sec'],
+            'pooled_ops_per_sec': pooled['ops_per_sec'],
+            'speedup': inline['seconds'] / pooled['seconds'],
+            'hits': pooled_engine.pool_metrics()['hits']
+        }
+    return results
+
+def _traced_bytes(fn: Callable[[], Any]) -> int:
+    """Memoria que sigue reservada después de ejecutar fn (el resultado de fn se descarta)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        keep = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del keep
+    return after - before
+
+def bench_memory(n: int = 50000) -> Dict[str, Any]:
+    """Bytes por ejercicio guardado: diccionarios completos frente a registros compactos"""
+    results = {}
+    for topic in MathEngine().topics:
+        dict_engine = MathEngine(store_capacity=n)
+        
+        def store_dicts():
+            # Esquema anterior: el almacén guardaba el dict completo de cada ejercicio
+            store = ExerciseStore(n)
+            for exercise in dict_engine.topics[topic].generate_batch(2, n, store=False):
+                store.put(exercise['id'], exercise)
+            return store
+        
+        def store_records():
+            record_engine = MathEngine(store_capacity=n)
+            record_engine.generate_batch(topic, 2, n)
+            return record_engine.store
+        
+        dict_bytes = _traced_bytes(store_dicts)
+        record_bytes = _traced_bytes(store_records)
+        results[topic] = {
+            'dict_bytes_per_exercise': dict_bytes / n,
+            'record_bytes_per_exercise': record_bytes / n,
+            'ratio': dict_bytes / record_bytes
+        }
+    return results
+
+def bench_render(n: int = 10000) -> Dict[str, Any]:
+    """Coste de reconstruir n ejercicios guardados: sin texto, solo la explicación o completos"""
+    results = {}
+    for topic in MathEngine().topics:
+        engine = MathEngine(store_capacity=n)
+        records = [engine.store.get(exercise['id']) for exercise in engine.generate_batch(topic, 2, n)]
+        
+        lazy = _measure(lambda: [record.view() for record in records], 1)
+        explanation = _measure(lambda: [record.view().get('explanation') for record in records], 1)
+        spanish = _measure(lambda: [record.to_dict() for record in records], 1)
+        english = _measure(lambda: [record.to_dict('en') for record in records], 1)
+        results[topic] = {
+            'view_ops_per_sec': n / lazy['seconds'],
+            'explanation_ops_per_sec': n / explanation['seconds'],
+            'to_dict_es_ops_per_sec': n / spanish['seconds'],
+            'to_dict_en_ops_per_sec': n / english['seconds']
+        }
+    return results
+
+def bench_fractions(n: int = 100000) -> Dict[str, Any]:
+    """Compara la aritmética con pares de enteros con la de Fraction en los rangos de los generadores"""
+    rng = random.Random(0)
+    operands = [(rng.randint(1, 10), rng.randint(2, 12), rng.randint(1, 10), rng.randint(2, 12)) for _ in range(n)]
+    operations = {
+        'suma': (lambda a, b: a + b, _frac_add),
+        'resta': (lambda a, b: a - b, _frac_sub),
+        'multiplicacion': (lambda a, b: a * b, _frac_mul),
+        'division': (lambda a, b: a / b, _frac_div)
+    }
+    
+    results = {}
+    for name, (legacy_op, pair_op) in operations.items():
+        def legacy():
+            return [legacy_op(Fraction(n1, d1), Fraction(n2, d2)) for n1, d1, n2, d2 in operands]
+        
+        def pairs():
+            return [Fraction(*pair_op(*_frac_normalize(n1, d1), *_frac_normalize(n2, d2)))
+                    for n1, d1, n2, d2 in operands]
+        
+        assert legacy() == pairs()
+        legacy_time = _measure(legacy, 1)['seconds']
+        pair_time = _measure(pairs, 1)['seconds']
+        results[name] = {
+            'fraction_ops_per_sec': n / legacy_time,
+            'pair_ops_per_sec': n / pair_time,
+            'speedup': legacy_time / pair_time
+        }
+    
+    # Calificación de respuestas 'a/b' frente a una respuesta correcta ya calculada
+    answers = [(f"{n1}/{d1}", Fraction(n1, d1)) for n1, d1, _, _ in operands]
+    
+    def legacy_check():
+        checks = []
+        for answer, correct in answers:
+            parts = answer.split('/')
+            checks.append(Fraction(int(parts[0]), int(parts[1])) == correct)
+        return checks
+    
+    def pair_check():
+        checks = []
+        for answer, correct in answers:
+            num, den = _parse_fraction(answer)
+            checks.append(num * correct.denominator == correct.numerator * den)
+        return checks
+    
+    assert legacy_check() == pair_check()
+    legacy_time = _measure(legacy_check, 1)['seconds']
+    pair_time = _measure(pair_check, 1)['seconds']
+    results['check'] = {
+        'fraction_ops_per_sec': n / legacy_time,
+        'pair_ops_per_sec': n / pair_time,
+        'speedup': legacy_time / pair_time
+    }
+    return results
+
+def bench_expressions(n: int = 20000) -> Dict[str, Any]:
+    """Califica variantes de las respuestas de potencias y radicales: comparación de texto, forma estructural y SymPy"""
+    engine = MathEngine(seed=0, store_capacity=n)
+    submissions = []
+    while len(submissions) < n:
+        exercise = engine.generate_exercise('potenciacion_radicacion', 2)
+        correct = str(exercise.get('correct_answer', ''))
+        if '^' in correct or '√' in correct:
+            variant = correct.replace('^', '^(') + ')' if '^' in correct else correct.replace('√', 'sqrt')
+            for answer in (correct, f"{correct}/1", variant, f"{correct}0"):
+                submissions.append((answer, correct))
+    submissions = submissions[:n]
+    
+    def legacy():
+        return [answer.replace(' ', '') == correct.replace(' ', '') for answer, correct in submissions]
+    
+    def uncached():
+        parse, expected = _canonical_expression.__wrapped__, _expected_expression.__wrapped__
+        return [parse(answer) == expected(correct) for answer, correct in submissions]
+    
+    def canonical():
+        return [_expressions_equivalent(answer, correct) for answer, correct in submissions]
+    
+    canonical()  # calienta la caché de formas estructurales
+    results = {
+        'legacy': dict(_measure(legacy, 1), accepted=sum(legacy())),
+        'uncached': dict(_measure(uncached, 1), accepted=sum(uncached())),
+        'canonical': dict(_measure(canonical, 1), accepted=sum(canonical()))
+    }
+    for row in results.values():
+        row['ops_per_sec'] = n / row['seconds']
+    
+    if optional_backend('sympy') is not None:
+        sample = submissions[:min(n, 200)]
+        sympy_time = _measure(lambda: [_sympy_equivalent(answer, correct) for answer, correct in sample], 1)
+        results['sympy'] = {'seconds': sympy_time['seconds'], 'ops_per_sec': len(sample) / sympy_time['seconds']}
+    return results
+
+# Tipos de ejercicio con respuestas en las tablas precalculadas
+_TABLE_TYPES = {
+    'numeros_primos': ('identificar_primo',),
+    'potenciacion_radicacion': ('simplificar_radicales',)
+}
+
+def bench_tables(n: int = 20000) -> Dict[str, Any]:
+    """Reconstruye y califica n ejercicios por tipo calculando las respuestas o leyéndolas de las tablas"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'answers.bin')
+        start = time.perf_counter()
+        AnswerTables.build().write(path)
+        built = time.perf_counter()
+        tables = AnswerTables.load(path)
+        loaded = time.perf_counter()
+        results = {'file': {'build_ms': (built - start) * 1000, 'load_ms': (loaded - built) * 1000,
+                            'bytes': tables.nbytes}}
+        
+        for topic, exercise_types in _TABLE_TYPES.items():
+            for exercise_type in exercise_types:
+                timings = {}
+                for name, engine_tables in (('computed', None), ('tables', tables)):
+                    engine = MathEngine(store_capacity=2 * n, answer_tables=engine_tables)
+                    exercises = engine.generate_batch(topic, 3, n, weights={exercise_type: 1})
+                    exercises += engine.generate_batch(topic, 1, n, weights={exercise_type: 1})
+                    records = [engine.store.get(exercise['id']) for exercise in exercises]
+                    submissions = [(exercise['id'], exercise['correct_answer']) for exercise in exercises]
+                    rebuild = _measure(lambda: [record.view().get('explanation') for record in records], 1)
+                    grade = _measure(lambda: [engine.check_answer(topic, exercise_id, answer)
+                                              for exercise_id, answer in submissions], 1)
+                    timings[f'{name}_rebuild_ops_per_sec'] = len(records) / rebuild['seconds']
+                    timings[f'{name}_check_ops_per_sec'] = len(records) / grade['seconds']
+                timings['speedup'] = timings['tables_rebuild_ops_per_sec'] / timings['computed_rebuild_ops_per_sec']
+                results[exercise_type] = timings
+    return results
+
+def _hammer(engine: MathEngine, threads: int, per_thread: int) -> Dict[str, Any]:
+    """Genera y califica desde varios hilos a la vez y cuenta ejercicios perdidos o mal calificados"""
+    topics = list(engine.topics)
+    lost, misgraded = [0] * threads, [0] * threads
+    barrier = threading.Barrier(threads + 1)
+    
+    def worker(slot: int):
+        barrier.wait()
+        for i in range(per_thread):
+            topic = topics[(slot + i) % len(topics)]
+            exercise = engine.generate_exercise(topic, 1 + i % 3)
+            if 'correct_answer' not in exercise:
+                continue
+            result = engine.check_answer(topic, exercise['id'], exercise['correct_answer'])
+            if 'error' in result:
+                lost[slot] += 1
+            elif not result['correct'] or str(result['correct_answer']) != str(exercise['correct_answer']):
+                misgraded[slot] += 1
+    
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {'ops_per_sec': threads * per_thread / elapsed, 'lost': sum(lost), 'misgraded': sum(misgraded)}
+
+def bench_threads(n: int = 40000) -> Dict[str, Any]:
+    """Un solo motor compartido por 1 a 16 hilos: rendimiento y ejercicios perdidos o mal calificados
+    
+    Con el GIL de CPython el trabajo de cada hilo se serializa, así que lo esperable es un rendimiento
+    estable (no lineal) y cero errores; el almacén con un único cerrojo sirve de referencia.
+    """
+    results = {}
+    baseline = None
+    for threads in (1, 2, 4, 8, 16):
+        for shards in (1, 16):
+            engine = MathEngine(store_capacity=n, store_shards=shards)
+            row = _hammer(engine, threads, n // threads)
+            if baseline is None:
+                baseline = row['ops_per_sec']
+            row['scaling'] = row['ops_per_sec'] / baseline
+            row['evictions'] = engine.store_metrics()['evictions']
+            results[f'{threads}_threads_{shards}_shards'] = row
+    return results
+
+async def _serve(handle, requests: int, concurrency: int) -> Dict[str, float]:
+    """Atiende requests peticiones con handle mientras un latido mide el retraso del bucle de eventos"""
+    lags = []
+    done = asyncio.Event()
+    
+    async def heartbeat():
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            start = loop.time()
+            await asyncio.sleep(0.001)
+            lags.append((loop.time() - start - 0.001) * 1000)
+    
+    gate = asyncio.Semaphore(concurrency)
+    
+    async def request(i: int):
+        async with gate:
+            await handle(i)
+    
+    beat = asyncio.ensure_future(heartbeat())
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+    lags.sort()
+    return {
+        'requests_per_sec': requests / elapsed,
+        'loop_lag_p99_ms': lags[int(len(lags) * 0.99)] if lags else 0.0,
+        'loop_lag_max_ms': lags[-1] if lags else 0.0
+    }
+
+def _answered(exercises: List[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Envíos con la respuesta correcta de los ejercicios que la incluyen"""
+    return [(exercise['id'], exercise['correct_answer']) for exercise in exercises if 'correct_answer' in exercise]
+
+def bench_async(n: int = 400) -> Dict[str, Any]:
+    """n peticiones concurrentes (generar y calificar 50 ejercicios): motor síncrono frente a AsyncMathEngine"""
+    topics = list(MathEngine().topics)
+    
+    async def synchronous():
+        engine = MathEngine(store_capacity=n * 50)
+        
+        async def handle(i: int):
+            topic = topics[i % len(topics)]
+            exercises = engine.generate_batch(topic, 2, 50)
+            engine.check_batch(topic, _answered(exercises)).to_dicts()
+        
+        return await _serve(handle, n, 32)
+    
+    async def offloaded(executor: str, **engine_kwargs):
+        async with AsyncMathEngine(executor, max_workers=4, **engine_kwargs) as engine:
+            async def handle(i: int):
+                topic = topics[i % len(topics)]
+                exercises = await engine.generate_batch(topic, 2, 50)
+                await engine.check_batch(topic, _answered(exercises))
+            
+            return await _serve(handle, n, 32)
+    
+    return {
+        'sync': asyncio.run(synchronous()),
+        'async_threads': asyncio.run(offloaded('thread', store_capacity=n * 50)),
+        'async_processes': asyncio.run(offloaded('process', stateless=True, secret_key='benchmark'))
+    }
+
+def _digest(directory: str) -> str:
+    """Huella de los archivos .jsonl de un banco, para comprobar que dos ejecuciones coinciden"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.jsonl'):
+            with open(os.path.join(directory, name), 'rb') as handle:
+                digest.update(handle.read())
+    return digest.hexdigest()
+
+def bench_bulk(n: int = 20000) -> Dict[str, Any]:
+    """Banco de n ejercicios por tema y dificultad con 1 proceso y con uno por CPU"""
+    results = {}
+    digests = set()
+    for workers in sorted({1, os.cpu_count() or 1, 4}):
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            manifest = generate_bank(directory, n=n, seed=1, workers=workers, chunk_size=5000)
+            elapsed = time.perf_counter() - start
+            digests.add(_digest(directory))
+        total = sum(manifest['counts'].values())
+        results[f'{workers}_workers'] = {'seconds': elapsed, 'exercises_per_sec': total / elapsed}
+    results['identical_output'] = len(digests) == 1
+    return results
+
+def _peak_bytes(fn: Callable[[], Any]) -> Tuple[Any, int]:
+    """Resultado de fn y pico de memoria reservada durante su ejecución"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+def bench_export(n: int = 100000) -> Dict[str, Any]:
+    """Exporta n ejercicios a JSON Lines y a binario y los vuelve a leer
+    
+    El pico de memoria se mide aparte (tracemalloc ralentiza mucho) con n/10 y n/2 ejercicios:
+    si la exportación es en streaming, no debe crecer con el número de ejercicios.
+    """
+    engine = MathEngine()
+    topic = 'fraccionarios'
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for format in ('jsonl', 'binary'):
+            path = os.path.join(directory, f'export.{format}')
+            start = time.perf_counter()
+            engine.export_exercises(path, topic, 2, n, seed=1, format=format)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            start = time.perf_counter()
+            read = sum(1 for _ in engine.read_exercises(path))
+            results[format] = {
+                'write_per_sec': n / elapsed,
+                'read_per_sec': read / (time.perf_counter() - start),
+                'bytes_per_exercise': size / n
+            }
+            for count in (n // 10, n // 2):
+                _, peak = _peak_bytes(lambda: engine.export_exercises(path, topic, 2, count, seed=1, format=format))
+                results[format][f'peak_kb_{count}'] = peak // 1024
+    
+    # Referencia: la lista completa de generate_batch crece con n
+    for count in (n // 10, n // 2):
+        _, peak = _peak_bytes(lambda: engine.generate_batch(topic, 2, count, seed=1, store=False))
+        results.setdefault('generate_batch', {})[f'peak_kb_{count}'] = peak // 1024
+    return results
+
+def _latencies(fn: Callable[[Any], Any], items: List[Any]) -> Dict[str, float]:
+    """Llama a fn con cada elemento y devuelve operaciones por segundo y latencias p50/p99 en µs"""
+    timings = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for item in items:
+        before = clock()
+        fn(item)
+        timings.append(clock() - before)
+    elapsed = (clock() - start) / 1e9
+    timings.sort()
+    return {
+        'ops_per_sec': len(items) / elapsed,
+        'p50_us': timings[len(timings) // 2] / 1000,
+        'p99_us': timings[int(len(timings) * 0.99)] / 1000
+    }
+
+def bench_store(n: int = 20000) -> Dict[str, Any]:
+    """Almacén en memoria frente a SQLite: escrituras, lecturas en caché y lecturas tras reiniciar
+    
+    write_ops_per_sec incluye el flush final, es decir, el tiempo hasta que todo está en disco.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            'dict': lambda: ExerciseStore(n),
+            'sqlite_group_commit': lambda: SQLiteExerciseStore(os.path.join(directory, 'group.db'), cache_size=n),
+            # Una transacción por ejercicio: lo que costaría persistir sin agrupar
+            'sqlite_per_write': lambda: SQLiteExerciseStore(os.path.join(directory, 'single.db'), cache_size=n,
+                                                            flush_interval=0),
+            'sqlite_per_write_fsync': lambda: SQLiteExerciseStore(os.path.join(directory, 'fsync.db'), cache_size=n,
+                                                                  flush_interval=0, synchronous='FULL')
+        }
+        for name, factory in backends.items():
+            store = factory()
+            engine = MathEngine(store=store)
+            count = n if name in ('dict', 'sqlite_group_commit') else max(1, n // 20)
+            records = [record for topic in engine.topics
+                       for record in engine.generate_records(topic, 2, count // len(engine.topics))]
+            
+            start = time.perf_counter()
+            put = _latencies(lambda record: store.put(record.id, record), records)
+            getattr(store, 'flush', lambda: None)()
+            put['write_ops_per_sec'] = len(records) / (time.perf_counter() - start)
+            put.pop('ops_per_sec')
+            ids = [record.id for record in records]
+            random.shuffle(ids)
+            results[f'{name}_put'] = put
+            results[f'{name}_get_cached'] = _latencies(store.get, ids)
+            
+            if isinstance(store, SQLiteExerciseStore):
+                engine.close()
+                # Motor nuevo sobre el mismo archivo: cada lectura va al disco la primera vez
+                restarted = MathEngine(store_path=store.path, store_capacity=n)
+                results[f'{name}_get_after_restart'] = _latencies(restarted.store.get, ids)
+                results[f'{name}_survived_restart'] = sum(restarted.store.get(exercise_id) is not None
+                                                        for exercise_id in ids) == len(ids)
+                restarted.close()
+            else:
+                results[f'{name}_survived_restart'] = False
+    return results
+
+def _allocated_bytes(fn: Callable[[Any], Any], items: List[Any]) -> int:
+    """Mediana de la memoria reservada por una llamada (pico durante la llamada, según tracemalloc)"""
+    sizes = []
+    tracemalloc.start()
+    try:
+        for item in items:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(item)
+            sizes.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return int(statistics.median(sizes))
+
+def _profile(fn: Callable[[Any], Any], items: List[Any], repeats: int = 3, alloc_sample: int = 200) -> Dict[str, float]:
+    """ops/s y latencias p50/p99 (lo mejor de repeats pasadas) y memoria por llamada con una muestra
+    
+    Quedarse con la mejor pasada descarta las interrupciones de otros procesos, que solo
+    empeoran los tiempos; así dos ejecuciones del mismo código se parecen lo bastante para compararlas.
+    """
+    runs = [_latencies(fn, items) for _ in range(repeats)]
+    metrics = {
+        'ops_per_sec': max(run['ops_per_sec'] for run in runs),
+        'p50_us': min(run['p50_us'] for run in runs),
+        'p99_us': min(run['p99_us'] for run in runs)
+    }
+    metrics['alloc_bytes'] = _allocated_bytes(fn, list(items[:alloc_sample]))
+    return metrics
+
+def _wrong_answer(answer: Any) -> Any:
+    """Una respuesta incorrecta del mismo tipo, para medir la rama de error de check_answer"""
+    if isinstance(answer, bool):
+        return not answer
+    if isinstance(answer, (int, Fraction)):
+        return answer + 1
+    if isinstance(answer, list):
+        return answer[:-1] or [0]
+    return f"{answer}0"
+
+def bench_suite(n: int = 2000) -> Dict[str, Any]:
+    """Línea base de todo el motor: cada _generate_* y cada rama de check_answer en las dificultades 1-3
+    
+    gen.<tema>.<tipo>.d<k> llama directamente al generador del tipo (registro compacto, sin texto);
+    check.<tema>.<tipo>.d<k>.{correct,wrong} califica con MathEngine.check_answer ejercicios de ese
+    tipo con la respuesta correcta y con una incorrecta; engine.<tema>.d<k> mide el ciclo completo
+    generate_exercise + check_answer y batch.<tema>.d<k>, generate_batch. Guardar con --save y
+    comparar dos ejecuciones con --compare.
+    """
+    optional_backend('numpy')
+    engine = MathEngine(store_capacity=200 * n)
+    rng = random.Random(1)
+    results = {}
+    for topic_name, topic in engine.topics.items():
+        for exercise_type in topic.REGISTRY.types:
+            generator = topic._generators[exercise_type.name]
+            for difficulty in (1, 2, 3):
+                ids = topic.ids.next_ids(topic.ID_PREFIX, n)
+                results[f'gen.{topic_name}.{exercise_type.name}.d{difficulty}'] = _profile(
+                    lambda exercise_id: generator(exercise_id, difficulty, rng), ids)
+                
+                exercises = engine.generate_batch(topic_name, difficulty, n, weights={exercise_type.name: 1}, seed=1)
+                answers = [(exercise['id'], exercise.get('correct_answer')) for exercise in exercises]
+                wrong = [(exercise_id, _wrong_answer(answer)) for exercise_id, answer in answers]
+                for branch, submissions in (('correct', answers), ('wrong', wrong)):
+                    name = f'check.{topic_name}.{exercise_type.name}.d{difficulty}.{branch}'
+                    grade = lambda submission: engine.check_answer(topic_name, *submission)
+                    try:
+                        grade(submissions[0])
+                    except Exception as exc:
+                        # Una rama que falla se informa en lugar de detener la línea base
+                        results[name] = f"error: {type(exc).__name__}: {exc}"
+                        continue
+                    results[name] = _profile(grade, submissions)
+    
+    results['check.missing'] = _profile(lambda exercise_id: engine.check_answer('fraccionarios', exercise_id, '1/2'),
+                                        [f'fr_missing{i}' for i in range(n)])
+    for topic_name in engine.topics:
+        for difficulty in (1, 2, 3):
+            def round_trip(_):
+                exercise = engine.generate_exercise(topic_name, difficulty)
+                # Los ejercicios sin correct_answer (propiedades_operaciones) no se pueden calificar
+                if 'correct_answer' in exercise:
+                    engine.check_answer(topic_name, exercise['id'], exercise['correct_answer'])
+            results[f'engine.{topic_name}.d{difficulty}'] = _profile(round_trip, range(n))
+            batch = min(_measure(lambda: engine.generate_batch(topic_name, difficulty, n), 1)['seconds']
+                        for _ in range(3))
+            results[f'batch.{topic_name}.d{difficulty}'] = {'exercises_per_sec': n / batch}
+    return results
+
+def bench_metrics(n: int = 20000) -> Dict[str, Any]:
+    """Coste de las métricas de uso en generate_exercise + check_answer, desactivadas y activadas
+    
+    'unwrapped' llama directamente a la implementación, sin la comprobación de engine.metrics:
+    la diferencia con 'disabled' es todo lo que cuestan las métricas cuando no se usan. Las tres
+    variantes se alternan en bloques cortos, con el recolector de basura parado (como timeit), y
+    el sobrecoste es la mediana por bloque del cociente de tiempos: así el ruido de la máquina,
+    que cambia de un segundo a otro, afecta a todas por igual.
+    """
+    topic = 'fraccionarios'
+    block = 250
+    variants = {}
+    for name in ('unwrapped', 'disabled', 'enabled'):
+        engine = MathEngine(store_capacity=n, metrics=name == 'enabled')
+        if name == 'unwrapped':
+            def check(exercise_id: str, answer: Any, engine: MathEngine = engine) -> Dict[str, Any]:
+                # check_answer tal como era antes de las métricas
+                if topic in engine.topics:
+                    if engine.stateless:
+                        return engine._check_stateless(topic, exercise_id, answer)
+                    return engine.topics[topic].check_answer(exercise_id, answer)
+            variants[name] = (engine._generate_exercise, check)
+        else:
+            variants[name] = (engine.generate_exercise, functools.partial(engine.check_answer, topic))
+        if name == 'enabled':
+            observed = engine
+    
+    timings: Dict[str, List[float]] = {f'{name}_{operation}': [] for name in variants for operation in ('generate', 'check')}
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(max(1, n // block)):
+            for name, (generate, check) in variants.items():
+                start = time.perf_counter()
+                exercises = [generate(topic, 2, None) for _ in range(block)]
+                generated = time.perf_counter()
+                for exercise in exercises:
+                    check(exercise['id'], exercise['correct_answer'])
+                timings[f'{name}_generate'].append(generated - start)
+                timings[f'{name}_check'].append(time.perf_counter() - generated)
+    finally:
+        gc.enable()
+    
+    results = {key: {'ops_per_sec': block / statistics.median(values)} for key, values in timings.items()}
+    for operation in ('generate', 'check'):
+        base = timings[f'unwrapped_{operation}']
+        results[f'overhead_{operation}'] = {
+            f'{name}_ratio': statistics.median(value / reference for value, reference in zip(timings[f'{name}_{operation}'], base))
+            for name in ('disabled', 'enabled')
+        }
+    start = time.perf_counter()
+    text = observed.metrics_prometheus()
+    results['export'] = {'prometheus_ms': (time.perf_counter() - start) * 1000, 'lines': text.count('\n')}
+    return results
+
+def bench_profile(n: int = 20000) -> Dict[str, Any]:
+    """Coste del perfilado por muestreo en generate_exercise (dificultad 3), desactivado y al 1 %
+    
+    Mismo método que bench_metrics: bloques alternos con el recolector parado y la mediana por
+    bloque del cociente con 'unwrapped' (la implementación sin comprobaciones).
+    """
+    topic = 'numeros_primos'
+    block = 250
+    engines = {
+        'unwrapped': MathEngine(store_capacity=n),
+        'disabled': MathEngine(store_capacity=n),
+        'sample': MathEngine(store_capacity=n, profile=EngineProfiler(0.01, 'sample', seed=0)),
+        'cprofile': MathEngine(store_capacity=n, profile=EngineProfiler(0.01, 'cprofile', seed=0))
+    }
+    variants = {name: engine.generate_exercise for name, engine in engines.items()}
+    variants['unwrapped'] = engines['unwrapped']._generate_exercise
+    
+    timings: Dict[str, List[float]] = {name: [] for name in variants}
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(max(1, n // block)):
+            for name, generate in variants.items():
+                start = time.perf_counter()
+                for _ in range(block):
+                    generate(topic, 3, None)
+                timings[name].append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    
+    results = {name: {'ops_per_sec': block / statistics.median(values)} for name, values in timings.items()}
+    results['overhead'] = {
+        f'{name}_ratio': statistics.median(value / reference for value, reference in zip(timings[name], timings['unwrapped']))
+        for name in ('disabled', 'sample', 'cprofile')
+    }
+    for name in ('sample', 'cprofile'):
+        profiler = engines[name].profiler
+        start = time.perf_counter()
+        text = profiler.collapsed()
+        results[name].update(collapsed_ms=(time.perf_counter() - start) * 1000, stacks=text.count('\n'),
+                             profiled=sum(row['calls'] for row in profiler.summary()))
+        engines[name].close()
+    return results
+
+def bench_memo(n: int = 20000) -> Dict[str, Any]:
+    """generate_exercise + check_answer con y sin memoria de respuestas (1024 entradas por tipo)
+    
+    Los dos motores se alternan en bloques con el recolector parado; speedup es la mediana por
+    bloque del cociente de tiempos. 'batch_d3' mide el peor caso: generate_batch de dificultad 3,
+    donde los parámetros casi no se repiten y la memoria apenas acierta.
+    """
+    block = 200
+    results = {}
+    for topic in MathEngine().topics:
+        for difficulty in (1, 3):
+            engines = {'off': MathEngine(store_capacity=n), 'memo': MathEngine(store_capacity=n, memo=True)}
+            timings: Dict[str, List[float]] = {name: [] for name in engines}
+            gc.collect()
+            gc.disable()
+            try:
+                for _ in range(max(1, n // block)):
+                    for name, engine in engines.items():
+                        start = time.perf_counter()
+                        for _ in range(block):
+                            exercise = engine.generate_exercise(topic, difficulty)
+                            if 'correct_answer' in exercise:
+                                engine.check_answer(topic, exercise['id'], exercise['correct_answer'])
+                        timings[name].append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+            results[f'{topic}_d{difficulty}'] = {
+                'off_ops_per_sec': block / statistics.median(timings['off']),
+                'memo_ops_per_sec': block / statistics.median(timings['memo']),
+                'speedup': statistics.median(off / memo for off, memo in zip(timings['off'], timings['memo'])),
+                'hit_ratio': engines['memo'].memo_metrics()['hit_rate']
+            }
+    
+    engines = {'off': MathEngine(store_capacity=1), 'memo': MathEngine(store_capacity=1, memo=True)}
+    timings = {name: [] for name in engines}
+    for _ in range(5):
+        for name, engine in engines.items():
+            start = time.perf_counter()
+            for topic in engine.topics:
+                engine.generate_batch(topic, 3, n // 4, seed=len(timings[name]))
+            timings[name].append(time.perf_counter() - start)
+    results['batch_d3'] = {
+        'off_ops_per_sec': n / min(timings['off']),
+        'memo_ops_per_sec': n / min(timings['memo']),
+        'speedup': min(timings['off']) / min(timings['memo']),
+        'hit_ratio': engines['memo'].memo_metrics()['hit_rate']
+    }
+    return results
+
+# Métricas en las que un valor menor es mejor; en el resto (ops_per_sec, speedup...) es peor
+_LOWER_IS_BETTER = ('_us', '_ms', 'seconds', 'bytes', '_kb')
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.15,
+                    tail_threshold: float = 1.0) -> List[Dict[str, Any]]:
+    """Métricas numéricas comunes a dos ejecuciones que empeoraron más que threshold (relativo)
+    
+    Las latencias de cola (p99) son mucho más ruidosas y usan tail_threshold.
+    """
+    regressions = []
+    for name, metrics in current.items():
+        base_metrics = baseline.get(name)
+        if not isinstance(metrics, dict) or not isinstance(base_metrics, dict):
+            continue
+        for key, value in metrics.items():
+            base = base_metrics.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            worse = change if key.endswith(_LOWER_IS_BETTER) else -change
+            if worse > (tail_threshold if key.startswith('p99') else threshold):
+                regressions.append({'name': name, 'metric': key, 'baseline': base, 'current': value, 'change': change})
+    return regressions
+
+def _save_results(path: str, benchmark: str, n: Any, results: Dict[str, Any]):
+    """Guarda los resultados junto con el entorno en que se midieron"""
+    document = {
+        'benchmark': benchmark,
+        'n': n,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': optional_backend('numpy') is not None,
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(document, handle, indent=2, default=str)
+
+# Se ejecuta en un intérprete limpio para medir el arranque en frío real
+_STARTUP_PROBE = """
+import json, os, resource, sys, time
+def rss_kb():
+    try:  # RSS actual en Linux; en otros sistemas, el pico que informa getrusage
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+base_rss = rss_kb()
+start = time.perf_counter()
+import math_engine
+imported = time.perf_counter()
+import_rss = rss_kb()
+math_engine.MathEngine()
+built = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'engine_ms': (built - imported) * 1000,
+    'import_rss_kb': import_rss - base_rss,
+    'engine_rss_kb': rss_kb() - import_rss,
+    'heavy_modules': sorted(name for name in ('numpy', 'sympy') if name in sys.modules)
+}))
+"""
+
+def bench_startup(n: int = 10) -> Dict[str, Any]:
+    """Mide en n procesos nuevos el tiempo y la memoria de importar el motor y construir MathEngine"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(n):
+        output = subprocess.run([sys.executable, '-c', _STARTUP_PROBE], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+    
+    results = {}
+    for phase in ('import', 'engine'):
+        results[phase] = {
+            'median_ms': statistics.median(run[f'{phase}_ms'] for run in runs),
+            'max_ms': max(run[f'{phase}_ms'] for run in runs),
+            'rss_kb': statistics.median(run[f'{phase}_rss_kb'] for run in runs)
+        }
+    results['heavy_modules'] = ', '.join(runs[-1]['heavy_modules']) or 'ninguno'
+    return results
+
+BENCHMARKS = {
+    'ids': bench_ids,
+    'batch': bench_batch,
+    'grade': bench_grade,
+    'pool': bench_pool,
+    'memory': bench_memory,
+    'render': bench_render,
+    'fractions': bench_fractions,
+    'expressions': bench_expressions,
+    'tables': bench_tables,
+    'threads': bench_threads,
+    'async': bench_async,
+    'bulk': bench_bulk,
+    'export': bench_export,
+    'store': bench_store,
+    'suite': bench_suite,
+    'metrics': bench_metrics,
+    'profile': bench_profile,
+    'memo': bench_memo,
+    'startup': bench_startup
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks del motor matemático")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('-n', type=int, default=None, help="Número de iteraciones")
+    parser.add_argument('--save', metavar='RUTA', help="Guarda los resultados en JSON")
+    parser.add_argument('--compare', metavar='RUTA', help="Compara con resultados guardados antes con --save")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Empeoramiento relativo a partir del cual se marca una regresión")
+    parser.add_argument('--tail-threshold', type=float, default=1.0, help="Umbral para las latencias p99")
+    args = parser.parse_args(argv)
+    
+    kwargs = {'n': args.n} if args.n else {}
+    results = BENCHMARKS[args.benchmark](**kwargs)
+    
+    print(f"=== {args.benchmark.upper()} ===")
+    for name, value in results.items():
+        if isinstance(value, dict):
+            metrics = ', '.join(f"{k}={v:.3f}" if k in ('seconds', 'speedup', 'ratio', 'scaling') or k.endswith(('_ms', '_us', '_ratio')) else f"{k}={v:,.0f}"
+                                for k, v in value.items())
+            print(f"{name}: {metrics}")
+        else:
+            print(f"{name}: {value}")
+    
+    if args.save:
+        _save_results(args.save, args.benchmark, args.n, results)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline.get('benchmark') != args.benchmark:
+            parser.error(f"{args.compare} contiene resultados de '{baseline.get('benchmark')}', no de '{args.benchmark}'")
+        regressions = compare_results(baseline['results'], results, args.threshold, args.tail_threshold)
+        print(f"\n=== COMPARACIÓN con {args.compare} (umbral {args.threshold:.0%}, p99 {args.tail_threshold:.0%}) ===")
+        for regression in regressions:
+            print(f"REGRESIÓN {regression['name']} {regression['metric']}: "
+                  f"{regression['baseline']:,.3f} -> {regression['current']:,.3f} ({regression['change']:+.1%})")
+        print(f"{len(regressions)} regresiones")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Generación masiva de bancos de ejercicios para MathMaster
+Reparte la generación entre procesos y escribe los ejercicios en disco por bloques (JSON Lines o binario compacto)
+Uso: python scripts/bulk_generate.py SALIDA [--topics ...] [--difficulties 1 2 3] [-n N] [--seed S] [--workers W] [--format jsonl|binary]
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional
+
+from math_engine import MathEngine, ExerciseBinaryCodec, derive_seed, exercise_to_json, optional_backend
+
+# Tamaño de bloque por defecto: forma parte de la semilla (otro tamaño produce otro banco)
+DEFAULT_CHUNK_SIZE = 10000
+
+# Extensión de archivo de cada formato de salida
+FORMATS = {'jsonl': 'jsonl', 'binary': 'mmex'}
+
+def _chunk_tasks(topics: List[str], difficulties: List[int], n: int, seed: int,
+                 chunk_size: int) -> List[Tuple[str, int, int, int, int, int]]:
+    """Bloques (tema, dificultad, índice, tamaño, semilla, node_id) en el orden en que se escriben
+    
+    La semilla y el prefijo de ids de cada bloque dependen solo de la semilla maestra y de la
+    posición del bloque, de modo que el resultado no depende de qué proceso lo genera.
+    """
+    all_topics = list(MathEngine().topics)
+    tasks = []
+    for topic in topics:
+        for difficulty in difficulties:
+            stream = all_topics.index(topic) * 16 + difficulty
+            stream_seed = derive_seed(seed, stream)
+            for index, start in enumerate(range(0, n, chunk_size)):
+                size = min(chunk_size, n - start)
+                # node_id de 40 bits: 8 para el flujo (tema, dificultad) y 32 para el bloque
+                tasks.append((topic, difficulty, index, size, derive_seed(stream_seed, index), stream << 32 | index))
+    return tasks
+
+def _generate_chunk(task: Tuple[str, int, int, int, int, int], locale: Optional[str], format: str = 'jsonl') -> bytes:
+    """Genera un bloque en el proceso actual y lo devuelve ya codificado (JSON Lines o bloque binario)"""
+    topic, difficulty, _, size, seed, node_id = task
+    engine = MathEngine(store_capacity=1, node_id=node_id)
+    records = engine.generate_records(topic, difficulty, size, seed=seed)
+    if format == 'binary':
+        return ExerciseBinaryCodec(engine).encode_block(records)
+    lines = [exercise_to_json(record.to_dict(locale)) for record in records]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def generate_bank(output_dir: str, topics: Optional[List[str]] = None, difficulties: Optional[List[int]] = None,
+                  n: int = 1000, seed: int = 0, workers: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, locale: Optional[str] = None,
+                  format: str = 'jsonl') -> Dict[str, Any]:
+    """Genera n ejercicios por tema y dificultad en output_dir/<tema>_d<dificultad>.jsonl (o .mmex)
+    
+    Con la misma semilla, tamaño de bloque y backend de muestreo (NumPy o random) el banco es
+    idéntico byte a byte sea cual sea el número de procesos. Como mucho 2 × workers bloques
+    esperan en memoria a ser escritos, en orden, por el proceso principal. Los archivos binarios
+    no llevan texto (el idioma se elige al leerlos con MathEngine.read_exercises).
+    """
+    if format not in FORMATS:
+        raise ValueError(f"format debe ser uno de {sorted(FORMATS)}")
+    topics = topics or list(MathEngine().topics)
+    difficulties = difficulties or [1, 2, 3]
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = _chunk_tasks(topics, difficulties, n, seed, chunk_size)
+    
+    files: Dict[Tuple[str, int], Any] = {}
+    counts: Dict[str, int] = {}
+    
+    def write(task, data: bytes):
+        topic, difficulty, _, size, _, _ = task
+        key = (topic, difficulty)
+        if key not in files:
+            files[key] = open(os.path.join(output_dir, f"{topic}_d{difficulty}.{FORMATS[format]}"), 'wb')
+            if format == 'binary':
+                files[key].write(ExerciseBinaryCodec(MathEngine(store_capacity=1)).header())
+        files[key].write(data)
+        name = f"{topic}_d{difficulty}"
+        counts[name] = counts.get(name, 0) + size
+    
+    try:
+        if workers == 1:
+            for task in tasks:
+                write(task, _generate_chunk(task, locale, format))
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                # Ventana de bloques en curso: se escriben en orden y la memoria queda acotada
+                in_flight = deque()
+                for task in tasks:
+                    if len(in_flight) >= 2 * workers:
+                        write(*_wait_first(in_flight))
+                    in_flight.append((task, executor.submit(_generate_chunk, task, locale, format)))
+                while in_flight:
+                    write(*_wait_first(in_flight))
+    finally:
+        for handle in files.values():
+            handle.close()
+    
+    manifest = {
+        'seed': seed,
+        'chunk_size': chunk_size,
+        'locale': locale,
+        'format': format,
+        # El flujo aleatorio de generate_batch cambia según haya NumPy o no
+        'sampler': 'numpy' if optional_backend('numpy') is not None else 'random',
+        'counts': counts
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+def _wait_first(in_flight: deque) -> Tuple[Tuple, bytes]:
+    """Saca el bloque más antiguo de la ventana y espera a su resultado"""
+    task, future = in_flight.popleft()
+    return task, future.result()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generación masiva de bancos de ejercicios")
+    parser.add_argument('output_dir')
+    parser.add_argument('--topics', nargs='+', choices=list(MathEngine().topics), default=None)
+    parser.add_argument('--difficulties', nargs='+', type=int, choices=[1, 2, 3], default=None)
+    parser.add_argument('-n', type=int, default=1000, help="Ejercicios por tema y dificultad")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla maestra")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, uno por CPU)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--locale', default=None)
+    parser.add_argument('--format', choices=list(FORMATS), default='jsonl')
+    args = parser.parse_args(argv)
+    
+    manifest = generate_bank(args.output_dir, args.topics, args.difficulties, args.n, args.seed,
+                             args.workers, args.chunk_size, args.locale, args.format)
+    for name, count in manifest['counts'].items():
+        print(f"{name}: {count:,} ejercicios")
+
+if __name__ == "__main__":
+    main()
@@ -5,75 +5,3642 @@ Contiene las funciones principales para cálculos y generación de ejercicios
 
 import random
 import math
-from typing import List, Dict, Tuple, Any
+import time
+import os
+import hmac
+import hashlib
+import io
+import struct
+import base64
+import itertools
+import operator
+import functools
+import weakref
+import threading
+import atexit
+import bisect
+import importlib
+import json
+import mmap
+import sys
+import re
+import string
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from typing import List, Dict, Tuple, Any, Optional, Callable, Iterator
 from fractions import Fraction
-import sympy as sp
+
+# Idioma de enunciados, explicaciones y retroalimentación si no se pide otro
+DEFAULT_LOCALE = 'es'
+
+# Backends opcionales pesados (numpy, sympy): se importan la primera vez que se usan
+_BACKENDS: Dict[str, Any] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+def optional_backend(name: str):
+    """Devuelve el módulo opcional name importándolo bajo demanda, o None si no está instalado"""
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        pass
+    with _BACKENDS_LOCK:
+        if name not in _BACKENDS:
+            try:
+                _BACKENDS[name] = importlib.import_module(name)
+            except ImportError:
+                _BACKENDS[name] = None
+        return _BACKENDS[name]
+
+def loaded_backends() -> Dict[str, bool]:
+    """Backends opcionales que ya se intentaron cargar y si están disponibles"""
+    return {name: module is not None for name, module in _BACKENDS.items()}
 
 class MathEngine:
     """Clase principal para operaciones matemáticas y generación de ejercicios"""
     
-    def __init__(self):
+    def __init__(self, store: Optional['ExerciseStore'] = None,
+                 store_capacity: int = 10000, store_ttl: Optional[float] = 3600.0,
+                 stateless: bool = False, secret_key: Optional[Any] = None,
+                 token_ttl: Optional[float] = None, node_id: Optional[int] = None,
+                 pool_size: int = 0, pool_low_water: Optional[int] = None,
+                 pool_refill_batch: Optional[int] = None, pool_refill_interval: float = 0.05,
+                 seed: Optional[int] = None, rng: Optional[random.Random] = None,
+                 locale: str = DEFAULT_LOCALE, answer_tables: Optional[Any] = None,
+                 store_shards: int = 16, store_path: Optional[str] = None, metrics: Optional[Any] = None,
+                 profile: Optional[Any] = None, memo: Optional[Any] = None):
+        # Un único almacén acotado compartido por todos los temas, repartido en shards con cerrojo
+        # propio para que varios hilos puedan generar y calificar a la vez con el mismo motor.
+        # Con store_path (o MATHMASTER_STORE_PATH) el almacén es persistente, en SQLite, y
+        # store_capacity pasa a ser el tamaño de su caché en memoria
+        if store is None:
+            store_path = store_path or os.environ.get('MATHMASTER_STORE_PATH') or None
+            if store_path is not None:
+                store = SQLiteExerciseStore(store_path, store_ttl, cache_size=store_capacity)
+            elif store_shards > 1:
+                store = ShardedExerciseStore(store_capacity, store_ttl, store_shards)
+            else:
+                store = ExerciseStore(store_capacity, store_ttl)
+        self.store = store
+        self.ids = ExerciseIdAllocator(node_id)
+        # Fuente aleatoria de la sesión: con semilla, cada ejercicio es reproducible por su índice
+        self.random = RandomSource(seed, rng)
+        # Idioma de los textos cuando la llamada no pide otro
+        self.locale = locale
+        # Tablas de respuestas precalculadas: instancia, ruta del archivo o MATHMASTER_ANSWER_TABLES
+        if answer_tables is None:
+            answer_tables = os.environ.get('MATHMASTER_ANSWER_TABLES') or None
+        if answer_tables is not None and not isinstance(answer_tables, AnswerTables):
+            answer_tables = AnswerTables.shared(answer_tables)
+        self.answer_tables = answer_tables
+        # Memoria de respuestas y textos: memo=True, entradas por tipo, una ExerciseMemo o MATHMASTER_MEMO=entradas
+        if memo is None:
+            memo = int(os.environ.get('MATHMASTER_MEMO') or 0)
+        if memo is True:
+            memo = ExerciseMemo()
+        elif isinstance(memo, int):
+            memo = ExerciseMemo(memo) if memo > 0 else None
+        self.memo: Optional[ExerciseMemo] = memo
         self.topics = {
-            'conjuntos_numericos': ConjuntosNumericos(),
-            'numeros_primos': NumerosPrimos(),
-            'fraccionarios': Fraccionarios(),
-            'potenciacion_radicacion': PotenciacionRadicacion()
+            'conjuntos_numericos': ConjuntosNumericos(self.store, self.ids, rng=self.random, locale=locale, memo=memo),
+            'numeros_primos': NumerosPrimos(self.store, self.ids, rng=self.random, locale=locale,
+                                            tables=answer_tables, memo=memo),
+            'fraccionarios': Fraccionarios(self.store, self.ids, rng=self.random, locale=locale, memo=memo),
+            'potenciacion_radicacion': PotenciacionRadicacion(self.store, self.ids, rng=self.random, locale=locale,
+                                                              tables=answer_tables, memo=memo)
         }
+        self._topic_names = list(self.topics)
+        # Un almacén persistente necesita los temas para reconstruir los registros que lee del disco
+        if hasattr(self.store, 'bind'):
+            self.store.bind(self)
+        
+        # Modo sin estado: el id del ejercicio es un token firmado y no se guarda nada
+        self.stateless = stateless
+        self.tokens = None
+        if stateless:
+            if secret_key is None:
+                secret_key = os.environ.get('MATHMASTER_TOKEN_SECRET')
+            if not secret_key:
+                raise ValueError("El modo sin estado requiere una clave secreta (secret_key o MATHMASTER_TOKEN_SECRET)")
+            self.tokens = ExerciseTokenCodec(secret_key, token_ttl)
+        
+        # Reserva opcional de ejercicios pregenerados (pool_size=0 la desactiva)
+        self.pool = None
+        if pool_size > 0:
+            self.pool = ExercisePool(self._pool_batch, pool_size, pool_low_water,
+                                     pool_refill_batch, pool_refill_interval)
+        
+        # Métricas de uso opcionales: metrics=True, una instancia de EngineMetrics o MATHMASTER_METRICS=1
+        if metrics is None:
+            metrics = os.environ.get('MATHMASTER_METRICS', '').lower() in ('1', 'true', 'yes')
+        if metrics is True:
+            metrics = EngineMetrics()
+        self.metrics: Optional[EngineMetrics] = metrics or None
+        # Perfilado por muestreo opcional: profile=fracción de llamadas, una instancia de EngineProfiler
+        # o MATHMASTER_PROFILE=fracción (con MATHMASTER_PROFILE_MODE=sample|cprofile)
+        if profile is None and os.environ.get('MATHMASTER_PROFILE'):
+            profile = EngineProfiler(float(os.environ['MATHMASTER_PROFILE']),
+                                     os.environ.get('MATHMASTER_PROFILE_MODE', 'sample'))
+        elif isinstance(profile, (int, float)):
+            profile = EngineProfiler(profile) if profile else None
+        self.profiler: Optional[EngineProfiler] = profile
+    
+    def generate_exercise(self, topic: str, difficulty: int = 1, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Genera un ejercicio para el tema especificado, en locale o en el idioma del motor"""
+        if self.metrics is not None or self.profiler is not None:
+            return self._generate_observed(topic, difficulty, locale)
+        return self._generate_exercise(topic, difficulty, locale)
+    
+    def _generate_observed(self, topic: str, difficulty: int, locale: Optional[str]) -> Dict[str, Any]:
+        """generate_exercise registrando la llamada en self.metrics y perfilándola si le toca"""
+        profiler = self.profiler
+        session = profiler.start() if profiler is not None else None
+        if session is None and self.metrics is None:
+            # Llamada que no toca perfilar y sin métricas: nada que medir
+            return self._generate_exercise(topic, difficulty, locale)
+        start = time.perf_counter()
+        try:
+            exercise = self._generate_exercise(topic, difficulty, locale)
+        except BaseException:
+            if session is not None:
+                profiler.discard(session)
+            raise
+        seconds = time.perf_counter() - start
+        if session is not None:
+            profiler.stop(session, 'generate', topic, exercise['type'], difficulty)
+        if self.metrics is not None:
+            self.metrics.observe_generate(topic, exercise['type'], difficulty, seconds)
+        return exercise
     
-    def generate_exercise(self, topic: str, difficulty: int = 1) -> Dict[str, Any]:
-        """Genera un ejercicio para el tema especificado"""
+    def _generate_exercise(self, topic: str, difficulty: int, locale: Optional[str]) -> Dict[str, Any]:
         if topic in self.topics:
-            return self.topics[topic].generate_exercise(difficulty)
+            # La reserva guarda ejercicios ya generados en el idioma del motor
+            if self.pool is not None and locale in (None, self.locale):
+                entry = self.pool.take(topic, difficulty)
+                if entry is not None:
+                    record, exercise = entry
+                    if record is not None:
+                        self.store.put(record.id, record)
+                    return exercise
+            if self.stateless:
+                return self._generate_stateless(topic, difficulty, locale=locale)
+            return self.topics[topic].generate_exercise(difficulty, locale)
         else:
             raise ValueError(f"Tema '{topic}' no encontrado")
     
-    def check_answer(self, topic: str, exercise_id: str, user_answer: Any) -> Dict[str, Any]:
-        """Verifica la respuesta del usuario"""
+    def generate_batch(self, topic: str, difficulty: int = 1, n: int = 1,
+                       weights: Optional[Dict[str, float]] = None,
+                       seed: Optional[int] = None, locale: Optional[str] = None,
+                       store: bool = True) -> List[Dict[str, Any]]:
+        """Genera n ejercicios del tema en una sola llamada
+        
+        weights asigna un peso relativo a cada tipo de ejercicio (los tipos omitidos no se generan).
+        Los parámetros se extraen en bloque, con NumPy si está instalado. Con store=False los
+        ejercicios no se guardan (por ejemplo, para volcarlos a disco) y no podrán calificarse.
+        """
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        topic_obj = self.topics[topic]
+        if seed is None and self.random.seed is not None:
+            seed = self.random.next_seed()
+        if self.stateless:
+            # El mismo rng elige los tipos y la semilla de cada token: con seed el bloque se repite igual
+            rng = random.Random(seed) if seed is not None else self.random.current()
+            if weights is None:
+                type_indices = topic_obj.REGISTRY.alias.sample_many(rng, n)
+            else:
+                probabilities = _resolve_type_weights(topic_obj.EXERCISE_TYPES, weights)
+                type_indices = rng.choices(range(len(topic_obj.EXERCISE_TYPES)), weights=probabilities, k=n)
+            return [self._generate_stateless(topic, difficulty, type_index, locale, rng) for type_index in type_indices]
+        return topic_obj.generate_batch(difficulty, n, weights, _BulkSampler(seed), store, locale)
+    
+    def generate_records(self, topic: str, difficulty: int = 1, n: int = 1,
+                         weights: Optional[Dict[str, float]] = None,
+                         seed: Optional[int] = None) -> List['ExerciseRecord']:
+        """Como generate_batch con store=False, pero devuelve los registros compactos sin generar el texto"""
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        if seed is None and self.random.seed is not None:
+            seed = self.random.next_seed()
+        return _generate_topic_records(self.topics[topic], difficulty, n, weights, _BulkSampler(seed))
+    
+    def iter_exercises(self, topic: str, difficulty: int = 1, seed: Optional[int] = None,
+                       weights: Optional[Dict[str, float]] = None, locale: Optional[str] = None,
+                       limit: Optional[int] = None, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Flujo de ejercicios (sin fin si no hay limit) que no se guardan en el almacén
+        
+        Se generan por bloques de chunk_size, así que la memoria no crece con el número de
+        ejercicios. Con seed, el flujo es reproducible: el bloque k usa derive_seed(seed, k).
+        Como no se guardan, estos ejercicios sirven para exportar, no para calificarlos después.
+        """
+        for records in self._record_chunks(topic, difficulty, seed, weights, limit, chunk_size):
+            for record in records:
+                yield record.to_dict(locale)
+    
+    def _record_chunks(self, topic: str, difficulty: int, seed: Optional[int],
+                       weights: Optional[Dict[str, float]], limit: Optional[int],
+                       chunk_size: int) -> Iterator[List['ExerciseRecord']]:
+        """Bloques de registros para iter_exercises y export_exercises"""
+        if chunk_size <= 0:
+            raise ValueError("chunk_size debe ser positivo")
+        produced = 0
+        for index in itertools.count():
+            size = chunk_size if limit is None else min(chunk_size, limit - produced)
+            if size <= 0:
+                return
+            chunk_seed = derive_seed(seed, index) if seed is not None else None
+            yield self.generate_records(topic, difficulty, size, weights, chunk_seed)
+            produced += size
+    
+    def export_exercises(self, file, topic: str, difficulty: int = 1, n: int = 1000,
+                         seed: Optional[int] = None, format: str = 'jsonl',
+                         weights: Optional[Dict[str, float]] = None, locale: Optional[str] = None,
+                         chunk_size: int = 1000) -> int:
+        """Escribe n ejercicios en file (ruta o archivo binario abierto) con memoria constante
+        
+        format='jsonl' escribe un ejercicio completo por línea (Fraction como "a/b");
+        format='binary' escribe solo los registros compactos (ExerciseBinaryCodec), que
+        read_exercises vuelve a convertir en ejercicios completos. Devuelve cuántos se escribieron.
+        """
+        if format not in ('jsonl', 'binary'):
+            raise ValueError("format debe ser 'jsonl' o 'binary'")
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'wb') as handle:
+                return self.export_exercises(handle, topic, difficulty, n, seed, format, weights, locale, chunk_size)
+        
+        codec = ExerciseBinaryCodec(self) if format == 'binary' else None
+        if codec is not None:
+            file.write(codec.header())
+        written = 0
+        for records in self._record_chunks(topic, difficulty, seed, weights, n, chunk_size):
+            if codec is not None:
+                file.write(codec.encode_block(records))
+            else:
+                lines = [exercise_to_json(record.to_dict(locale)) for record in records]
+                file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            written += len(records)
+        return written
+    
+    def read_exercises(self, file, locale: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Lee ejercicios exportados con export_exercises (JSON Lines o binario), uno a uno"""
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as handle:
+                yield from self.read_exercises(handle, locale)
+            return
+        
+        codec = ExerciseBinaryCodec(self)
+        size = len(codec.MAGIC)
+        if hasattr(file, 'peek'):
+            head = file.peek(size)[:size]
+        elif file.seekable():
+            # io.BytesIO y otros archivos sin búfer de lectura: se lee la cabecera y se vuelve atrás
+            position = file.tell()
+            head = file.read(size)
+            file.seek(position)
+        else:
+            file = io.BufferedReader(file)
+            head = file.peek(size)[:size]
+        if head == codec.MAGIC:
+            for record in codec.iter_records(file):
+                yield record.to_dict(locale)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def check_answer(self, topic: str, exercise_id: str, user_answer: Any,
+                     locale: Optional[str] = None) -> Dict[str, Any]:
+        """Verifica la respuesta del usuario; la retroalimentación se genera en locale"""
         if topic in self.topics:
-            return self.topics[topic].check_answer(exercise_id, user_answer)
+            if self.metrics is not None or self.profiler is not None:
+                return self._check_observed(topic, exercise_id, user_answer, locale)
+            if self.stateless:
+                return self._check_stateless(topic, exercise_id, user_answer, locale)
+            return self.topics[topic].check_answer(exercise_id, user_answer, locale)
         else:
             raise ValueError(f"Tema '{topic}' no encontrado")
+    
+    def _check_observed(self, topic: str, exercise_id: str, user_answer: Any,
+                        locale: Optional[str]) -> Dict[str, Any]:
+        """check_answer registrando en self.metrics el tipo, la dificultad y el resultado, y perfilándolo si le toca
+        
+        Obtiene el ejercicio igual que check_batch, con una sola lectura del almacén.
+        """
+        profiler = self.profiler
+        session = profiler.start() if profiler is not None else None
+        if session is None and self.metrics is None:
+            if self.stateless:
+                return self._check_stateless(topic, exercise_id, user_answer, locale)
+            return self.topics[topic].check_answer(exercise_id, user_answer, locale)
+        start = time.perf_counter()
+        labels = None
+        outcome = 'error'
+        try:
+            topic_obj = self.topics[topic]
+            if self.stateless:
+                exercise, error = self._rebuild_stateless(topic, exercise_id, locale)
+                labels = (exercise['type'], exercise['difficulty']) if error is None else None
+            else:
+                record = self.store.get(exercise_id)
+                exercise = record.view(locale) if record is not None else None
+                error = _missing_exercise_result(self.store, exercise_id) if record is None else None
+                labels = (record.type, record.difficulty) if record is not None else None
+            if error is not None:
+                if self.metrics is not None:
+                    self.metrics.observe_check_error(topic, _CHECK_ERROR_REASONS.get(error['error'], 'other'))
+                return error
+            
+            result = topic_obj.grade(exercise, user_answer)
+            outcome = 'correct' if result['correct'] else 'incorrect'
+            return result
+        finally:
+            if labels is None:
+                # Sin ejercicio que calificar: no cuenta como llamada perfilada
+                if session is not None:
+                    profiler.discard(session)
+            else:
+                seconds = time.perf_counter() - start
+                if session is not None:
+                    profiler.stop(session, 'check', topic, *labels)
+                if self.metrics is not None:
+                    self.metrics.observe_check(topic, *labels, outcome, seconds)
+    
+    def get_exercise(self, topic: str, exercise_id: str, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Devuelve un ejercicio ya generado, por ejemplo para mostrarlo en otro idioma"""
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        if self.stateless:
+            exercise, error = self._rebuild_stateless(topic, exercise_id, locale)
+            return error if error is not None else exercise.to_dict()
+        record = self.store.get(exercise_id)
+        if record is None:
+            return _missing_exercise_result(self.store, exercise_id)
+        return record.to_dict(locale)
+    
+    def check_batch(self, topic: str, submissions: List[Tuple[str, Any]]) -> 'BatchGradeResult':
+        """Califica en bloque una lista de pares (exercise_id, respuesta)
+        
+        Las respuestas se agrupan por tipo de calificación y se comparan por columnas;
+        la retroalimentación se construye solo al pedirla al resultado. Los ids que no se
+        encuentran y los ejercicios que no se pueden calificar quedan en errors, fila a fila.
+        """
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        topic_obj = self.topics[topic]
+        
+        exercise_ids = [exercise_id for exercise_id, _ in submissions]
+        answers = [answer for _, answer in submissions]
+        exercises = []
+        errors = []
+        for exercise_id in exercise_ids:
+            if self.stateless:
+                exercise, error = self._rebuild_stateless(topic, exercise_id)
+            else:
+                record = self.store.get(exercise_id)
+                exercise = record.view() if record is not None else None
+                error = _missing_exercise_result(self.store, exercise_id) if record is None else None
+            exercises.append(exercise)
+            errors.append(error)
+        
+        correct = _grade_topic_batch(topic_obj, exercises, answers, errors)
+        return BatchGradeResult(topic_obj, exercise_ids, answers, exercises, errors, correct)
+    
+    def _generate_stateless(self, topic: str, difficulty: int, type_index: Optional[int] = None,
+                            locale: Optional[str] = None, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+        """Genera un ejercicio cuyo id es un token firmado que permite reconstruirlo (semilla del token tomada de rng)"""
+        topic_obj = self.topics[topic]
+        if rng is None:
+            rng, _ = self.random.next()
+        if type_index is None:
+            type_index = topic_obj.REGISTRY.alias.sample(rng)
+        seed = rng.getrandbits(64)
+        token = self.tokens.encode(topic_obj.ID_PREFIX, self._topic_names.index(topic),
+                                   type_index, difficulty, seed)
+        return topic_obj.build_exercise(topic_obj.EXERCISE_TYPES[type_index], token,
+                                        difficulty, random.Random(seed), locale)
+    
+    def _check_stateless(self, topic: str, token: str, user_answer: Any,
+                         locale: Optional[str] = None) -> Dict[str, Any]:
+        """Reconstruye el ejercicio a partir del token y califica la respuesta"""
+        exercise, error = self._rebuild_stateless(topic, token, locale)
+        if error is not None:
+            return error
+        return self.topics[topic].grade(exercise, user_answer)
+    
+    def _rebuild_stateless(self, topic: str, token: str,
+                           locale: Optional[str] = None) -> Tuple[Optional['ExerciseView'], Optional[Dict[str, Any]]]:
+        """Verifica el token y reconstruye el ejercicio (con el texto sin generar); devuelve (ejercicio, error)"""
+        try:
+            topic_index, type_index, difficulty, seed = self.tokens.decode(token)
+        except TokenExpiredError:
+            return None, {'error': 'Ejercicio expirado', 'expired': True}
+        except InvalidTokenError:
+            return None, {'error': 'Token inválido'}
+        
+        topic_obj = self.topics[topic]
+        if (topic_index >= len(self._topic_names) or self._topic_names[topic_index] != topic
+                or type_index >= len(topic_obj.EXERCISE_TYPES)):
+            return None, {'error': 'Ejercicio no encontrado'}
+        
+        record = topic_obj.build_record(topic_obj.EXERCISE_TYPES[type_index], token,
+                                        difficulty, random.Random(seed))
+        return record.view(locale), None
+    
+    def exercise_types(self, topic: str) -> List[Dict[str, Any]]:
+        """Tipos de ejercicio registrados en el tema, con su calificador, esquema y peso"""
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        return self.topics[topic].REGISTRY.describe()
+    
+    def replay_exercise(self, topic: str, difficulty: int, index: int,
+                        locale: Optional[str] = None) -> Dict[str, Any]:
+        """Regenera el ejercicio número index de una sesión creada con seed
+        
+        El ejercicio tiene el mismo tipo, parámetros y respuesta que el original, con un id nuevo.
+        """
+        if topic not in self.topics:
+            raise ValueError(f"Tema '{topic}' no encontrado")
+        if self.stateless:
+            raise ValueError("replay_exercise no está disponible en el modo sin estado: el token ya reproduce el ejercicio")
+        return self.topics[topic].replay_exercise(difficulty, index, locale)
+    
+    def _pool_batch(self, topic: str, difficulty: int, n: int) -> List[Tuple[Optional['ExerciseRecord'], Dict[str, Any]]]:
+        """Genera pares (registro, ejercicio) para la reserva sin guardarlos: se guardan al servirse
+        
+        El dict se genera de antemano para que servir no cueste más que sacarlo de la cola.
+        """
+        if self.stateless:
+            return [(None, exercise) for exercise in self.generate_batch(topic, difficulty, n)]
+        records = _generate_topic_records(self.topics[topic], difficulty, n, None, _BulkSampler())
+        return [(record, record.to_dict()) for record in records]
+    
+    def close(self):
+        """Detiene la reposición de la reserva y el perfilador, y cierra el almacén si es persistente"""
+        if self.pool is not None:
+            self.pool.close()
+        if self.profiler is not None:
+            self.profiler.close()
+        if hasattr(self.store, 'close'):
+            self.store.close()
+    
+    def store_metrics(self) -> Dict[str, Any]:
+        """Devuelve las métricas del almacén de ejercicios (tamaño, aciertos, fallos, desalojos)"""
+        return self.store.stats()
+    
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Devuelve las métricas de la reserva de ejercicios, o un dict vacío si está desactivada"""
+        return self.pool.stats() if self.pool is not None else {}
+    
+    def memo_metrics(self) -> Dict[str, Any]:
+        """Devuelve los aciertos de la memoria de respuestas y textos por tipo, o un dict vacío si está desactivada"""
+        return self.memo.stats() if self.memo is not None else {}
+    
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Métricas de uso (ver EngineMetrics) con el almacén y la reserva; requiere metrics=True"""
+        if self.metrics is None:
+            raise ValueError("Las métricas están desactivadas: crea el motor con metrics=True")
+        return self.metrics.snapshot(self)
+    
+    def metrics_prometheus(self) -> str:
+        """Métricas de uso en el formato de texto de Prometheus; requiere metrics=True"""
+        if self.metrics is None:
+            raise ValueError("Las métricas están desactivadas: crea el motor con metrics=True")
+        return self.metrics.to_prometheus(self)
+    
+    def enable_profiling(self, rate: float = 0.01, mode: str = 'sample', interval: float = 0.001) -> 'EngineProfiler':
+        """Empieza a perfilar una fracción rate de las llamadas, sin reiniciar el proceso (ver EngineProfiler)"""
+        previous = self.profiler
+        self.profiler = EngineProfiler(rate, mode, interval)
+        if previous is not None:
+            previous.close()
+        return self.profiler
+    
+    def disable_profiling(self) -> Optional['EngineProfiler']:
+        """Deja de perfilar; devuelve el perfilador con lo recogido hasta ahora"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.close()
+        return profiler
+    
+    def profile_collapsed(self, operation: Optional[str] = None, topic: Optional[str] = None,
+                          exercise_type: Optional[str] = None, difficulty: Optional[int] = None) -> str:
+        """Pilas plegadas de las llamadas perfiladas (ver EngineProfiler.collapsed); requiere perfilado"""
+        if self.profiler is None:
+            raise ValueError("El perfilado está desactivado: crea el motor con profile=... o llama a enable_profiling()")
+        return self.profiler.collapsed(operation, topic, exercise_type, difficulty)
+
+class ExerciseIdAllocator:
+    """Asigna ids de ejercicio únicos entre procesos: prefijo de nodo + contador monótono
+    
+    El prefijo de nodo son 40 bits aleatorios (o un node_id explícito) y se regenera
+    en los procesos hijos tras un fork, por lo que dos procesos nunca comparten espacio de ids.
+    Un node_id explícito no cambia tras el fork: cada proceso debe recibir el suyo.
+    """
+    
+    def __init__(self, node_id: Optional[int] = None):
+        if node_id is not None and not 0 <= node_id < 1 << 40:
+            raise ValueError("node_id debe ser un entero de 40 bits")
+        self._node_id = node_id
+        self._reset()
+        if node_id is None and hasattr(os, 'register_at_fork'):
+            reset = weakref.WeakMethod(self._reset)
+            os.register_at_fork(after_in_child=lambda: reset() and reset()())
+    
+    def _reset(self):
+        node_id = self._node_id
+        if node_id is None:
+            node_id = int.from_bytes(os.urandom(5), 'big')
+        self.node = f"{node_id:010x}"
+        # next() sobre itertools.count es atómico bajo el GIL
+        self._counter = itertools.count()
+    
+    def next_id(self, prefix: str) -> str:
+        """Devuelve un id nuevo con el prefijo de tema indicado"""
+        return f"{prefix}_{self.node}{next(self._counter):x}"
+    
+    def next_ids(self, prefix: str, n: int) -> List[str]:
+        """Reserva un bloque de n ids consecutivos"""
+        head = f"{prefix}_{self.node}"
+        return [f"{head}{value:x}" for value in itertools.islice(self._counter, n)]
+
+_MASK64 = (1 << 64) - 1
+
+def derive_seed(seed: int, index: int) -> int:
+    """Semilla de 64 bits del ejercicio index de una sesión con semilla seed (mezcla SplitMix64)"""
+    z = (seed + (index + 1) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+# Se incrementa en cada proceso hijo tras un fork para no heredar el estado de los generadores
+_FORK_GENERATION = [0]
+
+def _after_fork_in_child():
+    _FORK_GENERATION[0] += 1
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+class RandomSource:
+    """Fuente de generadores random.Random independientes para una sesión
+    
+    Con seed, el ejercicio número i usa Random(derive_seed(seed, i)): cualquier hilo o proceso
+    puede reproducirlo conociendo (seed, i), y la generación concurrente sigue siendo determinista
+    ejercicio a ejercicio. Sin semilla, cada hilo tiene su propio Random sembrado por el sistema.
+    Un rng explícito se usa tal cual y queda a cargo de quien lo pasa usarlo desde un solo hilo.
+    """
+    
+    def __init__(self, seed: Optional[Any] = None, rng: Optional[random.Random] = None):
+        if seed is not None and not isinstance(seed, int):
+            seed = int.from_bytes(hashlib.sha256(str(seed).encode('utf-8')).digest()[:8], 'big')
+        self.seed = seed & _MASK64 if seed is not None else None
+        self._rng = rng
+        self._local = threading.local()
+        # next() sobre itertools.count es atómico bajo el GIL
+        self._counter = itertools.count()
+    
+    def current(self) -> random.Random:
+        """Generador de la sesión para el hilo actual"""
+        if self._rng is not None:
+            return self._rng
+        local = self._local
+        if getattr(local, 'generation', None) != _FORK_GENERATION[0]:
+            local.rng = random.Random()
+            local.generation = _FORK_GENERATION[0]
+        return local.rng
+    
+    def next(self) -> Tuple[random.Random, Optional[int]]:
+        """Generador para el próximo ejercicio y su índice en la sesión (None sin semilla)"""
+        if self.seed is None:
+            return self.current(), None
+        index = next(self._counter)
+        return random.Random(derive_seed(self.seed, index)), index
+    
+    def at(self, index: int) -> random.Random:
+        """Generador del ejercicio número index, para reproducirlo"""
+        if self.seed is None:
+            raise ValueError("Solo se pueden reproducir ejercicios de una sesión con semilla")
+        return random.Random(derive_seed(self.seed, index))
+    
+    def next_seed(self) -> int:
+        """Semilla de 64 bits para un bloque (generate_batch), reproducible si la sesión tiene semilla"""
+        if self.seed is None:
+            return self.current().getrandbits(64)
+        return derive_seed(self.seed, next(self._counter))
+
+class ExerciseStore:
+    """Almacén acotado de ejercicios con expiración (TTL) y desalojo LRU
+    
+    Los temas guardan registros compactos (ExerciseRecord), no los diccionarios de la API.
+    Cualquier objeto con la misma interfaz (get, __setitem__, put_many, is_expired, stats, __len__)
+    puede usarse como almacén alternativo de MathEngine. Todas las operaciones toman un cerrojo
+    propio del almacén; ShardedExerciseStore reparte los ids entre varios para reducir la contención.
+    """
+    
+    def __init__(self, capacity: int = 10000, ttl: Optional[float] = 3600.0,
+                 tombstones: Optional[int] = None, clock=time.monotonic):
+        if capacity <= 0:
+            raise ValueError("La capacidad del almacén debe ser positiva")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self._items = OrderedDict()  # id -> (instante de expiración, ejercicio)
+        # Ids desalojados recientemente, para distinguir "expirado" de "no encontrado"
+        self._evicted = OrderedDict()
+        self._tombstone_capacity = capacity if tombstones is None else tombstones
+        # Un get también modifica el orden LRU: lecturas y escrituras toman el mismo cerrojo
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.collisions = 0
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __contains__(self, exercise_id: str) -> bool:
+        with self._lock:
+            entry = self._items.get(exercise_id)
+        return entry is not None and (entry[0] is None or entry[0] > self.clock())
+    
+    def __setitem__(self, exercise_id: str, exercise: Dict[str, Any]):
+        self.put(exercise_id, exercise)
+    
+    def put(self, exercise_id: str, exercise: Dict[str, Any]):
+        """Guarda un ejercicio, desalojando el menos usado si se supera la capacidad"""
+        now = self.clock()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        items = self._items
+        with self._lock:
+            if exercise_id in items:
+                # Un id repetido sobrescribiría otro ejercicio vigente
+                self.collisions += 1
+            items[exercise_id] = (expires_at, exercise)
+            items.move_to_end(exercise_id)
+            self._evicted.pop(exercise_id, None)
+            self._evict(now)
+    
+    def put_many(self, exercises: List['ExerciseRecord']):
+        """Guarda un bloque de ejercicios (con atributo id) y aplica el desalojo una sola vez al final"""
+        now = self.clock()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        items = self._items
+        evicted = self._evicted
+        with self._lock:
+            for exercise in exercises:
+                exercise_id = exercise.id
+                if exercise_id in items:
+                    self.collisions += 1
+                    items.move_to_end(exercise_id)
+                items[exercise_id] = (expires_at, exercise)
+                if evicted:
+                    evicted.pop(exercise_id, None)
+            self._evict(now)
+    
+    def evict_oldest(self, n: int) -> int:
+        """Desaloja hasta n ejercicios, empezando por los menos usados; devuelve cuántos salieron"""
+        items = self._items
+        with self._lock:
+            count = min(n, len(items))
+            for _ in range(count):
+                oldest_id, _ = items.popitem(last=False)
+                self.evictions += 1
+                self._remember_evicted(oldest_id)
+        return count
+    
+    def _evict(self, now: float):
+        """Purga entradas caducadas al frente de la cola y desaloja por capacidad (con el cerrojo tomado)"""
+        items = self._items
+        while items:
+            oldest_id, (oldest_expiry, _) = next(iter(items.items()))
+            if oldest_expiry is None or oldest_expiry > now:
+                break
+            items.popitem(last=False)
+            self.expirations += 1
+            self._remember_evicted(oldest_id)
+        
+        while len(items) > self.capacity:
+            oldest_id, _ = items.popitem(last=False)
+            self.evictions += 1
+            self._remember_evicted(oldest_id)
+    
+    def get(self, exercise_id: str) -> Optional[Dict[str, Any]]:
+        """Obtiene un ejercicio vigente o None si no existe o ha caducado"""
+        with self._lock:
+            entry = self._items.get(exercise_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, exercise = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._items[exercise_id]
+                self.expirations += 1
+                self.misses += 1
+                self._remember_evicted(exercise_id)
+                return None
+            
+            self._items.move_to_end(exercise_id)
+            self.hits += 1
+            return exercise
+    
+    def is_expired(self, exercise_id: str) -> bool:
+        """Indica si el ejercicio existió pero fue desalojado o caducó"""
+        return exercise_id in self._evicted
+    
+    def _remember_evicted(self, exercise_id: str):
+        """Registra un id desalojado en la lista acotada de lápidas (con el cerrojo tomado)"""
+        if self._tombstone_capacity <= 0:
+            return
+        self._evicted[exercise_id] = None
+        if len(self._evicted) > self._tombstone_capacity:
+            self._evicted.popitem(last=False)
+    
+    def clear(self):
+        """Vacía el almacén sin reiniciar las métricas"""
+        with self._lock:
+            self._items.clear()
+            self._evicted.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del almacén"""
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'capacity': self.capacity,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'collisions': self.collisions
+            }
+
+class ShardedExerciseStore:
+    """Almacén de ejercicios repartido en shards, cada uno un ExerciseStore con su propio cerrojo
+    
+    Cada id va al shard que indica su hash, así que los hilos que generan o califican ejercicios
+    distintos casi nunca esperan el mismo cerrojo. La capacidad es global: al superarla se desaloja
+    el ejercicio menos usado del shard más lleno, por lo que el orden LRU es exacto dentro de cada
+    shard y aproximado entre shards. El desalojo por capacidad toma un cerrojo propio y vuelve a
+    medir el exceso, para que dos escrituras simultáneas no desalojen dos veces por el mismo.
+    """
+    
+    def __init__(self, capacity: int = 10000, ttl: Optional[float] = 3600.0, shards: int = 16,
+                 tombstones: Optional[int] = None, clock=time.monotonic):
+        if capacity <= 0:
+            raise ValueError("La capacidad del almacén debe ser positiva")
+        if shards <= 0:
+            raise ValueError("El número de shards debe ser positivo")
+        self.capacity = capacity
+        self.ttl = ttl
+        tombstones = capacity if tombstones is None else tombstones
+        # Cada shard puede llegar a la capacidad total; el límite global lo aplica _trim
+        self._shards = tuple(ExerciseStore(capacity, ttl, -(-tombstones // shards), clock)
+                             for _ in range(shards))
+        # Tamaño total sin pasar por los cerrojos: len() de un dict es atómico bajo el GIL
+        self._shard_items = tuple(shard._items for shard in self._shards)
+        self._count = shards
+        self._trim_lock = threading.Lock()
+    
+    def _shard(self, exercise_id: str) -> ExerciseStore:
+        return self._shards[hash(exercise_id) % self._count]
+    
+    def __len__(self) -> int:
+        return sum(map(len, self._shard_items))
+    
+    def __contains__(self, exercise_id: str) -> bool:
+        return exercise_id in self._shard(exercise_id)
+    
+    def __setitem__(self, exercise_id: str, exercise: Dict[str, Any]):
+        self.put(exercise_id, exercise)
+    
+    def put(self, exercise_id: str, exercise: Dict[str, Any]):
+        """Guarda un ejercicio y, si se supera la capacidad total, desaloja en el shard más lleno"""
+        self._shards[hash(exercise_id) % self._count].put(exercise_id, exercise)
+        if sum(map(len, self._shard_items)) > self.capacity:
+            with self._trim_lock:
+                self._trim(sum(map(len, self._shard_items)) - self.capacity)
+    
+    def put_many(self, exercises: List['ExerciseRecord']):
+        """Guarda un bloque de ejercicios agrupados por shard y reparte el desalojo entre ellos"""
+        groups: Dict[int, List['ExerciseRecord']] = {}
+        shard_count = self._count
+        for exercise in exercises:
+            groups.setdefault(hash(exercise.id) % shard_count, []).append(exercise)
+        for index, group in groups.items():
+            self._shards[index].put_many(group)
+        if len(self) <= self.capacity:
+            return
+        
+        with self._trim_lock:
+            # Cada shard desaloja en proporción a los ejercicios que acaba de recibir
+            excess, pending = len(self) - self.capacity, len(exercises)
+            for index, group in groups.items():
+                if excess <= 0:
+                    break
+                excess -= self._shards[index].evict_oldest(-(-excess * len(group) // pending))
+                pending -= len(group)
+            self._trim(excess)
+    
+    def _trim(self, excess: int):
+        """Desaloja excess ejercicios empezando por el shard más lleno (con el cerrojo de desalojo tomado)"""
+        while excess > 0:
+            sizes = list(map(len, self._shard_items))
+            evicted = self._shards[sizes.index(max(sizes))].evict_oldest(excess)
+            if not evicted:
+                break
+            excess -= evicted
+    
+    def get(self, exercise_id: str) -> Optional[Dict[str, Any]]:
+        """Obtiene un ejercicio vigente o None si no existe o ha caducado"""
+        return self._shards[hash(exercise_id) % self._count].get(exercise_id)
+    
+    def is_expired(self, exercise_id: str) -> bool:
+        """Indica si el ejercicio existió pero fue desalojado o caducó"""
+        return self._shard(exercise_id).is_expired(exercise_id)
+    
+    def clear(self):
+        """Vacía todos los shards sin reiniciar las métricas"""
+        for shard in self._shards:
+            shard.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métricas agregadas de todos los shards"""
+        shard_stats = [shard.stats() for shard in self._shards]
+        totals = {name: sum(stats[name] for stats in shard_stats)
+                  for name in ('size', 'hits', 'misses', 'evictions', 'expirations', 'collisions')}
+        totals.update(capacity=self.capacity, ttl=self.ttl, shards=len(self._shards))
+        return totals
+
+class SQLiteExerciseStore:
+    """Almacén persistente de ejercicios en SQLite (modo WAL) con caché en memoria y escritura agrupada
+    
+    Los ejercicios sobreviven a un reinicio: un id emitido antes de un despliegue se sigue pudiendo
+    calificar después, y varios procesos pueden compartir el mismo archivo. Las escrituras no tocan
+    el disco: quedan pendientes y un hilo las confirma en una sola transacción cuando se juntan
+    batch_size o pasan flush_interval segundos (group commit), sin un fsync por ejercicio. Si el
+    proceso muere se pierde como mucho esa ventana; flush() y close() (también al salir del
+    intérprete) la vacían. Con flush_interval=0 cada escritura se confirma en el momento.
+    
+    Las lecturas pasan primero por una caché LRU de cache_size registros. La caducidad usa la hora
+    del sistema para que siga valiendo tras reiniciar; las filas caducadas se conservan otro ttl
+    como lápidas (is_expired) y después se borran. MathEngine enlaza el almacén con sus temas
+    (bind), que son los que saben reconstruir los registros guardados.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS exercises (
+            id TEXT PRIMARY KEY,
+            topic TEXT NOT NULL,
+            type TEXT NOT NULL,
+            difficulty INTEGER NOT NULL,
+            params BLOB NOT NULL,
+            seed_index INTEGER,
+            expires_at REAL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS exercises_expires_at ON exercises (expires_at);
+    """
+    SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+    
+    def __init__(self, path: str, ttl: Optional[float] = 3600.0, cache_size: int = 10000,
+                 batch_size: int = 1000, flush_interval: float = 0.05, synchronous: str = 'NORMAL',
+                 clock=time.time):
+        if cache_size <= 0 or batch_size <= 0:
+            raise ValueError("cache_size y batch_size deben ser positivos")
+        if synchronous.upper() not in self.SYNCHRONOUS:
+            raise ValueError(f"synchronous debe ser uno de {self.SYNCHRONOUS}")
+        self.path = os.fspath(path)
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        # Si el disco no da abasto, la escritura que supere este límite confirma en su propio hilo
+        self.max_pending = 8 * batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous.upper()
+        self.clock = clock
+        self._codec = None
+        self._factories: Dict[Tuple[str, str], Callable] = {}
+        self._topic_names: Dict[int, str] = {}
+        
+        self._lock = threading.Lock()  # caché y escrituras pendientes
+        self._db_lock = threading.Lock()  # conexión y transacciones
+        self._cache = OrderedDict()  # id -> (instante de expiración, registro)
+        self._pending: Dict[str, Tuple[Optional[float], Any]] = {}
+        # Lote que se está confirmando: sigue visible para las lecturas hasta el COMMIT
+        self._flushing: Dict[str, Tuple[Optional[float], Any]] = {}
+        self._db = None
+        self._db_pid = None
+        self._connect()
+        self._next_purge = 0.0
+        
+        self._wakeup = threading.Event()
+        self._full = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        close = weakref.WeakMethod(self.close)
+        self._atexit = lambda: close() and close()()
+        atexit.register(self._atexit)
+        
+        self.hits = 0
+        self.misses = 0
+        self.cache_hits = 0
+        self.disk_reads = 0
+        self.expirations = 0
+        self.collisions = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.errors = 0
+    
+    def _connect(self):
+        """Abre la conexión (de nuevo en un proceso hijo: una conexión SQLite no sobrevive a un fork)"""
+        # Solo si se usa el almacén persistente: no pesa en el arranque del motor
+        import sqlite3
+        self._db = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA synchronous={self.synchronous}')
+        self._db.executescript(self.SCHEMA)
+        self._db_pid = os.getpid()
+    
+    def _connection(self):
+        if self._db_pid != os.getpid():
+            self._connect()
+        return self._db
+    
+    def bind(self, engine: 'MathEngine'):
+        """Enlaza el almacén con los temas del motor, que guardan y reconstruyen los registros"""
+        self._codec = ExerciseBinaryCodec(engine)
+        self._topic_names = {id(topic): name for name, topic in engine.topics.items()}
+        self._factories = {(name, exercise_type.tag): topic._records[exercise_type.name]
+                           for name, topic in engine.topics.items() for exercise_type in topic.REGISTRY.types}
+    
+    def __len__(self) -> int:
+        """Ejercicios vigentes en disco más los pendientes de confirmar (aproximado)"""
+        with self._db_lock:
+            count, = self._connection().execute(
+                'SELECT COUNT(*) FROM exercises WHERE expires_at IS NULL OR expires_at > ?',
+                (self.clock(),)).fetchone()
+        with self._lock:
+            return count + len(self._pending) + len(self._flushing)
+    
+    def __contains__(self, exercise_id: str) -> bool:
+        entry = self._lookup(exercise_id)
+        return entry is not None and (entry[0] is None or entry[0] > self.clock())
+    
+    def __setitem__(self, exercise_id: str, exercise: 'ExerciseRecord'):
+        self.put(exercise_id, exercise)
+    
+    def put(self, exercise_id: str, exercise: 'ExerciseRecord'):
+        """Guarda un ejercicio en la caché y lo deja pendiente de confirmar en disco"""
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if exercise_id in self._cache or exercise_id in self._pending or exercise_id in self._flushing:
+                self.collisions += 1
+            self._pending[exercise_id] = self._cache_put(exercise_id, (expires_at, exercise))
+            self._trim_cache()
+            backlog = len(self._pending)
+        self._after_write(backlog)
+    
+    def put_many(self, exercises: List['ExerciseRecord']):
+        """Guarda un bloque de ejercicios (con atributo id) con una sola toma del cerrojo"""
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            pending = self._pending
+            flushing = self._flushing
+            cache = self._cache
+            for exercise in exercises:
+                exercise_id = exercise.id
+                if exercise_id in cache:
+                    self.collisions += 1
+                    cache.move_to_end(exercise_id)
+                elif exercise_id in pending or exercise_id in flushing:
+                    self.collisions += 1
+                cache[exercise_id] = pending[exercise_id] = (expires_at, exercise)
+            self._trim_cache()
+            backlog = len(pending)
+        self._after_write(backlog)
+    
+    def _cache_put(self, exercise_id: str, entry: Tuple[Optional[float], Any]) -> Tuple[Optional[float], Any]:
+        """Pone una entrada al final de la caché LRU (con el cerrojo tomado)"""
+        self._cache[exercise_id] = entry
+        self._cache.move_to_end(exercise_id)
+        return entry
+    
+    def _trim_cache(self):
+        cache = self._cache
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+    
+    def _after_write(self, backlog: int):
+        if not self.flush_interval or backlog >= self.max_pending:
+            self.flush()
+            return
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                    self._worker_pid = os.getpid()
+                    self._worker = threading.Thread(target=self._run, name='SQLiteExerciseStore-flush', daemon=True)
+                    self._worker.start()
+        self._wakeup.set()
+        if backlog >= self.batch_size:
+            self._full.set()
+    
+    def _run(self):
+        """Hilo de escritura: espera escrituras y las confirma por lotes"""
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Junta las escrituras de flush_interval segundos, o menos si se llena un lote
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception:
+                # El lote vuelve a quedar pendiente y se reintenta en la siguiente vuelta
+                self.errors += 1
+                self._stopped.wait(self.flush_interval)
+    
+    def flush(self) -> int:
+        """Confirma en disco las escrituras pendientes en una sola transacción; devuelve cuántas"""
+        with self._db_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            now = self.clock()
+            purge = self.ttl is not None and now >= self._next_purge
+            if not batch and not purge:
+                return 0
+            
+            db = self._connection()
+            try:
+                db.execute('BEGIN')
+                if batch:
+                    db.executemany('INSERT OR REPLACE INTO exercises VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   [self._row(exercise_id, expires_at, record)
+                                    for exercise_id, (expires_at, record) in batch.items()])
+                if purge:
+                    # Las filas caducadas hace más de un ttl ya no sirven ni como lápida
+                    db.execute('DELETE FROM exercises WHERE expires_at <= ?', (now - self.ttl,))
+                    self._next_purge = now + min(self.ttl, 60.0)
+                db.execute('COMMIT')
+            except BaseException:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                with self._lock:
+                    # Lo escrito después del lote fallido es más reciente y prevalece
+                    batch.update(self._pending)
+                    self._pending = batch
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+            self.flushes += 1
+            self.flushed += len(batch)
+            return len(batch)
+    
+    def _row(self, exercise_id: str, expires_at: Optional[float], record: 'ExerciseRecord') -> tuple:
+        if self._codec is None:
+            raise RuntimeError("SQLiteExerciseStore no está enlazado a un MathEngine (bind)")
+        return (exercise_id, self._topic_names[id(record.topic)], record.type, record.difficulty,
+                self._codec.encode_params(record.params()), record.seed_index, expires_at)
+    
+    def _lookup(self, exercise_id: str) -> Optional[Tuple[Optional[float], Any]]:
+        """(expiración, registro) de la caché, de lo pendiente o del disco; None si no existe"""
+        with self._lock:
+            entry = self._cache.get(exercise_id)
+            if entry is not None:
+                self._cache.move_to_end(exercise_id)
+                self.cache_hits += 1
+                return entry
+            entry = self._pending.get(exercise_id) or self._flushing.get(exercise_id)
+            if entry is not None:
+                return entry
+        
+        with self._db_lock:
+            row = self._connection().execute(
+                'SELECT topic, type, difficulty, params, seed_index, expires_at FROM exercises WHERE id = ?',
+                (exercise_id,)).fetchone()
+        if row is None:
+            return None
+        topic, tag, difficulty, params, seed_index, expires_at = row
+        factory = self._factories.get((topic, tag))
+        if factory is None:
+            # Tipo que ya no existe en esta versión del motor
+            return None
+        record = factory(exercise_id, difficulty, *self._codec.decode_params(params))
+        record.seed_index = seed_index
+        with self._lock:
+            self.disk_reads += 1
+            self._cache_put(exercise_id, (expires_at, record))
+            self._trim_cache()
+        return expires_at, record
+    
+    def get(self, exercise_id: str) -> Optional['ExerciseRecord']:
+        """Obtiene un ejercicio vigente o None si no existe o ha caducado"""
+        entry = self._lookup(exercise_id)
+        expired = entry is not None and entry[0] is not None and entry[0] <= self.clock()
+        # Los contadores se actualizan con el cerrojo: += no es atómico entre hilos
+        with self._lock:
+            if entry is None or expired:
+                self.misses += 1
+                self.expirations += expired
+                return None
+            self.hits += 1
+        return entry[1]
+    
+    def is_expired(self, exercise_id: str) -> bool:
+        """Indica si el ejercicio existió pero caducó"""
+        entry = self._lookup(exercise_id)
+        return entry is not None and entry[0] is not None and entry[0] <= self.clock()
+    
+    def clear(self):
+        """Vacía la caché, lo pendiente y el archivo sin reiniciar las métricas"""
+        with self._db_lock:
+            with self._lock:
+                self._cache.clear()
+                self._pending.clear()
+                self._flushing = {}
+            self._connection().execute('DELETE FROM exercises')
+    
+    def close(self):
+        """Detiene el hilo de escritura, confirma lo pendiente y cierra la conexión"""
+        if self._db is None:
+            return
+        atexit.unregister(self._atexit)
+        self._stopped.set()
+        self._wakeup.set()
+        self._full.set()
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            self._worker.join()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+            self._db_pid = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del almacén"""
+        with self._lock:
+            pending = len(self._pending)
+            cached = len(self._cache)
+        return {
+            'size': len(self),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'collisions': self.collisions,
+            'cache_size': cached,
+            'cache_hits': self.cache_hits,
+            'disk_reads': self.disk_reads,
+            'pending': pending,
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'errors': self.errors,
+            'path': self.path
+        }
+
+class _PoolQueue:
+    """Cola de ejercicios listos para un par (tema, dificultad) y sus contadores"""
+    
+    __slots__ = ('ready', 'hits', 'misses', 'refilled')
+    
+    def __init__(self):
+        # deque.append/popleft son atómicos: el hilo de reposición no necesita bloquear a los lectores
+        self.ready = deque()
+        self.hits = 0
+        self.misses = 0
+        self.refilled = 0
+
+class ExercisePool:
+    """Reserva de ejercicios pregenerados por (tema, dificultad) con reposición en segundo plano
+    
+    Servir un ejercicio es un popleft O(1). Cuando una cola baja de low_water se despierta
+    un hilo que la rellena hasta size generando bloques de refill_batch ejercicios con producer.
+    Las colas se crean al primer uso de cada par; warm() permite llenarlas por adelantado.
+    """
+    
+    def __init__(self, producer, size: int = 256, low_water: Optional[int] = None,
+                 refill_batch: Optional[int] = None, refill_interval: float = 0.05,
+                 background: bool = True):
+        if size <= 0:
+            raise ValueError("El tamaño de la reserva debe ser positivo")
+        self.producer = producer
+        self.size = size
+        self.low_water = size // 4 if low_water is None else low_water
+        self.refill_batch = size if refill_batch is None else max(1, refill_batch)
+        # Pausa entre bloques de reposición: limita el ritmo con que el hilo compite con las peticiones
+        self.refill_interval = refill_interval
+        self.background = background
+        self._queues: Dict[Tuple[str, int], _PoolQueue] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self.errors = 0
+    
+    def _queue(self, topic: str, difficulty: int) -> _PoolQueue:
+        key = (topic, difficulty)
+        queue = self._queues.get(key)
+        if queue is None:
+            with self._lock:
+                queue = self._queues.setdefault(key, _PoolQueue())
+        return queue
+    
+    def take(self, topic: str, difficulty: int) -> Optional[Any]:
+        """Saca el siguiente elemento listo (tal como lo devolvió producer), o None si la cola está vacía"""
+        queue = self._queue(topic, difficulty)
+        try:
+            exercise = queue.ready.popleft()
+            queue.hits += 1
+        except IndexError:
+            exercise = None
+            queue.misses += 1
+        if len(queue.ready) < self.low_water:
+            self._request_refill()
+        return exercise
+    
+    def warm(self, topic: str, difficulty: int):
+        """Llena de inmediato la cola de (topic, difficulty) en el hilo actual"""
+        self._refill(self._queue(topic, difficulty), topic, difficulty)
+    
+    def _request_refill(self):
+        if not self.background or self._stopped.is_set():
+            return
+        # Tras un fork el hilo no existe en el hijo: se vuelve a lanzar en el primer aviso
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                    self._worker_pid = os.getpid()
+                    self._worker = threading.Thread(target=self._run, name='ExercisePool-refill', daemon=True)
+                    self._worker.start()
+        self._wakeup.set()
+    
+    def _refill(self, queue: _PoolQueue, topic: str, difficulty: int) -> int:
+        """Completa una cola hasta size; devuelve cuántos ejercicios añadió"""
+        added = 0
+        while len(queue.ready) < self.size and not self._stopped.is_set():
+            count = min(self.refill_batch, self.size - len(queue.ready))
+            queue.ready.extend(self.producer(topic, difficulty, count))
+            queue.refilled += count
+            added += count
+            if self.refill_interval and len(queue.ready) < self.size:
+                self._stopped.wait(self.refill_interval)
+        return added
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            for (topic, difficulty), queue in list(self._queues.items()):
+                if len(queue.ready) >= self.low_water:
+                    continue
+                try:
+                    self._refill(queue, topic, difficulty)
+                except Exception:
+                    # Un fallo del generador no debe matar el hilo: la petición generará en línea
+                    self.errors += 1
+    
+    def close(self, timeout: Optional[float] = None):
+        """Detiene el hilo de reposición; las colas restantes se siguen sirviendo sin reponerse"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout)
+        self._worker = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la reserva: configuración y, por cada (tema, dificultad), tamaño y aciertos"""
+        queues = {}
+        for (topic, difficulty), queue in list(self._queues.items()):
+            queues[f"{topic}:{difficulty}"] = {
+                'ready': len(queue.ready),
+                'hits': queue.hits,
+                'misses': queue.misses,
+                'refilled': queue.refilled
+            }
+        hits = sum(queue['hits'] for queue in queues.values())
+        misses = sum(queue['misses'] for queue in queues.values())
+        return {
+            'size': self.size,
+            'low_water': self.low_water,
+            'refill_batch': self.refill_batch,
+            'refill_interval': self.refill_interval,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'errors': self.errors,
+            'queues': queues
+        }
+
+class InvalidTokenError(ValueError):
+    """Token de ejercicio mal formado o con firma inválida"""
+
+class TokenExpiredError(InvalidTokenError):
+    """Token de ejercicio con firma válida pero caducado"""
+
+class ExerciseTokenCodec:
+    """Codifica ejercicios como tokens compactos firmados con HMAC-SHA256
+    
+    El token contiene versión, tema, tipo de ejercicio, dificultad, instante de emisión
+    y la semilla con la que se generaron los parámetros, de modo que cualquier proceso
+    con la misma clave puede reconstruir el ejercicio y su respuesta correcta.
+    """
+    
+    VERSION = 1
+    _PAYLOAD = struct.Struct('>BBBBIQ')
+    _MAC_SIZE = 12
+    
+    def __init__(self, secret_key: Any, ttl: Optional[float] = None):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        self._key = secret_key
+        self.ttl = ttl
+    
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._key, payload, hashlib.sha256).digest()[:self._MAC_SIZE]
+    
+    def encode(self, prefix: str, topic_index: int, type_index: int, difficulty: int, seed: int) -> str:
+        """Genera el token firmado de un ejercicio"""
+        if not 0 <= difficulty <= 255:
+            raise ValueError("La dificultad debe estar entre 0 y 255 en el modo sin estado")
+        payload = self._PAYLOAD.pack(self.VERSION, topic_index, type_index, difficulty,
+                                     int(time.time()) & 0xFFFFFFFF, seed)
+        raw = payload + self._sign(payload)
+        return f"{prefix}.{base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')}"
+    
+    def decode(self, token: str) -> Tuple[int, int, int, int]:
+        """Verifica el token y devuelve (tema, tipo, dificultad, semilla)"""
+        try:
+            encoded = token.rsplit('.', 1)[-1]
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        except (AttributeError, ValueError):
+            raise InvalidTokenError("Token mal formado")
+        
+        size = self._PAYLOAD.size
+        if len(raw) != size + self._MAC_SIZE:
+            raise InvalidTokenError("Token mal formado")
+        payload, mac = raw[:size], raw[size:]
+        if not hmac.compare_digest(mac, self._sign(payload)):
+            raise InvalidTokenError("Firma inválida")
+        
+        version, topic_index, type_index, difficulty, issued_at, seed = self._PAYLOAD.unpack(payload)
+        if version != self.VERSION:
+            raise InvalidTokenError("Versión de token no soportada")
+        if self.ttl is not None and time.time() - issued_at > self.ttl:
+            raise TokenExpiredError("Token caducado")
+        return topic_index, type_index, difficulty, seed
+
+class _Series:
+    """Contadores e histograma de latencia de una combinación (operación, tema, tipo, dificultad)"""
+    
+    __slots__ = ('count', 'seconds', 'buckets', 'outcomes')
+    
+    def __init__(self, bucket_count: int):
+        self.count = 0
+        self.seconds = 0.0
+        # Un contador por límite de BUCKETS más el de +Inf (no acumulados)
+        self.buckets = [0] * (bucket_count + 1)
+        # Respuestas por resultado, en el orden de EngineMetrics.OUTCOMES
+        self.outcomes = [0, 0, 0]
+
+class EngineMetrics:
+    """Métricas de uso de MathEngine: llamadas, latencias y aciertos por (tema, tipo, dificultad)
+    
+    MathEngine(metrics=True) las registra en generate_exercise y check_answer; desactivadas (el
+    valor por defecto) el coste es comprobar que engine.metrics es None. snapshot() devuelve un
+    dict y to_prometheus() el formato de texto de Prometheus; los tamaños del almacén y de la
+    reserva se leen en el momento de exportar. Una instancia puede compartirse entre motores.
+    """
+    
+    # Límites de los histogramas de latencia, en segundos (de 10 µs a 100 ms)
+    BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+    OUTCOMES = ('correct', 'incorrect', 'error')
+    _OUTCOME_INDEX = {outcome: index for index, outcome in enumerate(OUTCOMES)}
+    
+    def __init__(self, buckets: Optional[Tuple[float, ...]] = None):
+        self.buckets = tuple(sorted(buckets)) if buckets else self.BUCKETS
+        self._series: Dict[Tuple[str, str, str, int], _Series] = {}
+        # Fallos de check_answer sin ejercicio (no encontrado, expirado, token inválido) por tema y motivo
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+    
+    def observe_generate(self, topic: str, exercise_type: str, difficulty: int, seconds: float):
+        """Registra un ejercicio generado y cuánto tardó"""
+        self._observe(('generate', topic, exercise_type, difficulty), seconds, None)
+    
+    def observe_check(self, topic: str, exercise_type: str, difficulty: int, outcome: str, seconds: float):
+        """Registra una respuesta calificada: outcome es 'correct', 'incorrect' o 'error' (excepción)"""
+        self._observe(('check', topic, exercise_type, difficulty), seconds, self._OUTCOME_INDEX[outcome])
+    
+    def observe_check_error(self, topic: str, reason: str):
+        """Registra un check_answer que no llegó a calificar (ejercicio no encontrado, expirado...)"""
+        with self._lock:
+            self._errors[topic, reason] = self._errors.get((topic, reason), 0) + 1
+    
+    def _observe(self, key: Tuple[str, str, str, int], seconds: float, outcome: Optional[int],
+                 _bisect=bisect.bisect_left):
+        bucket = _bisect(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.count += 1
+            series.seconds += seconds
+            series.buckets[bucket] += 1
+            if outcome is not None:
+                series.outcomes[outcome] += 1
+    
+    def reset(self):
+        """Pone a cero todas las métricas"""
+        with self._lock:
+            self._series.clear()
+            self._errors.clear()
+    
+    def snapshot(self, engine: Optional['MathEngine'] = None) -> Dict[str, Any]:
+        """Copia de las métricas como dict; con engine, incluye su almacén, su reserva y su memoria de respuestas"""
+        with self._lock:
+            series = [(key, value.count, value.seconds, list(value.buckets), dict(zip(self.OUTCOMES, value.outcomes)))
+                      for key, value in self._series.items()]
+            errors = dict(self._errors)
+        
+        snapshot = {'generate': [], 'check': [], 'check_errors': [], 'buckets': list(self.buckets)}
+        for (operation, topic, exercise_type, difficulty), count, seconds, buckets, outcomes in sorted(series):
+            entry = {
+                'topic': topic,
+                'type': exercise_type,
+                'difficulty': difficulty,
+                'count': count,
+                'seconds': seconds,
+                'mean_us': seconds / count * 1e6 if count else 0.0,
+                'buckets': buckets
+            }
+            if operation == 'check':
+                graded = outcomes.get('correct', 0) + outcomes.get('incorrect', 0)
+                entry.update(outcomes=outcomes,
+                             correct_rate=outcomes.get('correct', 0) / graded if graded else None)
+            snapshot[operation].append(entry)
+        snapshot['check_errors'] = [{'topic': topic, 'reason': reason, 'count': count}
+                                    for (topic, reason), count in sorted(errors.items())]
+        if engine is not None:
+            snapshot['store'] = engine.store_metrics()
+            snapshot['pool'] = engine.pool_metrics()
+            snapshot['memo'] = engine.memo_metrics()
+        return snapshot
+    
+    def to_prometheus(self, engine: Optional['MathEngine'] = None, prefix: str = 'mathmaster') -> str:
+        """Métricas en el formato de texto de Prometheus (versión 0.0.4)"""
+        snapshot = self.snapshot(engine)
+        lines = []
+        
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+        
+        def sample(name: str, labels: Dict[str, Any], value: Any):
+            rendered = ','.join(f'{key}="{_prometheus_label(value)}"' for key, value in labels.items())
+            lines.append(f"{prefix}_{name}{{{rendered}}} {value}" if rendered else f"{prefix}_{name} {value}")
+        
+        for operation, help_text in (('generate', 'Duración de generate_exercise'),
+                                     ('check', 'Duración de check_answer')):
+            header(f'{operation}_seconds', 'histogram', help_text)
+            for entry in snapshot[operation]:
+                labels = {'topic': entry['topic'], 'type': entry['type'], 'difficulty': entry['difficulty']}
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), entry['buckets']):
+                    cumulative += count
+                    sample(f'{operation}_seconds_bucket', dict(labels, le=_prometheus_number(bound)), cumulative)
+                sample(f'{operation}_seconds_sum', labels, repr(entry['seconds']))
+                sample(f'{operation}_seconds_count', labels, entry['count'])
+        
+        header('check_results_total', 'counter', 'Respuestas calificadas por resultado (correct, incorrect, error)')
+        for entry in snapshot['check']:
+            for outcome, count in entry['outcomes'].items():
+                sample('check_results_total', {'topic': entry['topic'], 'type': entry['type'],
+                                               'difficulty': entry['difficulty'], 'result': outcome}, count)
+        header('check_errors_total', 'counter', 'Llamadas a check_answer sin ejercicio que calificar')
+        for entry in snapshot['check_errors']:
+            sample('check_errors_total', {'topic': entry['topic'], 'reason': entry['reason']}, entry['count'])
+        
+        store = snapshot.get('store')
+        if store:
+            for name, kind, help_text in (('size', 'gauge', 'Ejercicios en el almacén'),
+                                          ('capacity', 'gauge', 'Capacidad del almacén'),
+                                          ('hits', 'counter', 'Lecturas del almacén que encontraron el ejercicio'),
+                                          ('misses', 'counter', 'Lecturas del almacén sin ejercicio vigente'),
+                                          ('evictions', 'counter', 'Ejercicios desalojados por capacidad'),
+                                          ('expirations', 'counter', 'Ejercicios caducados')):
+                if isinstance(store.get(name), (int, float)):
+                    metric = f'store_{name}_total' if kind == 'counter' else f'store_{name}'
+                    header(metric, kind, help_text)
+                    sample(metric, {}, store[name])
+        pool = snapshot.get('pool')
+        if pool:
+            header('pool_ready', 'gauge', 'Ejercicios listos en la reserva por tema y dificultad')
+            for key, queue in pool['queues'].items():
+                topic, difficulty = key.rsplit(':', 1)
+                sample('pool_ready', {'topic': topic, 'difficulty': difficulty}, queue['ready'])
+        memo = snapshot.get('memo')
+        if memo:
+            for name, kind, help_text in (('hits', 'counter', 'Ejercicios servidos desde la memoria de respuestas'),
+                                          ('misses', 'counter', 'Ejercicios que hubo que construir y memorizar'),
+                                          ('size', 'gauge', 'Entradas en la memoria de respuestas')):
+                metric = f'memo_{name}_total' if kind == 'counter' else f'memo_{name}'
+                header(metric, kind, help_text)
+                for exercise_type, entry in memo['types'].items():
+                    sample(metric, {'type': exercise_type}, entry[name])
+        return '\n'.join(lines) + '\n'
+
+def _prometheus_label(value: Any) -> str:
+    """Valor de etiqueta con el escape del formato de texto de Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _prometheus_number(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(value)
+
+# Motivo, para las métricas, de cada error de check_answer sin ejercicio que calificar
+_CHECK_ERROR_REASONS = {'Ejercicio no encontrado': 'not_found', 'Ejercicio expirado': 'expired',
+                        'Token inválido': 'invalid_token'}
+
+class _ProfileSession:
+    """Llamada perfilada en curso: el hilo, el marco desde el que se llamó y lo recogido hasta ahora"""
+    
+    __slots__ = ('thread_id', 'root', 'start', 'samples', 'profile')
+    
+    def __init__(self, root, profile=None):
+        self.thread_id = threading.get_ident()
+        self.root = root
+        self.start = time.perf_counter()
+        self.samples: List[Tuple[str, ...]] = []
+        self.profile = profile
+
+class EngineProfiler:
+    """Perfilado por muestreo de MathEngine, agregado por (operación, tema, tipo, dificultad)
+    
+    Solo se perfila una fracción rate de las llamadas a generate_exercise y check_answer, elegida
+    al azar. Con mode='sample' un hilo toma cada interval segundos la pila de las llamadas elegidas
+    que están en curso: apenas las frena, pero necesita el GIL, así que con código que no lo suelta
+    el intervalo real es de al menos sys.getswitchinterval() (5 ms por defecto) y solo las llamadas
+    lentas reúnen muestras. Con mode='cprofile' cada llamada elegida pasa entera por cProfile (una
+    a la vez en el proceso): también cuenta las llamadas cortas, a cambio de que cada llamada
+    elegida tarde del orden de un milisegundo más (sobre todo, sumar sus estadísticas).
+    collapsed() devuelve las pilas en el formato plegado de flamegraph.pl; rate se puede cambiar
+    y collapsed() o reset() llamarse en cualquier momento, sin reiniciar el proceso.
+    """
+    
+    MODES = ('sample', 'cprofile')
+    
+    def __init__(self, rate: float = 0.01, mode: str = 'sample', interval: float = 0.001,
+                 seed: Optional[int] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"mode debe ser uno de {self.MODES}")
+        if not 0 <= rate <= 1:
+            raise ValueError("rate debe estar entre 0 y 1")
+        if interval <= 0:
+            raise ValueError("interval debe ser positivo")
+        self.rate = rate
+        self.mode = mode
+        self.interval = interval
+        # Generador propio: elegir qué llamadas se perfilan no altera la secuencia de ejercicios del motor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str, str, int], List[float]] = {}  # clave -> [llamadas, segundos]
+        self._stacks: Dict[Tuple[str, str, str, int], Dict[Tuple[str, ...], int]] = {}
+        self._stats: Dict[Tuple[str, str, str, int], Any] = {}  # clave -> pstats.Stats
+        # cProfile: una sola llamada perfilada a la vez (desde Python 3.12 el perfilador es global)
+        self._cprofile_busy = threading.Lock()
+        self.skipped = 0
+        
+        # mode='sample': llamadas elegidas en curso, por hilo, y el hilo que las muestrea
+        self._active: Dict[int, _ProfileSession] = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._sampler_pid = None
+    
+    def start(self) -> Optional[_ProfileSession]:
+        """Decide si se perfila la llamada que empieza en el marco de quien llama; devuelve su sesión o None"""
+        if self._random.random() >= self.rate:
+            return None
+        if self.mode == 'cprofile':
+            if not self._cprofile_busy.acquire(blocking=False):
+                self.skipped += 1
+                return None
+            import cProfile
+            session = _ProfileSession(None, cProfile.Profile())
+            session.profile.enable()
+            return session
+        if self._stopped.is_set():
+            return None
+        session = _ProfileSession(sys._getframe(1))
+        self._active[session.thread_id] = session
+        if self._sampler is None or self._sampler_pid != os.getpid() or not self._sampler.is_alive():
+            self._start_sampler()
+        self._wakeup.set()
+        return session
+    
+    def stop(self, session: _ProfileSession, operation: str, topic: str, exercise_type: str, difficulty: int):
+        """Termina la sesión de start() y suma lo recogido a (operación, tema, tipo, dificultad)"""
+        seconds = time.perf_counter() - session.start
+        self.discard(session)
+        key = (operation, topic, exercise_type, difficulty)
+        with self._lock:
+            calls = self._calls.setdefault(key, [0, 0.0])
+            calls[0] += 1
+            calls[1] += seconds
+            if session.profile is not None:
+                stats = self._stats.get(key)
+                if stats is None:
+                    import pstats
+                    self._stats[key] = pstats.Stats(session.profile)
+                else:
+                    stats.add(session.profile)
+            else:
+                stacks = self._stacks.setdefault(key, {})
+                for stack in session.samples:
+                    stacks[stack] = stacks.get(stack, 0) + 1
+    
+    def discard(self, session: _ProfileSession):
+        """Termina la sesión de start() sin registrar nada (la llamada no llegó a generar o calificar)"""
+        if session.profile is not None:
+            session.profile.disable()
+            self._cprofile_busy.release()
+        elif self._active.get(session.thread_id) is session:
+            del self._active[session.thread_id]
+    
+    def _start_sampler(self):
+        with self._lock:
+            if self._sampler is None or self._sampler_pid != os.getpid() or not self._sampler.is_alive():
+                self._sampler_pid = os.getpid()
+                self._sampler = threading.Thread(target=self._run, name='EngineProfiler-sampler', daemon=True)
+                self._sampler.start()
+    
+    def _run(self):
+        """Hilo muestreador: mientras haya llamadas elegidas en curso, toma su pila cada interval segundos"""
+        while not self._stopped.is_set():
+            if not self._active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for session in tuple(self._active.values()):
+                frame = frames.get(session.thread_id)
+                stack = _frame_stack(frame, session.root) if frame is not None else None
+                # None: la llamada terminó entre la lectura de las pilas y ahora
+                if stack:
+                    session.samples.append(stack)
+    
+    def collapsed(self, operation: Optional[str] = None, topic: Optional[str] = None,
+                  exercise_type: Optional[str] = None, difficulty: Optional[int] = None) -> str:
+        """Pilas plegadas, una por línea ('marco;marco;... peso'), para flamegraph.pl, inferno o speedscope
+        
+        Cada pila empieza por la operación, el tema, el tipo y la dificultad (d1, d2, d3). El peso
+        es el número de muestras con mode='sample' y los microsegundos de tiempo propio con
+        'cprofile'. Los argumentos filtran las combinaciones que se incluyen.
+        """
+        wanted = (operation, topic, exercise_type, difficulty)
+        with self._lock:
+            combined = {key: dict(stacks) for key, stacks in self._stacks.items()}
+            for key, stats in self._stats.items():
+                combined[key] = _pstats_stacks(stats.stats)
+        
+        lines = []
+        for key in sorted(combined):
+            if any(value is not None and value != part for value, part in zip(wanted, key)):
+                continue
+            prefix = ';'.join(key[:3]) + f';d{key[3]}'
+            for stack, weight in sorted(combined[key].items()):
+                weight = int(round(weight))
+                if weight > 0:
+                    lines.append(f"{prefix};{';'.join(stack)} {weight}")
+        return '\n'.join(lines) + '\n' if lines else ''
+    
+    def dump(self, file, **filters) -> int:
+        """Escribe collapsed(**filters) en file (ruta o archivo de texto abierto); devuelve cuántas pilas"""
+        text = self.collapsed(**filters)
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'w', encoding='utf-8') as handle:
+                handle.write(text)
+        else:
+            file.write(text)
+        return text.count('\n')
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """Llamadas perfiladas por (operación, tema, tipo, dificultad), ordenadas de más a menos lentas"""
+        with self._lock:
+            rows = [{
+                'operation': operation,
+                'topic': topic,
+                'type': exercise_type,
+                'difficulty': difficulty,
+                'calls': calls,
+                'seconds': seconds,
+                'mean_us': seconds / calls * 1e6,
+                'samples': sum(self._stacks.get((operation, topic, exercise_type, difficulty), {}).values())
+            } for (operation, topic, exercise_type, difficulty), (calls, seconds) in self._calls.items()]
+        return sorted(rows, key=lambda row: row['mean_us'], reverse=True)
+    
+    def stats(self, operation: str, topic: str, exercise_type: str, difficulty: int) -> Optional[Any]:
+        """pstats.Stats acumulado de una combinación (solo mode='cprofile'), o None si no hay"""
+        with self._lock:
+            return self._stats.get((operation, topic, exercise_type, difficulty))
+    
+    def reset(self):
+        """Descarta todo lo recogido"""
+        with self._lock:
+            self._calls.clear()
+            self._stacks.clear()
+            self._stats.clear()
+            self.skipped = 0
+    
+    def close(self):
+        """Detiene el hilo muestreador; lo recogido sigue disponible"""
+        self._stopped.set()
+        self._wakeup.set()
+
+@functools.lru_cache(maxsize=4096)
+def _frame_label(filename: str, line: int, name: str) -> str:
+    """Nombre de un marco en las pilas plegadas: función (archivo:línea)"""
+    if filename == '~':
+        # Funciones integradas, tal como las nombra cProfile
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def _frame_stack(frame, root) -> Optional[Tuple[str, ...]]:
+    """Pila desde justo debajo de root hasta frame, de fuera hacia dentro; None si root ya no está en ella"""
+    stack = []
+    while frame is not None:
+        if frame is root:
+            stack.reverse()
+            return tuple(stack)
+        code = frame.f_code
+        stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return None
+
+def _pstats_stacks(stats: Dict[tuple, tuple], max_depth: int = 64) -> Dict[Tuple[str, ...], float]:
+    """Reparte el tiempo propio de cada función de cProfile entre los caminos por los que se llegó a ella
+    
+    cProfile solo guarda pares llamador-llamado, no pilas completas: a cada camino le toca la parte
+    del tiempo de la función proporcional al tiempo acumulado de las llamadas que llegaron por él.
+    """
+    children: Dict[tuple, List[Tuple[tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            if caller in stats:
+                children.setdefault(caller, []).append((func, edge[3]))
+    stacks: Dict[Tuple[str, ...], float] = {}
+    
+    def walk(func: tuple, path: Tuple[str, ...], on_path: frozenset, share: float):
+        own, total = stats[func][2], stats[func][3]
+        path = path + (_frame_label(*func),)
+        if own * share > 0:
+            stacks[path] = stacks.get(path, 0.0) + own * share * 1e6
+        if len(path) >= max_depth:
+            return
+        for child, edge_total in children.get(func, ()):
+            child_total = stats[child][3]
+            if child not in on_path and child_total > 0:
+                walk(child, path, on_path | {child}, share * edge_total / child_total)
+    
+    for func, entry in stats.items():
+        # Raíces: llamadas desde fuera de lo perfilado, salvo la que apaga el propio perfilador
+        if not any(caller in stats for caller in entry[4]) and '_lsprof.Profiler' not in func[2]:
+            walk(func, (), frozenset((func,)), 1.0)
+    return stacks
+
+def _missing_exercise_result(store, exercise_id: str) -> Dict[str, Any]:
+    """Resultado de check_answer cuando el ejercicio no está en el almacén"""
+    if store.is_expired(exercise_id):
+        return {'error': 'Ejercicio expirado', 'expired': True}
+    return {'error': 'Ejercicio no encontrado'}
+
+class LazyText:
+    """Texto pendiente de generar: clave de plantilla y valores con que rellenarla
+    
+    deferred nombra los valores que son funciones: se llaman al generar el texto, para no
+    hacer cálculos que solo sirven a una explicación que quizá nadie lea.
+    """
+    
+    __slots__ = ('key', 'values', 'deferred')
+    
+    def __init__(self, key: str, values: Dict[str, Any], deferred: Tuple[str, ...] = ()):
+        self.key = key
+        self.values = values
+        self.deferred = deferred
+    
+    def __repr__(self) -> str:
+        return f"LazyText({self.key!r})"
+
+def _text(key: str, deferred: Optional[Dict[str, Any]] = None, **values) -> LazyText:
+    """Marca un campo de texto para generarlo solo cuando se lea"""
+    if deferred:
+        values.update(deferred)
+        return LazyText(key, values, tuple(deferred))
+    return LazyText(key, values)
+
+class TemplateCatalog:
+    """Plantillas de texto por idioma, compiladas una sola vez
+    
+    Las plantillas usan la sintaxis de str.format con nombres de campo simples, más dos
+    especificaciones propias: {campo:sí|no} elige la primera alternativa si el valor es
+    verdadero y {campo:*sep} une los elementos de una lista con sep. Cada plantilla se
+    compila una sola vez a una función que rellena sus trozos, sin volver a analizarla.
+    Un idioma sin la clave pedida recurre a DEFAULT_LOCALE y, después, al catálogo padre.
+    """
+    
+    _PARSER = string.Formatter()
+    
+    def __init__(self, templates: Dict[str, Dict[str, str]], parent: Optional['TemplateCatalog'] = None):
+        self.parent = parent
+        # idioma -> clave -> plantilla compilada, una vez resueltos los idiomas de respaldo
+        self._resolved: Dict[str, Dict[str, Callable[[Dict[str, Any]], str]]] = {}
+        self._compiled = {
+            locale: {key: self._compile(template) for key, template in entries.items()}
+            for locale, entries in templates.items()
+        }
+    
+    @classmethod
+    def _compile(cls, template: str) -> Callable[[Dict[str, Any]], str]:
+        """Convierte la plantilla en una función values -> texto, con los campos que usa en su atributo fields
+        
+        Los literales quedan en una plantilla de % con un %s por campo: los valores se sacan
+        juntos con itemgetter y solo los campos con especificación pasan por su conversión.
+        """
+        literals = []
+        layout = []
+        fields = []
+        conversions = []  # (posición del campo, valor -> texto)
+        for literal, field, spec, conversion in cls._PARSER.parse(template):
+            literals.append(literal)
+            layout.append(literal.replace('%', '%%'))
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion:
+                raise ValueError(f"Campo de plantilla no admitido: {field!r} en {template!r}")
+            if spec:
+                conversions.append((len(fields), cls._conversion(spec)))
+            fields.append(field)
+            layout.append('%s')
+        
+        render = cls._renderer(literals, ''.join(layout), fields, tuple(conversions))
+        render.fields = frozenset(fields)
+        return render
+    
+    @staticmethod
+    def _renderer(literals: List[str], layout: str, fields: List[str],
+                  conversions: Tuple[Tuple[int, Callable[[Any], str]], ...]) -> Callable[[Dict[str, Any]], str]:
+        """Función values -> texto más directa para los campos y conversiones de la plantilla"""
+        if not fields:
+            text = ''.join(literals)
+            return lambda values: text
+        if len(fields) == 1:
+            field, = fields
+            if conversions:
+                convert = conversions[0][1]
+                return lambda values: layout % (convert(values[field]),)
+            return lambda values: layout % (values[field],)
+        
+        get = operator.itemgetter(*fields)
+        if not conversions:
+            return lambda values: layout % get(values)
+        
+        def render(values: Dict[str, Any]) -> str:
+            parts = list(get(values))
+            for position, convert in conversions:
+                parts[position] = convert(parts[position])
+            return layout % tuple(parts)
+        return render
+    
+    @staticmethod
+    def _conversion(spec: str) -> Callable[[Any], str]:
+        """Función valor -> texto de una especificación: *sep, sí|no o una de format()"""
+        if spec[0] == '*':
+            separator = spec[1:]
+            return lambda value: separator.join(map(str, value))
+        if '|' in spec:
+            yes, no = spec.split('|', 1)
+            return lambda value: yes if value else no
+        return lambda value: format(value, spec)
+    
+    def locales(self) -> List[str]:
+        """Idiomas con al menos una plantilla"""
+        locales = set(self._compiled)
+        if self.parent is not None:
+            locales.update(self.parent.locales())
+        return sorted(locales)
+    
+    def lookup(self, key: str, locale: str = DEFAULT_LOCALE) -> Callable[[Dict[str, Any]], str]:
+        """Plantilla compilada de key en locale: una función values -> texto"""
+        try:
+            return self._resolved[locale][key]
+        except KeyError:
+            pass
+        for candidate in (locale, DEFAULT_LOCALE):
+            compiled = self._compiled.get(candidate, {}).get(key)
+            if compiled is not None:
+                break
+        else:
+            if self.parent is None:
+                raise KeyError(key)
+            compiled = self.parent.lookup(key, locale)
+        self._resolved.setdefault(locale, {})[key] = compiled
+        return compiled
+    
+    def render(self, key: str, locale: str = DEFAULT_LOCALE, values: Optional[Dict[str, Any]] = None) -> str:
+        """Genera el texto de key en locale"""
+        return self.lookup(key, locale)(values or {})
+    
+    def render_text(self, text: LazyText, locale: str = DEFAULT_LOCALE) -> str:
+        """Genera un LazyText en locale, calculando antes solo los valores diferidos que usa la plantilla"""
+        template = self.lookup(text.key, locale)
+        values = text.values
+        if text.deferred:
+            values = dict(values)
+            for name in text.deferred:
+                if name in template.fields:
+                    values[name] = values[name]()
+        return template(values)
+
+# Mensajes comunes a todos los temas
+MESSAGES = TemplateCatalog({
+    'es': {
+        'feedback.correct': '¡Correcto! ',
+        'feedback.incorrect': 'Incorrecto. '
+    },
+    'en': {
+        'feedback.correct': 'Correct! ',
+        'feedback.incorrect': 'Incorrect. '
+    }
+})
+
+class ExerciseView(Mapping):
+    """Ejercicio de solo lectura cuyos campos de texto se generan al leerlos
+    
+    Se comporta como el dict de la API (mismas claves y orden); el texto se genera en el
+    idioma de la vista y se guarda para lecturas posteriores.
+    """
+    
+    __slots__ = ('_data', '_catalog', 'locale')
+    
+    def __init__(self, data: Dict[str, Any], catalog: TemplateCatalog, locale: str = DEFAULT_LOCALE):
+        self._data = data
+        self._catalog = catalog
+        self.locale = locale
+    
+    def __getitem__(self, key: str) -> Any:
+        value = self._data[key]
+        if type(value) is LazyText:
+            value = self._catalog.render_text(value, self.locale)
+            self._data[key] = value
+        return value
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._data else default
+    
+    def __iter__(self):
+        return iter(self._data)
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._data
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Copia con todos los campos de texto ya generados"""
+        return _render_fields(self._data, self._catalog, self.locale)
+
+# Campos de un ejercicio que pueden contener texto pendiente de generar
+_TEXT_FIELDS = ('question', 'explanation')
+
+def _render_fields(data: Dict[str, Any], catalog: TemplateCatalog, locale: str) -> Dict[str, Any]:
+    """Copia de data con cada LazyText sustituido por su texto en locale"""
+    exercise = dict(data)
+    for field in _TEXT_FIELDS:
+        value = exercise.get(field)
+        if type(value) is LazyText:
+            if value.deferred:
+                exercise[field] = catalog.render_text(value, locale)
+            else:
+                exercise[field] = catalog.lookup(value.key, locale)(value.values)
+    return exercise
+
+def _message(topic, exercise, key: str, **values) -> str:
+    """Mensaje del catálogo del tema en el idioma del ejercicio (el del tema si es un dict)"""
+    locale = exercise.locale if isinstance(exercise, ExerciseView) else topic.locale
+    return topic.REGISTRY.catalog.render(key, locale, values)
+
+class ExerciseRecord:
+    """Ejercicio guardado en forma compacta: id, tipo, dificultad y parámetros numéricos
+    
+    El enunciado, la explicación y la respuesta no se guardan: view() los reconstruye con el
+    constructor del tema (el texto, solo al leerlo) y to_dict() devuelve el mismo diccionario
+    que la API ha devuelto siempre, en el idioma pedido.
+    Cada subclase declara en FIELDS los parámetros de su clase de ejercicio.
+    """
+    
+    __slots__ = ('id', 'type', 'difficulty', 'seed_index', 'topic')
+    FIELDS: Tuple[str, ...] = ()
+    
+    def __init__(self, topic, exercise_type: str, exercise_id: str, difficulty: int, *values):
+        self.topic = topic
+        self.type = exercise_type
+        self.id = exercise_id
+        self.difficulty = difficulty
+        self.seed_index = None
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+    
+    def params(self) -> tuple:
+        """Parámetros en el orden que espera el constructor del tema"""
+        return tuple(getattr(self, name) for name in self.FIELDS)
+    
+    def memo_key(self) -> tuple:
+        """Dificultad y parámetros como clave de ExerciseMemo (todos hashables)"""
+        return (self.difficulty,) + self.params()
+    
+    @staticmethod
+    def memo_params(key: tuple) -> tuple:
+        """Parámetros del constructor a partir de la clave de memo_key() sin la dificultad"""
+        return key
+    
+    def view(self, locale: Optional[str] = None) -> ExerciseView:
+        """Ejercicio con la respuesta calculada y el texto pendiente de generar"""
+        topic = self.topic
+        if topic.memo is not None:
+            exercise = topic.memo.view(self, locale or topic.locale)
+            if exercise is not None:
+                return exercise
+        data = topic._renderers[self.type](self.id, self.difficulty, *self.params())
+        if self.seed_index is not None:
+            data['seed_index'] = self.seed_index
+        return ExerciseView(data, topic.REGISTRY.catalog, locale or topic.locale)
+    
+    def to_dict(self, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Ejercicio completo con el formato de la API"""
+        topic = self.topic
+        if topic.memo is not None:
+            exercise = topic.memo.to_dict(self, locale or topic.locale)
+            if exercise is not None:
+                return exercise
+        data = topic._renderers[self.type](self.id, self.difficulty, *self.params())
+        if self.seed_index is not None:
+            data['seed_index'] = self.seed_index
+        return _render_fields(data, topic.REGISTRY.catalog, locale or topic.locale)
+    
+    def __repr__(self) -> str:
+        params = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({self.id!r}, {self.type!r}, {params})"
+
+class NumberRecord(ExerciseRecord):
+    """Ejercicio sobre un único número"""
+    __slots__ = ('number',)
+    FIELDS = ('number',)
+    
+    def params(self) -> tuple:
+        return (self.number,)
+
+class NumberListRecord(ExerciseRecord):
+    """Ejercicio sobre una lista de números (MCD, MCM)"""
+    __slots__ = ('numbers',)
+    FIELDS = ('numbers',)
+    
+    def params(self) -> tuple:
+        return (self.numbers,)
+    
+    def memo_key(self) -> tuple:
+        return (self.difficulty, tuple(self.numbers))
+    
+    @staticmethod
+    def memo_params(key: tuple) -> tuple:
+        return (list(key[0]),)
+
+class DivisibilityRecord(ExerciseRecord):
+    """Ejercicio de divisibilidad de number entre divisor"""
+    __slots__ = ('number', 'divisor')
+    FIELDS = ('number', 'divisor')
+    
+    def params(self) -> tuple:
+        return (self.number, self.divisor)
+
+class PropertyRecord(ExerciseRecord):
+    """Ejercicio de propiedades de las operaciones con sus operandos"""
+    __slots__ = ('prop', 'a', 'b', 'c')
+    FIELDS = ('prop', 'a', 'b', 'c')
+    
+    def params(self) -> tuple:
+        return (self.prop, self.a, self.b, self.c)
+
+class FractionRecord(ExerciseRecord):
+    """Ejercicio sobre una fracción num/den"""
+    __slots__ = ('num', 'den')
+    FIELDS = ('num', 'den')
+    
+    def params(self) -> tuple:
+        return (self.num, self.den)
+
+class FractionPairRecord(ExerciseRecord):
+    """Ejercicio sobre dos fracciones num1/den1 y num2/den2"""
+    __slots__ = ('num1', 'den1', 'num2', 'den2')
+    FIELDS = ('num1', 'den1', 'num2', 'den2')
+    
+    def params(self) -> tuple:
+        return (self.num1, self.den1, self.num2, self.den2)
+
+class PowerRecord(ExerciseRecord):
+    """Ejercicio de potencia base^exp"""
+    __slots__ = ('base', 'exp')
+    FIELDS = ('base', 'exp')
+    
+    def params(self) -> tuple:
+        return (self.base, self.exp)
+
+class ExponentLawRecord(ExerciseRecord):
+    """Ejercicio de una ley de exponentes"""
+    __slots__ = ('law', 'base', 'exp1', 'exp2')
+    FIELDS = ('law', 'base', 'exp1', 'exp2')
+    
+    def params(self) -> tuple:
+        return (self.law, self.base, self.exp1, self.exp2)
+
+class RootRecord(ExerciseRecord):
+    """Ejercicio de raíz index-ésima de number"""
+    __slots__ = ('number', 'index')
+    FIELDS = ('number', 'index')
+    
+    def params(self) -> tuple:
+        return (self.number, self.index)
+
+class RadicalOperationRecord(ExerciseRecord):
+    """Ejercicio de operación con radicales; operands depende de la operación"""
+    __slots__ = ('operation', 'operands')
+    FIELDS = ('operation', 'operands')
+    
+    def __init__(self, topic, exercise_type: str, exercise_id: str, difficulty: int, operation: str, *operands):
+        super().__init__(topic, exercise_type, exercise_id, difficulty)
+        self.operation = operation
+        self.operands = operands
+    
+    def params(self) -> tuple:
+        return (self.operation,) + self.operands
+
+class _MemoEntry:
+    """Ejercicio memorizado: el dict del constructor del tema y sus textos ya generados por idioma"""
+    
+    __slots__ = ('data', 'texts', 'mutable')
+    
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.texts: Dict[str, Dict[str, str]] = {}
+        # Valores que se copian en cada ejercicio para que quien lo recibe pueda modificarlos
+        self.mutable = tuple(key for key, value in data.items() if isinstance(value, (list, dict, set)))
+
+class ExerciseMemo:
+    """Memoria acotada de respuestas y textos por (tipo, dificultad, parámetros)
+    
+    El enunciado, la respuesta y la explicación dependen solo del tipo, la dificultad y los
+    parámetros, que se repiten mucho (solo hay 625 pares para el MCD de dificultad 1). Con
+    MathEngine(memo=True) cada combinación se construye una vez y cada texto se genera una vez
+    por idioma; los ejercicios siguientes, y la calificación del propio ejercicio, copian el
+    resultado con su propio id. Cada tipo tiene su propia caché functools.lru_cache de size
+    entradas, así que las combinaciones que no se repiten (el MCM de tres números de dificultad
+    3) solo desplazan a las de su tipo; sizes fija otro límite por tipo (0: ese tipo no se
+    memoriza). Una instancia puede compartirse entre motores.
+    """
+    
+    def __init__(self, size: int = 1024, sizes: Optional[Dict[str, int]] = None):
+        sizes = dict(sizes or {})
+        if size < 0 or any(limit < 0 for limit in sizes.values()):
+            raise ValueError("Los límites de la memoria no pueden ser negativos")
+        self.size = size
+        self.sizes = sizes
+        # tipo -> función memorizada clave -> _MemoEntry (False si el tipo no se memoriza)
+        self._caches: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def limit(self, exercise_type: str) -> int:
+        """Entradas que puede guardar el tipo"""
+        return self.sizes.get(exercise_type, self.size)
+    
+    def _cache(self, record: 'ExerciseRecord'):
+        """Crea la caché del tipo del registro la primera vez que aparece"""
+        exercise_type = record.type
+        with self._lock:
+            if exercise_type not in self._caches:
+                limit = self.limit(exercise_type)
+                if limit:
+                    render = record.topic._renderers[exercise_type]
+                    memo_params = type(record).memo_params
+                    
+                    def build(difficulty: int, *key) -> _MemoEntry:
+                        return _MemoEntry(render(None, difficulty, *memo_params(key)))
+                    
+                    self._caches[exercise_type] = functools.lru_cache(maxsize=limit)(build)
+                else:
+                    self._caches[exercise_type] = False
+            return self._caches[exercise_type]
+    
+    def _entry(self, record: 'ExerciseRecord') -> Optional[_MemoEntry]:
+        """Entrada del registro, construyéndola si no estaba; None si su tipo no se memoriza"""
+        cache = self._caches.get(record.type)
+        if cache is None:
+            cache = self._cache(record)
+        return cache(*record.memo_key()) if cache else None
+    
+    def _copy(self, entry: _MemoEntry, record: 'ExerciseRecord', data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Copia (o data, si ya es una copia) del ejercicio memorizado con el id y el índice de semilla del registro"""
+        if data is None:
+            data = dict(entry.data)
+        data['id'] = record.id
+        for key in entry.mutable:
+            data[key] = type(data[key])(data[key])
+        if record.seed_index is not None:
+            data['seed_index'] = record.seed_index
+        return data
+    
+    def to_dict(self, record: 'ExerciseRecord', locale: str) -> Optional[Dict[str, Any]]:
+        """Como record.to_dict(locale), con la respuesta y los textos memorizados; None si el tipo no se memoriza"""
+        entry = self._entry(record)
+        if entry is None:
+            return None
+        texts = entry.texts.get(locale)
+        if texts is None:
+            exercise = _render_fields(entry.data, record.topic.REGISTRY.catalog, locale)
+            entry.texts[locale] = {field: exercise[field] for field in _TEXT_FIELDS if field in exercise}
+            return self._copy(entry, record, exercise)
+        exercise = self._copy(entry, record)
+        exercise.update(texts)
+        return exercise
+    
+    def view(self, record: 'ExerciseRecord', locale: str) -> Optional[ExerciseView]:
+        """Como record.view(locale): los textos ya generados en locale se reutilizan y el resto se genera al leerlo"""
+        entry = self._entry(record)
+        if entry is None:
+            return None
+        data = self._copy(entry, record)
+        texts = entry.texts.get(locale)
+        if texts is not None:
+            data.update(texts)
+        return ExerciseView(data, record.topic.REGISTRY.catalog, locale)
+    
+    def clear(self):
+        """Vacía la memoria y pone a cero sus contadores"""
+        with self._lock:
+            self._caches.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos y tamaño, en total y por tipo
+        
+        No hay desalojos: lru_cache no los cuenta y no se deducen de sus contadores (dos hilos
+        que fallan a la vez con la misma clave añaden una sola entrada).
+        """
+        with self._lock:
+            caches = [(exercise_type, cache.cache_info()) for exercise_type, cache in self._caches.items() if cache]
+        types = {}
+        for exercise_type, info in caches:
+            lookups = info.hits + info.misses
+            types[exercise_type] = {
+                'size': info.currsize,
+                'limit': info.maxsize,
+                'hits': info.hits,
+                'misses': info.misses,
+                'hit_rate': info.hits / lookups if lookups else 0.0
+            }
+        hits = sum(entry['hits'] for entry in types.values())
+        misses = sum(entry['misses'] for entry in types.values())
+        return {
+            'size': sum(entry['size'] for entry in types.values()),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'types': types
+        }
+
+class ExerciseType:
+    """Tipo de ejercicio registrado en un tema
+    
+    generate, batch, check, feedback y render son nombres de métodos del tema: se enlazan una vez
+    por instancia (ExerciseRegistry.bind) y después el despacho es una consulta O(1) en un dict.
+    tag es el valor que el ejercicio guarda en 'type' (por defecto, el propio nombre), schema
+    describe los parámetros numéricos que fija el generador y record es la clase de registro
+    compacto que los guarda.
+    """
+    
+    __slots__ = ('name', 'generate', 'batch', 'check', 'grading_kind', 'schema', 'weight', 'tag', 'feedback',
+                 'render', 'record')
+    
+    def __init__(self, name: str, generate: str, batch: str, check: str,
+                 grading_kind: Optional[str] = None, schema: Optional[Dict[str, str]] = None,
+                 weight: float = 1.0, tag: Optional[str] = None, feedback: Optional[str] = None,
+                 render: Optional[str] = None, record: type = ExerciseRecord):
+        if weight < 0:
+            raise ValueError("El peso de un tipo de ejercicio no puede ser negativo")
+        self.name = name
+        self.generate = generate
+        self.batch = batch
+        self.check = check
+        self.grading_kind = grading_kind
+        self.schema = schema or {}
+        self.weight = weight
+        self.tag = tag or name
+        self.feedback = feedback
+        self.render = render or f"_build_{self.tag}"
+        self.record = record
+    
+    def describe(self) -> Dict[str, Any]:
+        """Descripción del tipo para introspección"""
+        return {
+            'name': self.name,
+            'tag': self.tag,
+            'grading_kind': self.grading_kind,
+            'schema': dict(self.schema),
+            'record': self.record.__name__,
+            'weight': self.weight
+        }
+
+class AliasTable:
+    """Muestreo ponderado en O(1) con el método de alias de Vose"""
+    
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Se necesita al menos un peso positivo")
+        self.n = n
+        self.uniform = all(weight == weights[0] for weight in weights)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        if self.uniform:
+            return
+        
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Los restantes tienen probabilidad 1 salvo errores de redondeo
+        for i in small + large:
+            self.prob[i] = 1.0
+    
+    def sample(self, rng) -> int:
+        """Índice elegido según los pesos con una sola extracción de rng"""
+        if self.uniform:
+            return rng.randrange(self.n)
+        u = rng.random() * self.n
+        column = int(u)
+        return column if u - column < self.prob[column] else self.alias[column]
+    
+    def sample_many(self, rng, k: int) -> List[int]:
+        """k índices elegidos con reemplazo"""
+        sample = self.sample
+        return [sample(rng) for _ in range(k)]
+
+class ExerciseRegistry:
+    """Registro de los tipos de ejercicio de un tema, en orden de declaración
+    
+    El orden es parte del formato de los tokens sin estado (índice del tipo): los tipos
+    nuevos deben añadirse al final.
+    """
+    
+    def __init__(self, types: List[ExerciseType], templates: Optional[Dict[str, Dict[str, str]]] = None):
+        self.types = list(types)
+        # Plantillas de texto de los tipos del tema, compiladas una vez por clase
+        self.catalog = TemplateCatalog(templates or {}, MESSAGES)
+        self.names = [exercise_type.name for exercise_type in self.types]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Tipos de ejercicio duplicados en el registro")
+        self._by_name = {exercise_type.name: exercise_type for exercise_type in self.types}
+        self.grading_kinds = {exercise_type.tag: exercise_type.grading_kind for exercise_type in self.types}
+        self.alias = AliasTable([exercise_type.weight for exercise_type in self.types])
+        # Probabilidades para el muestreo en bloque (None si todos los tipos pesan igual)
+        total = sum(exercise_type.weight for exercise_type in self.types)
+        self.probabilities = None if self.alias.uniform else [t.weight / total for t in self.types]
+    
+    def __len__(self) -> int:
+        return len(self.types)
+    
+    def __iter__(self):
+        return iter(self.types)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+    
+    def __getitem__(self, name: str) -> ExerciseType:
+        return self._by_name[name]
+    
+    def index(self, name: str) -> int:
+        """Posición del tipo en el registro"""
+        return self.names.index(name)
+    
+    def weights(self) -> Dict[str, float]:
+        """Peso por defecto de cada tipo"""
+        return {exercise_type.name: exercise_type.weight for exercise_type in self.types}
+    
+    def describe(self) -> List[Dict[str, Any]]:
+        """Descripción de todos los tipos registrados"""
+        return [exercise_type.describe() for exercise_type in self.types]
+    
+    def bind(self, topic):
+        """Instala en topic las tablas de despacho con sus métodos enlazados
+        
+        Generadores, generadores en bloque y fábricas de registros se indexan por nombre;
+        calificadores, retroalimentaciones específicas y constructores del dict, por tag.
+        """
+        topic._generators = {t.name: getattr(topic, t.generate) for t in self.types}
+        topic._batches = {t.name: getattr(topic, t.batch) for t in self.types}
+        topic._records = {t.name: functools.partial(t.record, topic, t.tag) for t in self.types}
+        topic._checks = {t.tag: getattr(topic, t.check) for t in self.types}
+        topic._feedbacks = {t.tag: getattr(topic, t.feedback) for t in self.types if t.feedback}
+        topic._renderers = {t.tag: getattr(topic, t.render) for t in self.types}
+
+def _resolve_type_weights(exercise_types: List[str], weights: Optional[Dict[str, float]]) -> Optional[List[float]]:
+    """Convierte los pesos por tipo en probabilidades alineadas con exercise_types"""
+    if weights is None:
+        return None
+    unknown = set(weights) - set(exercise_types)
+    if unknown:
+        raise ValueError(f"Tipos de ejercicio desconocidos: {', '.join(sorted(unknown))}")
+    values = [float(weights.get(name, 0)) for name in exercise_types]
+    total = sum(values)
+    if total <= 0 or any(value < 0 for value in values):
+        raise ValueError("Los pesos deben ser no negativos y sumar más de cero")
+    return [value / total for value in values]
+
+class _BulkSampler:
+    """Extrae parámetros aleatorios en bloque, vectorizado con NumPy si está disponible"""
+    
+    def __init__(self, seed: Optional[int] = None, use_numpy: bool = True):
+        self._np = optional_backend('numpy') if use_numpy else None
+        if self._np is not None:
+            self._gen = self._np.random.default_rng(seed)
+        else:
+            self._rng = random.Random(seed)
+    
+    def randint(self, low: int, high, n: int) -> List[int]:
+        """n enteros en [low, high]; high puede ser una lista con un límite por elemento"""
+        if self._np is not None:
+            upper = self._np.asarray(high) + 1 if isinstance(high, list) else high + 1
+            return self._gen.integers(low, upper, size=n).tolist()
+        uniform = self._rng.random
+        if isinstance(high, list):
+            return [low + int(uniform() * (top - low + 1)) for top in high]
+        span = high - low + 1
+        return [low + int(uniform() * span) for _ in range(n)]
+    
+    def choice(self, options: List[Any], n: int) -> List[Any]:
+        """n elementos elegidos con reemplazo, conservando los tipos de Python"""
+        if self._np is not None:
+            return [options[i] for i in self._gen.integers(0, len(options), size=n).tolist()]
+        return self._rng.choices(options, k=n)
+    
+    def partition(self, probabilities: Optional[List[float]], k: int, n: int) -> List[List[int]]:
+        """Asigna n posiciones a k categorías y devuelve las posiciones de cada una"""
+        if self._np is not None:
+            if probabilities is None:
+                labels = self._gen.integers(0, k, size=n)
+            else:
+                labels = self._gen.choice(k, size=n, p=probabilities)
+            order = self._np.argsort(labels, kind='stable')
+            bounds = self._np.cumsum(self._np.bincount(labels, minlength=k))[:-1]
+            return [group.tolist() for group in self._np.split(order, bounds)]
+        
+        groups = [[] for _ in range(k)]
+        labels = self._rng.choices(range(k), weights=probabilities, k=n)
+        for position, label in enumerate(labels):
+            groups[label].append(position)
+        return groups
+
+def _generate_topic_records(topic, difficulty: int, n: int, weights: Optional[Dict[str, float]],
+                            sampler: Optional[_BulkSampler]) -> List[ExerciseRecord]:
+    """Genera n registros de ejercicio agrupando por tipo, sin guardarlos"""
+    if n <= 0:
+        return []
+    if sampler is None:
+        sampler = _BulkSampler()
+    
+    exercise_types = topic.EXERCISE_TYPES
+    if weights is None:
+        probabilities = topic.REGISTRY.probabilities
+    else:
+        probabilities = _resolve_type_weights(exercise_types, weights)
+    groups = sampler.partition(probabilities, len(exercise_types), n)
+    ids = topic.ids.next_ids(topic.ID_PREFIX, n)
+    
+    records = [None] * n
+    for exercise_type, positions in zip(exercise_types, groups):
+        if not positions:
+            continue
+        built = topic.build_batch(exercise_type, [ids[p] for p in positions], difficulty, sampler)
+        for position, record in zip(positions, built):
+            records[position] = record
+    return records
+
+def json_default(value: Any) -> Any:
+    """Tipos que json.dumps no serializa: Fraction como "a/b" (la forma que acepta check_answer), conjuntos y tuplas como listas"""
+    if isinstance(value, Fraction):
+        return f"{value.numerator}/{value.denominator}"
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"Tipo no serializable en JSON: {type(value).__name__}")
+
+def exercise_to_json(exercise: Dict[str, Any]) -> str:
+    """Ejercicio como una línea JSON"""
+    return json.dumps(exercise, ensure_ascii=False, default=json_default)
+
+def _write_varint(out: bytearray, value: int):
+    """Entero no negativo en base 128, 7 bits por byte"""
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """Lee un varint y devuelve (valor, posición siguiente)"""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+class ExerciseBinaryCodec:
+    """Formato binario compacto para exportar ejercicios de un MathEngine
+    
+    Cada ejercicio se guarda como su registro compacto (tema, tipo, dificultad, id y parámetros),
+    sin texto: al leerlo se reconstruye con los constructores del tema en el idioma que se pida.
+    La cabecera lleva los nombres de temas y tipos, así que un archivo sigue siendo legible aunque
+    cambie el orden del registro. Después vienen bloques independientes (tamaño, número de
+    ejercicios y ejercicios); dentro de un bloque cada cadena de los parámetros se escribe una vez
+    y luego se referencia por su índice, y los enteros van como varint en zigzag.
+    """
+    
+    MAGIC = b'MMEX'
+    VERSION = 1
+    _NONE, _INT, _FLOAT, _STR, _STR_REF, _LIST, _TUPLE = range(7)
+    _FLOAT_FORMAT = struct.Struct('<d')
+    
+    def __init__(self, engine: 'MathEngine'):
+        self._topics = list(engine.topics.values())
+        self._topic_index = {id(topic): i for i, topic in enumerate(self._topics)}
+        self._type_index = [{exercise_type.tag: j for j, exercise_type in enumerate(topic.REGISTRY.types)}
+                            for topic in self._topics]
+        self._layout = [[name, [exercise_type.tag for exercise_type in topic.REGISTRY.types]]
+                        for name, topic in engine.topics.items()]
+        self._topics_by_name = engine.topics
+    
+    def header(self) -> bytes:
+        """Firma, versión y tabla de temas y tipos"""
+        layout = json.dumps(self._layout).encode('utf-8')
+        out = bytearray(self.MAGIC)
+        out.append(self.VERSION)
+        _write_varint(out, len(layout))
+        return bytes(out + layout)
+    
+    def encode_block(self, records: List[ExerciseRecord]) -> bytes:
+        """Codifica un bloque de registros, precedido de su tamaño en bytes"""
+        body = bytearray()
+        _write_varint(body, len(records))
+        strings: Dict[str, int] = {}
+        for record in records:
+            topic_index = self._topic_index[id(record.topic)]
+            body.append(topic_index)
+            body.append(self._type_index[topic_index][record.type])
+            body.append(record.difficulty)
+            exercise_id = record.id.encode('utf-8')
+            _write_varint(body, len(exercise_id))
+            body += exercise_id
+            params = record.params()
+            body.append(len(params))
+            for value in params:
+                self._encode_value(body, value, strings)
+        out = bytearray()
+        _write_varint(out, len(body))
+        return bytes(out + body)
+    
+    def _encode_value(self, out: bytearray, value: Any, strings: Dict[str, int]):
+        if value is None:
+            out.append(self._NONE)
+        elif isinstance(value, int):
+            out.append(self._INT)
+            _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            out.append(self._FLOAT)
+            out += self._FLOAT_FORMAT.pack(value)
+        elif isinstance(value, str):
+            index = strings.get(value)
+            if index is not None:
+                out.append(self._STR_REF)
+                _write_varint(out, index)
+            else:
+                strings[value] = len(strings)
+                encoded = value.encode('utf-8')
+                out.append(self._STR)
+                _write_varint(out, len(encoded))
+                out += encoded
+        elif isinstance(value, (list, tuple)):
+            out.append(self._LIST if isinstance(value, list) else self._TUPLE)
+            _write_varint(out, len(value))
+            for item in value:
+                self._encode_value(out, item, strings)
+        else:
+            raise TypeError(f"Parámetro no admitido en el formato binario: {type(value).__name__}")
+    
+    def encode_params(self, params: tuple) -> bytes:
+        """Parámetros de un registro en el formato de valores del bloque (para SQLiteExerciseStore)"""
+        out = bytearray()
+        strings: Dict[str, int] = {}
+        for value in params:
+            self._encode_value(out, value, strings)
+        return bytes(out)
+    
+    def decode_params(self, data: bytes) -> List[Any]:
+        """Inversa de encode_params"""
+        strings: List[str] = []
+        values = []
+        position = 0
+        while position < len(data):
+            value, position = self._decode_value(data, position, strings)
+            values.append(value)
+        return values
+    
+    def iter_records(self, handle) -> Iterator[ExerciseRecord]:
+        """Lee los registros de un archivo binario abierto, un bloque cada vez"""
+        magic = handle.read(len(self.MAGIC))
+        if magic != self.MAGIC or handle.read(1) != bytes([self.VERSION]):
+            raise ValueError("No es un archivo de ejercicios en formato binario compatible")
+        layout = json.loads(handle.read(self._read_stream_varint(handle)))
+        # Traduce los índices del archivo a las fábricas de registros del motor actual
+        factories = []
+        for topic_name, tags in layout:
+            topic = self._topics_by_name[topic_name]
+            names = {exercise_type.tag: exercise_type.name for exercise_type in topic.REGISTRY.types}
+            factories.append([topic._records[names[tag]] for tag in tags])
+        
+        while True:
+            size = self._read_stream_varint(handle)
+            if size is None:
+                return
+            yield from self._decode_block(handle.read(size), factories)
+    
+    @staticmethod
+    def _read_stream_varint(handle) -> Optional[int]:
+        """Varint leído directamente del archivo (None al final del archivo)"""
+        value = shift = 0
+        while True:
+            byte = handle.read(1)
+            if not byte:
+                if shift:
+                    raise ValueError("Archivo de ejercicios truncado")
+                return None
+            value |= (byte[0] & 0x7f) << shift
+            if byte[0] < 0x80:
+                return value
+            shift += 7
+    
+    def _decode_block(self, data: bytes, factories: List[List[Callable]]) -> List[ExerciseRecord]:
+        count, position = _read_varint(data, 0)
+        strings: List[str] = []
+        records = []
+        for _ in range(count):
+            topic_index, type_index, difficulty = data[position], data[position + 1], data[position + 2]
+            length, position = _read_varint(data, position + 3)
+            exercise_id = data[position:position + length].decode('utf-8')
+            position += length
+            params = []
+            param_count = data[position]
+            position += 1
+            for _ in range(param_count):
+                value, position = self._decode_value(data, position, strings)
+                params.append(value)
+            records.append(factories[topic_index][type_index](exercise_id, difficulty, *params))
+        return records
+    
+    def _decode_value(self, data: bytes, position: int, strings: List[str]) -> Tuple[Any, int]:
+        tag = data[position]
+        position += 1
+        if tag == self._NONE:
+            return None, position
+        if tag == self._INT:
+            value, position = _read_varint(data, position)
+            return (value >> 1) if not value & 1 else -((value + 1) >> 1), position
+        if tag == self._FLOAT:
+            return self._FLOAT_FORMAT.unpack_from(data, position)[0], position + self._FLOAT_FORMAT.size
+        if tag == self._STR:
+            length, position = _read_varint(data, position)
+            value = data[position:position + length].decode('utf-8')
+            strings.append(value)
+            return value, position + length
+        if tag == self._STR_REF:
+            index, position = _read_varint(data, position)
+            return strings[index], position
+        if tag in (self._LIST, self._TUPLE):
+            length, position = _read_varint(data, position)
+            items = []
+            for _ in range(length):
+                item, position = self._decode_value(data, position, strings)
+                items.append(item)
+            return (items if tag == self._LIST else tuple(items)), position
+        raise ValueError(f"Etiqueta de valor desconocida en el formato binario: {tag}")
+
+def _int_columns_equal(left: List[int], right: List[int]) -> List[bool]:
+    """Compara dos columnas de enteros elemento a elemento (con NumPy si los valores caben en int64)"""
+    np = optional_backend('numpy')
+    if np is not None:
+        try:
+            return (np.asarray(left, dtype=np.int64) == np.asarray(right, dtype=np.int64)).tolist()
+        except OverflowError:
+            pass
+    return [a == b for a, b in zip(left, right)]
+
+def _grade_bool_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica respuestas de verdadero/falso"""
+    return [bool(answer) == bool(exercise['correct_answer']) for exercise, answer in zip(exercises, answers)]
+
+def _grade_int_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica respuestas enteras convirtiendo primero toda la columna"""
+    user, correct, valid = [], [], []
+    for exercise, answer in zip(exercises, answers):
+        try:
+            user.append(int(answer))
+            valid.append(True)
+        except (ValueError, TypeError, OverflowError):
+            user.append(0)
+            valid.append(False)
+        correct.append(int(exercise['correct_answer']))
+    return [ok and same for ok, same in zip(valid, _int_columns_equal(user, correct))]
+
+def _grade_float_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica respuestas numéricas con tolerancia 1e-6"""
+    user, correct, valid = [], [], []
+    for exercise, answer in zip(exercises, answers):
+        try:
+            user.append(float(answer))
+            correct.append(float(exercise['correct_answer']))
+            valid.append(True)
+        except (ValueError, TypeError, OverflowError):
+            user.append(0.0)
+            correct.append(0.0)
+            valid.append(False)
+    np = optional_backend('numpy')
+    if np is not None:
+        close = np.abs(np.asarray(user) - np.asarray(correct)) < 1e-6
+        return (close & np.asarray(valid)).tolist()
+    return [ok and abs(u - c) < 1e-6 for ok, u, c in zip(valid, user, correct)]
+
+# Aritmética exacta de fracciones pequeñas como pares de enteros (numerador, denominador).
+# Fraction normaliza con un gcd y crea un objeto en cada operación; los ejercicios solo usan
+# numeradores y denominadores pequeños, así que se calcula con enteros y tablas y el resultado
+# se convierte a Fraction únicamente al construir el dict de la API.
+_SMALL_FRACTION_LIMIT = 15
+_GCD_TABLE = tuple(tuple(math.gcd(a, b) for b in range(_SMALL_FRACTION_LIMIT + 1))
+                   for a in range(_SMALL_FRACTION_LIMIT + 1))
+_LCM_TABLE = tuple(tuple(a * b // _GCD_TABLE[a][b] if a and b else 0 for b in range(_SMALL_FRACTION_LIMIT + 1))
+                   for a in range(_SMALL_FRACTION_LIMIT + 1))
+
+def _frac_normalize(num: int, den: int) -> Tuple[int, int]:
+    """Reduce num/den (den > 0) a su forma irreducible"""
+    if 0 <= num <= _SMALL_FRACTION_LIMIT and den <= _SMALL_FRACTION_LIMIT:
+        g = _GCD_TABLE[num][den]
+    else:
+        g = math.gcd(num, den)
+    return num // g, den // g
+
+def _frac_add(num1: int, den1: int, num2: int, den2: int) -> Tuple[int, int]:
+    """num1/den1 + num2/den2 sobre el mínimo común denominador"""
+    if den1 <= _SMALL_FRACTION_LIMIT and den2 <= _SMALL_FRACTION_LIMIT:
+        lcm = _LCM_TABLE[den1][den2]
+    else:
+        lcm = den1 * den2 // math.gcd(den1, den2)
+    num = num1 * (lcm // den1) + num2 * (lcm // den2)
+    g = math.gcd(num, lcm)
+    return num // g, lcm // g
+
+def _frac_sub(num1: int, den1: int, num2: int, den2: int) -> Tuple[int, int]:
+    """num1/den1 - num2/den2"""
+    return _frac_add(num1, den1, -num2, den2)
+
+def _frac_mul(num1: int, den1: int, num2: int, den2: int) -> Tuple[int, int]:
+    """num1/den1 × num2/den2 con simplificación cruzada (entradas irreducibles y den > 0)"""
+    g1 = math.gcd(num1, den2)
+    g2 = math.gcd(num2, den1)
+    return (num1 // g1) * (num2 // g2), (den1 // g2) * (den2 // g1)
+
+def _frac_div(num1: int, den1: int, num2: int, den2: int) -> Tuple[int, int]:
+    """num1/den1 ÷ num2/den2 (num2 != 0)"""
+    if num2 < 0:
+        num2, den2 = -num2, -den2
+    return _frac_mul(num1, den1, den2, num2)
+
+def _frac_compare(num1: int, den1: int, num2: int, den2: int) -> int:
+    """-1, 0 o 1 según num1/den1 sea menor, igual o mayor que num2/den2 (den > 0)"""
+    left, right = num1 * den2, num2 * den1
+    return (left > right) - (left < right)
+
+def _parse_fraction(answer: Any) -> Optional[Tuple[int, int]]:
+    """Convierte una respuesta ('a/b', entero, decimal o Fraction) en un par (num, den), o None si no es válida
+    
+    El par no se normaliza: para comparar basta multiplicar en cruz.
+    """
+    try:
+        if isinstance(answer, str) and '/' in answer:
+            num, den = answer.split('/')
+            num, den = int(num), int(den)
+            return (num, den) if den else None
+        if isinstance(answer, int):
+            return int(answer), 1
+        value = answer if isinstance(answer, Fraction) else Fraction(answer)
+        return value.numerator, value.denominator
+    except (ValueError, TypeError, ZeroDivisionError, OverflowError):
+        return None
+
+def _grade_fraction_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica fracciones comparando productos cruzados de numeradores y denominadores"""
+    user_num, user_den, correct_num, correct_den, valid = [], [], [], [], []
+    for exercise, answer in zip(exercises, answers):
+        pair = _parse_fraction(answer)
+        valid.append(pair is not None)
+        num, den = pair if pair is not None else (0, 1)
+        user_num.append(num)
+        user_den.append(den)
+        correct = exercise['correct_answer']
+        correct_num.append(correct.numerator)
+        correct_den.append(correct.denominator)
+    
+    # a/b == c/d  <=>  a·d == c·b (los denominadores nunca son cero)
+    left = [a * d for a, d in zip(user_num, correct_den)]
+    right = [c * b for c, b in zip(correct_num, user_den)]
+    return [ok and same for ok, same in zip(valid, _int_columns_equal(left, right))]
+
+def _grade_text_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica respuestas de texto ignorando espacios en los extremos"""
+    return [str(answer).strip() == str(exercise['correct_answer']) for exercise, answer in zip(exercises, answers)]
+
+def _grade_expression_column(exercises: List[Dict[str, Any]], answers: List[Any]) -> List[bool]:
+    """Califica expresiones de potencias y radicales por equivalencia (ver _expressions_equivalent)"""
+    return [_expressions_equivalent(answer, exercise['correct_answer']) for exercise, answer in zip(exercises, answers)]
+
+_BATCH_GRADERS = {
+    'bool': _grade_bool_column,
+    'int': _grade_int_column,
+    'float': _grade_float_column,
+    'fraction': _grade_fraction_column,
+    'text': _grade_text_column,
+    'expression': _grade_expression_column
+}
+
+class BatchGradeResult:
+    """Resultado columnar de check_batch
+    
+    Las columnas (exercise_ids, user_answers, correct, errors) se calculan al calificar;
+    la retroalimentación y los diccionarios completos solo se construyen cuando se piden.
+    """
+    
+    def __init__(self, topic, exercise_ids: List[str], user_answers: List[Any],
+                 exercises: List[Optional[Dict[str, Any]]], errors: List[Optional[Dict[str, Any]]],
+                 correct: List[bool]):
+        self._topic = topic
+        self._exercises = exercises
+        self._errors = errors
+        self.exercise_ids = exercise_ids
+        self.user_answers = user_answers
+        self.correct = correct
+        self.errors = [error['error'] if error else None for error in errors]
+    
+    def __len__(self) -> int:
+        return len(self.exercise_ids)
+    
+    @property
+    def num_correct(self) -> int:
+        return sum(self.correct)
+    
+    def feedback(self, index: int) -> str:
+        """Retroalimentación de una respuesta, construida bajo demanda"""
+        exercise = self._exercises[index]
+        if exercise is None:
+            return self.errors[index]
+        return self._topic._feedback(exercise, self.user_answers[index], self.correct[index])
+    
+    def feedbacks(self) -> List[str]:
+        """Retroalimentación de todas las respuestas"""
+        return [self.feedback(i) for i in range(len(self))]
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        """Resultado de una respuesta con el mismo formato que check_answer"""
+        exercise = self._exercises[index]
+        if exercise is None:
+            return dict(self._errors[index])
+        return self._topic._grade_result(exercise, self.user_answers[index], self.correct[index])
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Todos los resultados con el formato de check_answer"""
+        return [self.row(i) for i in range(len(self))]
+    
+    def columns(self) -> Dict[str, List[Any]]:
+        """Columnas calculadas sin retroalimentación"""
+        return {
+            'exercise_id': self.exercise_ids,
+            'user_answer': self.user_answers,
+            'correct': self.correct,
+            'error': self.errors
+        }
+
+def _grade_topic_batch(topic, exercises: List[Optional[Dict[str, Any]]], answers: List[Any],
+                       errors: List[Optional[Dict[str, Any]]]) -> List[bool]:
+    """Agrupa los ejercicios por tipo de calificación y califica cada grupo en bloque
+    
+    Un ejercicio que no se puede calificar no detiene el bloque: su fila pasa a errors y
+    su ejercicio a None, como los ids que no se encuentran.
+    """
+    correct = [False] * len(exercises)
+    groups = {}
+    for position, exercise in enumerate(exercises):
+        if exercise is not None:
+            groups.setdefault(topic.REGISTRY.grading_kinds.get(exercise['type']), []).append(position)
+    
+    for kind, positions in groups.items():
+        if kind is not None:
+            try:
+                results = _BATCH_GRADERS[kind]([exercises[p] for p in positions], [answers[p] for p in positions])
+            except Exception:
+                # Alguna fila del grupo no se puede calificar: el grupo se califica fila a fila
+                pass
+            else:
+                for position, is_correct in zip(positions, results):
+                    correct[position] = is_correct
+                continue
+        # Tipos sin calificador vectorizado, o grupo con alguna fila errónea: uno a uno
+        for position in positions:
+            try:
+                correct[position] = topic._is_correct(exercises[position], answers[position])
+            except Exception:
+                exercises[position] = None
+                errors[position] = {'error': 'Ejercicio no calificable'}
+    return correct
+
+class PrimeOracle:
+    """Servicio compartido de primalidad y factorización
+    
+    Para n pequeños usa una tabla de menor factor primo (SPF) construida por criba, que
+    se amplía bajo demanda hasta max_bound. Por encima de ese límite la primalidad se decide
+    con Miller-Rabin determinista y la factorización con Pollard rho (variante de Brent);
+    estas factorizaciones grandes se memorizan en una caché LRU.
+    """
+    
+    # Bases suficientes para que Miller-Rabin sea determinista para n < 3.3 × 10^24 (hasta 37
+    # solo lo es por debajo de 318665857834031151167461, pseudoprimo fuerte para todas ellas)
+    _MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+    # Los primos menores que este límite se extraen por división antes de usar Pollard rho
+    _TRIAL_LIMIT = 1000
+    
+    def __init__(self, bound: int = 1 << 16, max_bound: int = 1 << 22, cache_size: int = 4096):
+        self.max_bound = max_bound
+        self._lock = threading.Lock()
+        self._spf = array('I')
+        self._primes = []
+        self._factorize_cached = functools.lru_cache(maxsize=cache_size)(self._factorize_large)
+        # La primera criba se difiere hasta la primera consulta para no pagarla al importar
+        self._initial_bound = max(bound, self._TRIAL_LIMIT)
+    
+    @property
+    def bound(self) -> int:
+        """Mayor número cubierto por la tabla"""
+        return len(self._spf) - 1
+    
+    def ensure(self, bound: int):
+        """Amplía la tabla para cubrir al menos hasta bound (sin superar max_bound)"""
+        bound = min(bound, self.max_bound)
+        if bound <= self.bound:
+            return
+        with self._lock:
+            if bound <= self.bound:
+                return
+            # Crecer por potencias de dos amortiza las cribas sucesivas
+            size = max(bound, 2 * self.bound, self._initial_bound)
+            spf, primes = self._sieve(min(size, self.max_bound))
+            self._spf, self._primes = spf, primes
+    
+    @staticmethod
+    def _sieve(bound: int) -> Tuple[array, List[int]]:
+        """Criba de menor factor primo hasta bound"""
+        spf = array('I', range(bound + 1))
+        limit = math.isqrt(bound)
+        small = [p for p in range(2, limit + 1) if all(p % q for q in range(2, math.isqrt(p) + 1))]
+        # Recorrer los primos de mayor a menor deja en cada compuesto su menor factor
+        for p in reversed(small):
+            start = p * p
+            count = (bound - start) // p + 1
+            spf[start::p] = array('I', [p]) * count
+        primes = [n for n in range(2, bound + 1) if spf[n] == n]
+        return spf, primes
+    
+    def is_prime(self, n: int) -> bool:
+        """Primalidad en O(1) dentro de la tabla y Miller-Rabin fuera de ella"""
+        if n < 2:
+            return False
+        if n > self.bound and n <= self.max_bound:
+            self.ensure(n)
+        if n <= self.bound:
+            return self._spf[n] == n
+        return self._miller_rabin(n)
+    
+    def _miller_rabin(self, n: int) -> bool:
+        """Test de Miller-Rabin con bases fijas"""
+        for p in self._MR_BASES:
+            if n % p == 0:
+                return n == p
+        d, s = n - 1, 0
+        while d % 2 == 0:
+            d //= 2
+            s += 1
+        for a in self._MR_BASES:
+            x = pow(a, d, n)
+            if x == 1 or x == n - 1:
+                continue
+            for _ in range(s - 1):
+                x = x * x % n
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+    
+    def factorize(self, n: int) -> List[int]:
+        """Factores primos de n con multiplicidad, en orden creciente"""
+        if n < 2:
+            return []
+        if n > self.bound:
+            # Fuera de max_bound basta la tabla inicial para la división por primos pequeños
+            self.ensure(n if n <= self.max_bound else self._TRIAL_LIMIT)
+        if n > self.bound:
+            return list(self._factorize_cached(n))
+        
+        spf = self._spf
+        factors = []
+        while n > 1:
+            p = spf[n]
+            factors.append(p)
+            n //= p
+        return factors
+    
+    def factor_exponents(self, n: int) -> List[Tuple[int, int]]:
+        """Factorización de n como pares (primo, exponente)"""
+        exponents = []
+        for p in self.factorize(n):
+            if exponents and exponents[-1][0] == p:
+                exponents[-1] = (p, exponents[-1][1] + 1)
+            else:
+                exponents.append((p, 1))
+        return exponents
+    
+    def _factorize_large(self, n: int) -> Tuple[int, ...]:
+        """Factoriza n fuera de la tabla: división por primos pequeños y luego Pollard rho"""
+        factors = []
+        for p in self._primes:
+            if p > self._TRIAL_LIMIT or p * p > n:
+                break
+            while n % p == 0:
+                factors.append(p)
+                n //= p
+        
+        pending = [n] if n > 1 else []
+        spf = self._spf
+        while pending:
+            m = pending.pop()
+            if m <= self.bound:
+                while m > 1:
+                    factors.append(spf[m])
+                    m //= spf[m]
+            elif self._miller_rabin(m):
+                factors.append(m)
+            else:
+                d = self._pollard_brent(m)
+                pending.extend((d, m // d))
+        
+        factors.sort()
+        return tuple(factors)
+    
+    @staticmethod
+    def _pollard_brent(n: int) -> int:
+        """Factor no trivial de un n compuesto impar (Pollard rho, variante de Brent)"""
+        for c in itertools.count(1):
+            y, r, q, g = 2, 1, 1, 1
+            x = ys = y
+            while g == 1:
+                x = y
+                for _ in range(r):
+                    y = (y * y + c) % n
+                k = 0
+                while k < r and g == 1:
+                    ys = y
+                    for _ in range(min(128, r - k)):
+                        y = (y * y + c) % n
+                        q = q * abs(x - y) % n
+                    g = math.gcd(q, n)
+                    k += 128
+                r *= 2
+            if g == n:
+                # El producto acumulado saltó el factor: retroceder paso a paso
+                g = 1
+                while g == 1:
+                    ys = (ys * ys + c) % n
+                    g = math.gcd(abs(x - ys), n)
+            if g != n:
+                return g
+    
+    def divisors(self, n: int) -> List[int]:
+        """Todos los divisores positivos de n, obtenidos de su factorización en O(d(n))"""
+        if n < 1:
+            return []
+        divisors = [1]
+        for p, exponent in self.factor_exponents(n):
+            divisors = [d * p ** k for d in divisors for k in range(exponent + 1)]
+        divisors.sort()
+        return divisors
+    
+    def cache_info(self) -> Dict[str, int]:
+        """Estadísticas de la caché de factorizaciones grandes"""
+        return self._factorize_cached.cache_info()._asdict()
+
+# Servicio de primos y factorización compartido por todos los temas
+PRIME_ORACLE = PrimeOracle()
+
+class AnswerTables:
+    """Tablas precalculadas de respuestas para los tipos de ejercicio de dominio pequeño
+    
+    Cubren la primalidad y los divisores de identificar_primo y la forma simplificada de √n de
+    simplificar_radicales, que de otro modo exigen factorizar en cada ejercicio. El MCD y las
+    raíces de calcular_raiz no se tabulan: math.gcd y number ** (1/index) son más rápidos que
+    cualquier consulta hecha desde Python.
+    
+    Las tablas se serializan en un archivo binario compacto que se abre con mmap, de modo que
+    los procesos que cargan el mismo archivo comparten sus páginas. Fuera del rango tabulado,
+    cada consulta devuelve None y el tema recurre al cálculo habitual.
+    """
+    
+    MAGIC = b'MMAT'
+    VERSION = 1
+    # Cabecera: firma, versión, orden de bytes (0 little, 1 big) y número de secciones
+    _HEADER = struct.Struct('<4sHBB')
+    # Índice de secciones: nombre, typecode del array, desplazamiento y tamaño en bytes
+    _SECTION = struct.Struct('<8sc3xII')
+    _ALIGN = 8
+    
+    def __init__(self, buffer, path: Optional[str] = None):
+        self.path = path
+        self._buffer = buffer
+        magic, version, byteorder, count = self._HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{path or 'buffer'} no es un archivo de tablas de respuestas compatible")
+        if byteorder != (sys.byteorder == 'big'):
+            raise ValueError(f"{path or 'buffer'} se generó con otro orden de bytes")
+        view = memoryview(buffer)
+        sections = {}
+        for i in range(count):
+            name, typecode, offset, size = self._SECTION.unpack_from(buffer, self._HEADER.size + i * self._SECTION.size)
+            sections[name.rstrip(b'\0').decode()] = view[offset:offset + size].cast(typecode.decode())
+        self.prime_limit, self.radical_limit = sections['limits']
+        self._prime = sections['prime']
+        self._divisor_offsets = sections['divoff']
+        self._divisors = sections['divisors']
+        self._radical = sections['radical']
+    
+    @classmethod
+    def build(cls, prime_limit: int = 300, radical_limit: int = 200,
+              primes: Optional[PrimeOracle] = None) -> 'AnswerTables':
+        """Calcula todas las tablas en memoria"""
+        primes = primes if primes is not None else PRIME_ORACLE
+        
+        prime = array('B', (primes.is_prime(n) for n in range(prime_limit + 1)))
+        divisor_offsets, divisors = array('I', [0]), array('H')
+        for n in range(prime_limit + 1):
+            divisors.extend(primes.divisors(n))
+            divisor_offsets.append(len(divisors))
+        
+        # Pares (coeficiente, radicando) de √n = coeficiente·√radicando
+        radical = array('B' if radical_limit < 256 else 'H', [0, 0])
+        for n in range(1, radical_limit + 1):
+            outside, inside = 1, 1
+            for p, exponent in primes.factor_exponents(n):
+                outside *= p ** (exponent // 2)
+                inside *= p ** (exponent % 2)
+            radical.extend((outside, inside))
+        
+        sections = [
+            ('limits', array('I', [prime_limit, radical_limit])),
+            ('prime', prime), ('divoff', divisor_offsets), ('divisors', divisors), ('radical', radical)
+        ]
+        return cls(cls._serialize(sections))
+    
+    @classmethod
+    def _serialize(cls, sections: List[Tuple[str, array]]) -> bytes:
+        """Cabecera, índice de secciones y datos alineados de cada array"""
+        header = cls._HEADER.pack(cls.MAGIC, cls.VERSION, sys.byteorder == 'big', len(sections))
+        offset = cls._HEADER.size + len(sections) * cls._SECTION.size
+        index, blobs = [], []
+        for name, values in sections:
+            padding = -offset % cls._ALIGN
+            offset += padding
+            data = values.tobytes()
+            index.append(cls._SECTION.pack(name.encode(), values.typecode.encode(), offset, len(data)))
+            blobs.append(b'\0' * padding + data)
+            offset += len(data)
+        return b''.join([header] + index + blobs)
+    
+    def write(self, path: str):
+        """Guarda las tablas en path (se escribe a un temporal y se renombra)"""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(self._buffer)
+        os.replace(temporary, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'AnswerTables':
+        """Abre un archivo de tablas con mmap de solo lectura"""
+        with open(path, 'rb') as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+    
+    @classmethod
+    def shared(cls, path: str) -> 'AnswerTables':
+        """Tablas del proceso para path: se cargan una vez y se generan si el archivo no existe"""
+        path = os.fspath(path)
+        try:
+            return _SHARED_TABLES[path]
+        except KeyError:
+            pass
+        with _SHARED_TABLES_LOCK:
+            if path not in _SHARED_TABLES:
+                if not os.path.exists(path):
+                    cls.build().write(path)
+                _SHARED_TABLES[path] = cls.load(path)
+            return _SHARED_TABLES[path]
+    
+    @property
+    def nbytes(self) -> int:
+        """Tamaño del archivo de tablas"""
+        return len(self._buffer)
+    
+    def is_prime(self, n: int) -> Optional[bool]:
+        """Primalidad de n según la tabla"""
+        if 0 <= n <= self.prime_limit:
+            return self._prime[n] == 1
+        return None
+    
+    def divisors(self, n: int) -> Optional[List[int]]:
+        """Divisores positivos de n en orden creciente"""
+        if 0 <= n <= self.prime_limit:
+            return self._divisors[self._divisor_offsets[n]:self._divisor_offsets[n + 1]].tolist()
+        return None
+    
+    def simplified_radical(self, n: int) -> Optional[Tuple[int, int]]:
+        """Par (coeficiente, radicando) con √n = coeficiente·√radicando, para n ≥ 1"""
+        if 1 <= n <= self.radical_limit:
+            return self._radical[2 * n], self._radical[2 * n + 1]
+        return None
+    
+    def close(self):
+        """Libera el mmap (las vistas sobre él dejan de ser válidas)"""
+        if isinstance(self._buffer, mmap.mmap):
+            for section in (self._prime, self._divisor_offsets, self._divisors, self._radical):
+                section.release()
+            self._buffer.close()
+
+# Tablas abiertas por ruta: todos los motores del proceso comparten el mismo mmap
+_SHARED_TABLES: Dict[str, AnswerTables] = {}
+_SHARED_TABLES_LOCK = threading.Lock()
+
+# Respuestas de potencias y radicales: una sola potencia base^exponente, su inverso 1/base^exponente
+# o un radical simplificado coeficiente·√radicando, con paréntesis opcionales alrededor de los números
+_EXPRESSION_MAX_LENGTH = 64
+_POWER_FORM = re.compile(r'(?P<open>\()?(?P<base>\d+)(?(open)\))\^(?P<paren>\()?(?P<exponent>-?\d+)(?(paren)\))')
+_RADICAL_FORM = re.compile(r'(?:(?P<coefficient>\d+)[*·×⋅]?)?√(?P<open>\()?(?P<radicand>\d+)(?(open)\))|(?P<integer>\d+)')
+
+@functools.lru_cache(maxsize=8192)
+def _canonical_expression(text: str) -> Optional[Tuple[str, int, int]]:
+    """Forma estructural de una respuesta sin espacios: ('^', base, exponente), su inverso ('1/^', base,
+    exponente) o ('√', coeficiente, radicando)
+    
+    None si no es una sola potencia ni un coeficiente por una raíz: "2^(5)" y "2**5" tienen la forma
+    de "2^5", y "6·√2" y "6sqrt(2)" la de "6√2", pero "32", "2^3·2^2" o "√4·√3" no tienen ninguna.
+    El radicando no se reduce: "√72" tiene la forma ('√', 1, 72), distinta de la de "6√2".
+    """
+    if len(text) > _EXPRESSION_MAX_LENGTH:
+        return None
+    text = text.replace('sqrt', '√').replace('**', '^').replace('−', '-')
+    reciprocal = text.startswith('1/')
+    if reciprocal:
+        text = text[3:-1] if text[2:3] == '(' and text.endswith(')') else text[2:]
+    match = _POWER_FORM.fullmatch(text)
+    if match is not None:
+        # 1/b^e tiene su propia forma: b^(-e) es el enunciado de la ley del exponente negativo
+        return '1/^' if reciprocal else '^', int(match['base']), int(match['exponent'])
+    if reciprocal:
+        return None
+    
+    match = _RADICAL_FORM.fullmatch(text)
+    if match is None:
+        return None
+    if match['integer'] is not None:
+        return '√', int(match['integer']), 1
+    radicand = int(match['radicand'])
+    return ('√', int(match['coefficient'] or 1), radicand) if radicand > 1 else None
+
+@functools.lru_cache(maxsize=8192)
+def _expected_expression(correct: str) -> Optional[Tuple[str, int, int]]:
+    """Forma estructural de la respuesta correcta, con el radicando ya reducido a uno libre de cuadrados
+    
+    Algunas respuestas correctas se guardan sin simplificar ("5√4", "√24"): su forma es la que debe
+    escribir el alumno ("10", "2√6"). Solo se factorizan radicandos dentro de la criba.
+    """
+    form = _canonical_expression(correct)
+    if form is None or form[0] != '√' or form[2] > PRIME_ORACLE.max_bound:
+        return form
+    _, coefficient, radicand = form
+    inside = 1
+    for p, exponent in PRIME_ORACLE.factor_exponents(radicand):
+        coefficient *= p ** (exponent // 2)
+        if exponent % 2:
+            inside *= p
+    return '√', coefficient, inside
+
+# Verificación opcional con SymPy de las respuestas que el reconocedor no entiende (otras notaciones)
+_SYMPY_VERIFY = os.environ.get('MATHMASTER_SYMPY_VERIFY', '') not in ('', '0')
+_SYMPY_SAFE_CHARS = frozenset('0123456789+-*/^()√·×. ')
+
+def _sympy_equivalent(answer: str, correct: str) -> bool:
+    """Comprueba con SymPy si answer tiene la forma estructural de correct; False si SymPy no está o no lo entiende
+    
+    La expresión se lee sin evaluar, así que "√72" o "2^3·2^2" siguen sin ser una sola raíz o potencia.
+    """
+    sympy = optional_backend('sympy')
+    if sympy is None or len(answer) > _EXPRESSION_MAX_LENGTH or not set(answer) <= _SYMPY_SAFE_CHARS:
+        return False
+    text = re.sub(r'√(\d+)', r'sqrt(\1)', answer).replace('√', 'sqrt')
+    # Producto implícito: 2sqrt(3) -> 2*sqrt(3)
+    text = re.sub(r'(?<=[\d)])(?=sqrt|\()', '*', text)
+    text = text.replace('^', '**').replace('·', '*').replace('×', '*')
+    try:
+        expression = sympy.sympify(text, evaluate=False)
+    except Exception:
+        return False
+    form = _sympy_form(expression)
+    return form is not None and form == _expected_expression(correct)
+
+def _sympy_form(expression) -> Optional[Tuple[str, int, int]]:
+    """Forma estructural de una expresión de SymPy sin evaluar, como la de _canonical_expression"""
+    if expression.is_Integer:
+        return ('√', int(expression), 1) if expression > 0 else None
+    if expression.is_Pow:
+        base, exponent = expression.args
+        if not base.is_Integer or base <= 0:
+            return None
+        if exponent.is_Integer:
+            return '^', int(base), int(exponent)
+        square_root = exponent.is_Rational and exponent.p == 1 and exponent.q == 2
+        return ('√', 1, int(base)) if square_root and base > 1 else None
+    if expression.is_Mul and len(expression.args) == 2:
+        # Sin evaluar, los factores conservan el orden escrito: √2·6 también es 6√2
+        first, second = sorted(expression.args, key=lambda arg: not arg.is_Integer)
+        inner = _sympy_form(second)
+        if first.is_Integer and first > 0 and inner is not None and inner[0] == '√' and inner[1] == 1 and inner[2] > 1:
+            return '√', int(first), inner[2]
+        # 1/b^e se lee como 1·(b^e)^(-1)
+        if first == 1 and second.is_Pow and second.args[1] == -1:
+            inner = _sympy_form(second.args[0])
+            if inner is not None and inner[0] == '^':
+                return '1/^', inner[1], inner[2]
+    return None
+
+def _expressions_equivalent(answer: Any, correct: Any) -> bool:
+    """Compara respuestas de potencias y radicales por su forma estructural, no por su valor
+    
+    Se aceptan otras notaciones de la misma potencia o del mismo radical simplificado, pero no
+    expresiones que aún haya que operar ni radicandos sin simplificar.
+    """
+    answer, correct = str(answer).replace(' ', ''), str(correct).replace(' ', '')
+    if answer == correct:
+        return True
+    form = _canonical_expression(answer)
+    if form is not None:
+        return form == _expected_expression(correct)
+    return _SYMPY_VERIFY and _sympy_equivalent(answer, correct)
+
+class ExerciseTopic:
+    """Base común de los temas: generación, reproducción, construcción y calificación por su REGISTRY
+    
+    Cada tema declara ID_PREFIX, TEMPLATES y un REGISTRY con sus tipos de ejercicio, y define los
+    métodos que este nombra (generadores, constructores, calificadores y retroalimentaciones); el
+    despacho, el almacén y el resultado de la calificación son comunes a todos.
+    """
+    
+    ID_PREFIX = ''
+    
+    def __init__(self, store: Optional[ExerciseStore] = None,
+                 ids: Optional[ExerciseIdAllocator] = None, seed: Optional[int] = None,
+                 rng: Optional[Any] = None, locale: str = DEFAULT_LOCALE,
+                 memo: Optional['ExerciseMemo'] = None):
+        self.exercises = store if store is not None else ExerciseStore()
+        self.ids = ids if ids is not None else ExerciseIdAllocator()
+        self.random = rng if isinstance(rng, RandomSource) else RandomSource(seed, rng)
+        self.locale = locale
+        # Memoria opcional de respuestas y textos por (tipo, dificultad, parámetros)
+        self.memo = memo
+        self.REGISTRY.bind(self)
+    
+    def generate_exercise(self, difficulty: int = 1, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Genera un ejercicio del tema, de un tipo elegido según su peso"""
+        rng, index = self.random.next()
+        return self._generate(difficulty, rng, index, locale)
+    
+    def replay_exercise(self, difficulty: int, index: int, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Regenera el ejercicio index de la sesión con semilla (mismos parámetros, id nuevo)"""
+        return self._generate(difficulty, self.random.at(index), index, locale)
+    
+    def _generate(self, difficulty: int, rng: random.Random, index: Optional[int],
+                  locale: Optional[str] = None) -> Dict[str, Any]:
+        """Elige el tipo (según su peso) con rng, construye el registro y lo guarda"""
+        exercise_type = self.EXERCISE_TYPES[self.REGISTRY.alias.sample(rng)]
+        exercise_id = self.ids.next_id(self.ID_PREFIX)
+        
+        record = self.build_record(exercise_type, exercise_id, difficulty, rng)
+        record.seed_index = index
+        # El almacén guarda el registro compacto; la respuesta de la API es el dict completo
+        self.exercises[exercise_id] = record
+        return record.to_dict(locale)
+    
+    def generate_batch(self, difficulty: int = 1, n: int = 1, weights: Optional[Dict[str, float]] = None,
+                       sampler: Optional['_BulkSampler'] = None, store: bool = True,
+                       locale: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Genera n ejercicios en una sola llamada, con pesos opcionales por tipo"""
+        records = _generate_topic_records(self, difficulty, n, weights, sampler)
+        if store:
+            self.exercises.put_many(records)
+        return [record.to_dict(locale) for record in records]
+    
+    def build_exercise(self, exercise_type: str, exercise_id: str, difficulty: int, rng,
+                       locale: Optional[str] = None) -> Dict[str, Any]:
+        """Construye un ejercicio del tipo indicado sin guardarlo, usando el generador aleatorio rng"""
+        return self._generators[exercise_type](exercise_id, difficulty, rng).to_dict(locale)
+    
+    def build_record(self, exercise_type: str, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Como build_exercise, pero devuelve el registro compacto sin generar el texto"""
+        return self._generators[exercise_type](exercise_id, difficulty, rng)
+    
+    def build_batch(self, exercise_type: str, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Construye en bloque registros de ejercicios del tipo indicado sin guardarlos"""
+        return self._batches[exercise_type](ids, difficulty, sampler)
+    
+    def check_answer(self, exercise_id: str, user_answer: Any, locale: Optional[str] = None) -> Dict[str, Any]:
+        """Verifica la respuesta del usuario"""
+        record = self.exercises.get(exercise_id)
+        if record is None:
+            return _missing_exercise_result(self.exercises, exercise_id)
+        # Solo se genera el texto que lee la retroalimentación, no el enunciado
+        return self.grade(record.view(locale), user_answer)
+    
+    def grade(self, exercise: Dict[str, Any], user_answer: Any) -> Dict[str, Any]:
+        """Califica la respuesta del usuario para un ejercicio ya construido"""
+        return self._grade_result(exercise, user_answer, self._is_correct(exercise, user_answer))
+    
+    def _is_correct(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Determina si la respuesta es correcta, sin construir la retroalimentación"""
+        return self._checks[exercise['type']](exercise, user_answer)
+    
+    def _feedback(self, exercise: Dict[str, Any], user_answer: Any, is_correct: bool) -> str:
+        """Construye el mensaje de retroalimentación: el específico del tipo, si lo tiene, o el común del tema"""
+        feedback = self._feedbacks.get(exercise['type'])
+        if feedback is not None:
+            return feedback(exercise, user_answer, is_correct)
+        key = 'feedback.correct' if is_correct else 'feedback.incorrect'
+        return _message(self, exercise, key) + exercise.get('explanation', '')
+    
+    def _shown_answer(self, exercise: Dict[str, Any]) -> Any:
+        """Respuesta correcta tal como se devuelve en el resultado de la calificación"""
+        return exercise['correct_answer']
+    
+    def _grade_result(self, exercise: Dict[str, Any], user_answer: Any, is_correct: bool) -> Dict[str, Any]:
+        """Resultado de check_answer para una respuesta ya calificada"""
+        return {
+            'correct': is_correct,
+            'feedback': self._feedback(exercise, user_answer, is_correct),
+            'explanation': exercise.get('explanation', ''),
+            'user_answer': user_answer,
+            'correct_answer': self._shown_answer(exercise)
+        }
 
-class ConjuntosNumericos:
+class ConjuntosNumericos(ExerciseTopic):
     """Clase para ejercicios de conjuntos numéricos"""
     
-    def __init__(self):
-        self.exercises = {}
-    
-    def generate_exercise(self, difficulty: int = 1) -> Dict[str, Any]:
-        """Genera ejercicios sobre conjuntos numéricos"""
-        exercise_types = [
-            'clasificar_numero',
-            'propiedades_operaciones',
-            'teorema_fundamental_aritmetica'
-        ]
-        
-        exercise_type = random.choice(exercise_types)
-        exercise_id = f"cn_{random.randint(1000, 9999)}"
-        
-        if exercise_type == 'clasificar_numero':
-            return self._generate_clasificar_numero(exercise_id, difficulty)
-        elif exercise_type == 'propiedades_operaciones':
-            return self._generate_propiedades_operaciones(exercise_id, difficulty)
-        else:
-            return self._generate_teorema_fundamental(exercise_id, difficulty)
+    ID_PREFIX = 'cn'
+    # Textos de los ejercicios por idioma (ver TemplateCatalog)
+    TEMPLATES = {
+        'es': {
+            'clasificar_numero.question': 'Clasifica el número {number} según los conjuntos numéricos (N, Z, Q, I, R)',
+            'clasificar_numero.feedback_correct': '¡Correcto! Has clasificado el número correctamente.',
+            'clasificar_numero.feedback_incorrect': 'Incorrecto. La clasificación correcta es: {classes:*, }',
+            'propiedades_operaciones.conmutativa_suma.question':
+                '¿Es verdad que {a} + {b} = {b} + {a}? Justifica usando la propiedad conmutativa.',
+            'propiedades_operaciones.conmutativa_suma.explanation':
+                'Sí, por la propiedad conmutativa: {a} + {b} = {total} = {total} = {b} + {a}',
+            'propiedades_operaciones.distributiva.question': 'Aplica la propiedad distributiva: {a}({b} + {c}) = ?',
+            'propiedades_operaciones.distributiva.explanation':
+                '{a}({b} + {c}) = {a}×{b} + {a}×{c} = {ab} + {ac} = {total}',
+            'teorema_fundamental.question': 'Encuentra la factorización prima de {number}',
+            'teorema_fundamental.explanation': 'La factorización prima de {number} es: {factors:* × }',
+            'teorema_fundamental.feedback_correct': '¡Excelente! La factorización prima es correcta.',
+            'teorema_fundamental.feedback_incorrect': 'Incorrecto. {explanation}'
+        },
+        'en': {
+            'clasificar_numero.question': 'Classify the number {number} into the number sets (N, Z, Q, I, R)',
+            'clasificar_numero.feedback_correct': 'Correct! You classified the number correctly.',
+            'clasificar_numero.feedback_incorrect': 'Incorrect. The correct classification is: {classes:*, }',
+            'propiedades_operaciones.conmutativa_suma.question':
+                'Is it true that {a} + {b} = {b} + {a}? Justify it using the commutative property.',
+            'propiedades_operaciones.conmutativa_suma.explanation':
+                'Yes, by the commutative property: {a} + {b} = {total} = {total} = {b} + {a}',
+            'propiedades_operaciones.distributiva.question': 'Apply the distributive property: {a}({b} + {c}) = ?',
+            'propiedades_operaciones.distributiva.explanation':
+                '{a}({b} + {c}) = {a}×{b} + {a}×{c} = {ab} + {ac} = {total}',
+            'teorema_fundamental.question': 'Find the prime factorization of {number}',
+            'teorema_fundamental.explanation': 'The prime factorization of {number} is: {factors:* × }',
+            'teorema_fundamental.feedback_correct': 'Excellent! The prime factorization is correct.',
+            'teorema_fundamental.feedback_incorrect': 'Incorrect. {explanation}'
+        }
+    }
+    # Sin calificadores vectorizados: check_batch califica estos tipos uno a uno
+    REGISTRY = ExerciseRegistry([
+        ExerciseType('clasificar_numero', '_generate_clasificar_numero', '_batch_clasificar_numero',
+                     '_check_clasificar_numero', feedback='_feedback_clasificar_numero',
+                     schema={'number': 'float'}, record=NumberRecord),
+        ExerciseType('propiedades_operaciones', '_generate_propiedades_operaciones',
+                     '_batch_propiedades_operaciones', '_check_propiedades_operaciones',
+                     feedback='_feedback_propiedades_operaciones',
+                     schema={'prop': 'str', 'a': 'int', 'b': 'int', 'c': 'int'}, record=PropertyRecord),
+        ExerciseType('teorema_fundamental_aritmetica', '_generate_teorema_fundamental',
+                     '_batch_teorema_fundamental', '_check_teorema_fundamental',
+                     feedback='_feedback_teorema_fundamental', tag='teorema_fundamental',
+                     schema={'number': 'int'}, record=NumberRecord)
+    ], TEMPLATES)
+    EXERCISE_TYPES = REGISTRY.names
     
-    def _generate_clasificar_numero(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio de clasificación de números"""
-        numbers = []
+    PROPERTIES = [
+        'conmutativa_suma',
+        'conmutativa_multiplicacion',
+        'asociativa_suma',
+        'asociativa_multiplicacion',
+        'distributiva',
+        'elemento_neutro',
+        'elemento_inverso'
+    ]
+    
+    def __init__(self, store: Optional[ExerciseStore] = None,
+                 ids: Optional[ExerciseIdAllocator] = None,
+                 primes: Optional[PrimeOracle] = None, seed: Optional[int] = None,
+                 rng: Optional[Any] = None, locale: str = DEFAULT_LOCALE,
+                 memo: Optional['ExerciseMemo'] = None):
+        self.primes = primes if primes is not None else PRIME_ORACLE
+        super().__init__(store, ids, seed, rng, locale, memo)
+    
+    def _clasificar_candidates(self, difficulty: int) -> List[Any]:
+        """Números candidatos para clasificar según la dificultad"""
         if difficulty == 1:
-            numbers = [5, -3, 0, 2.5, -1.7, 3/4]
+            return [5, -3, 0, 2.5, -1.7, 3/4]
         elif difficulty == 2:
-            numbers = [math.sqrt(2), math.pi, -5/3, 0.333, 7, -2]
+            return [math.sqrt(2), math.pi, -5/3, 0.333, 7, -2]
         else:
-            numbers = [math.e, math.sqrt(8), -7/11, 0.142857, 13, -math.sqrt(5)]
-        
-        selected_number = random.choice(numbers)
-        
+            return [math.e, math.sqrt(8), -7/11, 0.142857, 13, -math.sqrt(5)]
+    
+    def _generate_clasificar_numero(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio de clasificación de números"""
+        selected_number = rng.choice(self._clasificar_candidates(difficulty))
+        return self._records['clasificar_numero'](exercise_id, difficulty, selected_number)
+    
+    def _batch_clasificar_numero(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de clasificación de números"""
+        candidates = self._clasificar_candidates(difficulty)
+        picks = sampler.choice(range(len(candidates)), len(ids))
+        build = self._records['clasificar_numero']
+        return [build(exercise_id, difficulty, candidates[pick]) for exercise_id, pick in zip(ids, picks)]
+    
+    def _build_clasificar_numero(self, exercise_id: str, difficulty: int, selected_number) -> Dict[str, Any]:
+        """Construye el ejercicio de clasificación a partir del número elegido"""
         exercise = {
             'id': exercise_id,
             'type': 'clasificar_numero',
-            'question': f'Clasifica el número {selected_number} según los conjuntos numéricos (N, Z, Q, I, R)',
+            'question': _text('clasificar_numero.question', number=selected_number),
             'number': selected_number,
             'options': ['Natural', 'Entero', 'Racional', 'Irracional', 'Real'],
             'difficulty': difficulty
@@ -83,7 +3650,6 @@ class ConjuntosNumericos:
         correct_answer = self._classify_number(selected_number)
         exercise['correct_answer'] = correct_answer
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
     def _classify_number(self, number) -> List[str]:
@@ -112,21 +3678,23 @@ class ConjuntosNumericos:
         
         return classifications
     
-    def _generate_propiedades_operaciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_propiedades_operaciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio sobre propiedades de operaciones"""
-        properties = [
-            'conmutativa_suma',
-            'conmutativa_multiplicacion',
-            'asociativa_suma',
-            'asociativa_multiplicacion',
-            'distributiva',
-            'elemento_neutro',
-            'elemento_inverso'
-        ]
-        
-        prop = random.choice(properties)
-        a, b, c = random.randint(1, 10), random.randint(1, 10), random.randint(1, 10)
-        
+        prop = rng.choice(self.PROPERTIES)
+        a, b, c = rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10)
+        return self._records['propiedades_operaciones'](exercise_id, difficulty, prop, a, b, c)
+    
+    def _batch_propiedades_operaciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios sobre propiedades de operaciones"""
+        n = len(ids)
+        props = sampler.choice(self.PROPERTIES, n)
+        a, b, c = sampler.randint(1, 10, n), sampler.randint(1, 10, n), sampler.randint(1, 10, n)
+        build = self._records['propiedades_operaciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), props, a, b, c)]
+    
+    def _build_propiedades_operaciones(self, exercise_id: str, difficulty: int, prop: str,
+                                       a: int, b: int, c: int) -> Dict[str, Any]:
+        """Construye el ejercicio de propiedades a partir de la propiedad y los operandos"""
         exercise = {
             'id': exercise_id,
             'type': 'propiedades_operaciones',
@@ -135,31 +3703,46 @@ class ConjuntosNumericos:
         }
         
         if prop == 'conmutativa_suma':
-            exercise['question'] = f'¿Es verdad que {a} + {b} = {b} + {a}? Justifica usando la propiedad conmutativa.'
+            exercise['question'] = _text('propiedades_operaciones.conmutativa_suma.question', a=a, b=b)
             exercise['correct_answer'] = True
-            exercise['explanation'] = f'Sí, por la propiedad conmutativa: {a} + {b} = {a + b} = {b + a} = {b} + {a}'
+            exercise['explanation'] = _text('propiedades_operaciones.conmutativa_suma.explanation',
+                                            a=a, b=b, total=a + b)
         
         elif prop == 'distributiva':
-            exercise['question'] = f'Aplica la propiedad distributiva: {a}({b} + {c}) = ?'
+            exercise['question'] = _text('propiedades_operaciones.distributiva.question', a=a, b=b, c=c)
             exercise['correct_answer'] = a * b + a * c
-            exercise['explanation'] = f'{a}({b} + {c}) = {a}×{b} + {a}×{c} = {a*b} + {a*c} = {a*b + a*c}'
+            exercise['explanation'] = _text('propiedades_operaciones.distributiva.explanation',
+                                            a=a, b=b, c=c, ab=a * b, ac=a * c, total=a * b + a * c)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
-    def _generate_teorema_fundamental(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio sobre teorema fundamental de la aritmética"""
+    def _teorema_range(self, difficulty: int) -> Tuple[int, int]:
+        """Rango de números a factorizar según la dificultad"""
         if difficulty == 1:
-            number = random.randint(12, 50)
+            return 12, 50
         elif difficulty == 2:
-            number = random.randint(51, 200)
+            return 51, 200
         else:
-            number = random.randint(201, 500)
-        
+            return 201, 500
+    
+    def _generate_teorema_fundamental(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio sobre teorema fundamental de la aritmética"""
+        number = rng.randint(*self._teorema_range(difficulty))
+        return self._records['teorema_fundamental_aritmetica'](exercise_id, difficulty, number)
+    
+    def _batch_teorema_fundamental(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de factorización prima"""
+        low, high = self._teorema_range(difficulty)
+        numbers = sampler.randint(low, high, len(ids))
+        build = self._records['teorema_fundamental_aritmetica']
+        return [build(exercise_id, difficulty, number) for exercise_id, number in zip(ids, numbers)]
+    
+    def _build_teorema_fundamental(self, exercise_id: str, difficulty: int, number: int) -> Dict[str, Any]:
+        """Construye el ejercicio de factorización prima de number"""
         exercise = {
             'id': exercise_id,
             'type': 'teorema_fundamental',
-            'question': f'Encuentra la factorización prima de {number}',
+            'question': _text('teorema_fundamental.question', number=number),
             'number': number,
             'difficulty': difficulty
         }
@@ -167,108 +3750,169 @@ class ConjuntosNumericos:
         # Calcular factorización prima
         factors = self._prime_factorization(number)
         exercise['correct_answer'] = factors
-        exercise['explanation'] = f'La factorización prima de {number} es: {" × ".join(map(str, factors))}'
+        exercise['explanation'] = _text('teorema_fundamental.explanation', number=number, factors=factors)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
     def _prime_factorization(self, n: int) -> List[int]:
         """Encuentra la factorización prima de un número"""
-        factors = []
-        d = 2
-        while d * d <= n:
-            while n % d == 0:
-                factors.append(d)
-                n //= d
-            d += 1
-        if n > 1:
-            factors.append(n)
-        return factors
+        return self.primes.factorize(n)
     
-    def check_answer(self, exercise_id: str, user_answer: Any) -> Dict[str, Any]:
-        """Verifica la respuesta del usuario"""
-        if exercise_id not in self.exercises:
-            return {'error': 'Ejercicio no encontrado'}
-        
-        exercise = self.exercises[exercise_id]
+    def _check_clasificar_numero(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Compara listas de clasificaciones sin importar el orden"""
         correct = exercise['correct_answer']
-        
-        is_correct = False
-        feedback = ""
-        
-        if exercise['type'] == 'clasificar_numero':
-            # Comparar listas de clasificaciones
-            if isinstance(user_answer, list) and isinstance(correct, list):
-                is_correct = set(user_answer) == set(correct)
-                if is_correct:
-                    feedback = "¡Correcto! Has clasificado el número correctamente."
-                else:
-                    feedback = f"Incorrecto. La clasificación correcta es: {', '.join(correct)}"
-        
-        elif exercise['type'] == 'propiedades_operaciones':
-            if isinstance(correct, bool):
-                is_correct = user_answer == correct
+        if isinstance(user_answer, list) and isinstance(correct, list):
+            return set(user_answer) == set(correct)
+        return False
+    
+    def _check_propiedades_operaciones(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Compara un valor de verdad o un resultado numérico"""
+        correct = exercise['correct_answer']
+        if isinstance(correct, bool):
+            return user_answer == correct
+        else:
+            return abs(float(user_answer) - float(correct)) < 1e-6
+    
+    def _check_teorema_fundamental(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Compara factorizaciones primas sin importar el orden"""
+        correct = exercise['correct_answer']
+        if isinstance(user_answer, list) and isinstance(correct, list):
+            return sorted(user_answer) == sorted(correct)
+        return False
+    
+    def _feedback_clasificar_numero(self, exercise: Dict[str, Any], user_answer: Any, is_correct: bool) -> str:
+        correct = exercise['correct_answer']
+        if isinstance(user_answer, list) and isinstance(correct, list):
+            if is_correct:
+                return _message(self, exercise, 'clasificar_numero.feedback_correct')
             else:
-                is_correct = abs(float(user_answer) - float(correct)) < 1e-6
-            
-            feedback = exercise.get('explanation', '')
-        
-        elif exercise['type'] == 'teorema_fundamental':
-            if isinstance(user_answer, list) and isinstance(correct, list):
-                is_correct = sorted(user_answer) == sorted(correct)
-                if is_correct:
-                    feedback = "¡Excelente! La factorización prima es correcta."
-                else:
-                    feedback = f"Incorrecto. {exercise['explanation']}"
-        
-        return {
-            'correct': is_correct,
-            'feedback': feedback,
-            'explanation': exercise.get('explanation', ''),
-            'user_answer': user_answer,
-            'correct_answer': correct
-        }
+                return _message(self, exercise, 'clasificar_numero.feedback_incorrect', classes=correct)
+        return ""
+    
+    def _feedback_propiedades_operaciones(self, exercise: Dict[str, Any], user_answer: Any, is_correct: bool) -> str:
+        return exercise.get('explanation', '')
+    
+    def _feedback_teorema_fundamental(self, exercise: Dict[str, Any], user_answer: Any, is_correct: bool) -> str:
+        correct = exercise['correct_answer']
+        if isinstance(user_answer, list) and isinstance(correct, list):
+            if is_correct:
+                return _message(self, exercise, 'teorema_fundamental.feedback_correct')
+            else:
+                return _message(self, exercise, 'teorema_fundamental.feedback_incorrect',
+                                explanation=exercise['explanation'])
+        return ""
 
-class NumerosPrimos:
+class NumerosPrimos(ExerciseTopic):
     """Clase para ejercicios de números primos, MCM y MCD"""
     
-    def __init__(self):
-        self.exercises = {}
-    
-    def generate_exercise(self, difficulty: int = 1) -> Dict[str, Any]:
-        """Genera ejercicios sobre números primos"""
-        exercise_types = [
-            'identificar_primo',
-            'calcular_mcd',
-            'calcular_mcm',
-            'criterios_divisibilidad'
-        ]
-        
-        exercise_type = random.choice(exercise_types)
-        exercise_id = f"np_{random.randint(1000, 9999)}"
-        
-        if exercise_type == 'identificar_primo':
-            return self._generate_identificar_primo(exercise_id, difficulty)
-        elif exercise_type == 'calcular_mcd':
-            return self._generate_calcular_mcd(exercise_id, difficulty)
-        elif exercise_type == 'calcular_mcm':
-            return self._generate_calcular_mcm(exercise_id, difficulty)
-        else:
-            return self._generate_criterios_divisibilidad(exercise_id, difficulty)
+    ID_PREFIX = 'np'
+    # Textos de los ejercicios por idioma (ver TemplateCatalog)
+    TEMPLATES = {
+        'es': {
+            'identificar_primo.question': '¿Es {number} un número primo? Justifica tu respuesta.',
+            'identificar_primo.prime': '{number} es primo porque solo es divisible por 1 y por sí mismo.',
+            'identificar_primo.composite': '{number} no es primo. Sus factores son: {factors}',
+            'calcular_mcd.question': 'Calcula el MCD de {a} y {b}',
+            'calcular_mcd.question3': 'Calcula el MCD de {a}, {b} y {c}',
+            'calcular_mcd.explanation': 'MCD({a}, {b}) = {result}',
+            'calcular_mcd.explanation3': 'MCD({a}, {b}, {c}) = {result}',
+            'calcular_mcm.question': 'Calcula el MCM de {a} y {b}',
+            'calcular_mcm.question3': 'Calcula el MCM de {a}, {b} y {c}',
+            'calcular_mcm.explanation': 'MCM({a}, {b}) = {result}',
+            'calcular_mcm.explanation3': 'MCM({a}, {b}, {c}) = {result}',
+            'criterios_divisibilidad.question':
+                '¿Es {number} divisible por {divisor}? Aplica el criterio de divisibilidad correspondiente.',
+            'criterios_divisibilidad.rule2':
+                'Un número es divisible por 2 si termina en cifra par. {number} {divisible:sí|no} cumple este criterio.',
+            'criterios_divisibilidad.rule3':
+                'Un número es divisible por 3 si la suma de sus cifras es divisible por 3. '
+                'Suma de cifras de {number}: {digit_sum}',
+            'criterios_divisibilidad.rule5':
+                'Un número es divisible por 5 si termina en 0 o 5. {number} {divisible:sí|no} cumple este criterio.',
+            'criterios_divisibilidad.rule10':
+                'Un número es divisible por 10 si termina en 0. {number} {divisible:sí|no} cumple este criterio.',
+            'criterios_divisibilidad.explanation': '{number} {divisible:es|no es} divisible por {divisor}'
+        },
+        'en': {
+            'identificar_primo.question': 'Is {number} a prime number? Justify your answer.',
+            'identificar_primo.prime': '{number} is prime because it is only divisible by 1 and itself.',
+            'identificar_primo.composite': '{number} is not prime. Its factors are: {factors}',
+            'calcular_mcd.question': 'Find the GCD of {a} and {b}',
+            'calcular_mcd.question3': 'Find the GCD of {a}, {b} and {c}',
+            'calcular_mcd.explanation': 'GCD({a}, {b}) = {result}',
+            'calcular_mcd.explanation3': 'GCD({a}, {b}, {c}) = {result}',
+            'calcular_mcm.question': 'Find the LCM of {a} and {b}',
+            'calcular_mcm.question3': 'Find the LCM of {a}, {b} and {c}',
+            'calcular_mcm.explanation': 'LCM({a}, {b}) = {result}',
+            'calcular_mcm.explanation3': 'LCM({a}, {b}, {c}) = {result}',
+            'criterios_divisibilidad.question':
+                'Is {number} divisible by {divisor}? Apply the corresponding divisibility rule.',
+            'criterios_divisibilidad.rule2':
+                'A number is divisible by 2 if its last digit is even. {number} {divisible:meets|does not meet} this rule.',
+            'criterios_divisibilidad.rule3':
+                'A number is divisible by 3 if the sum of its digits is divisible by 3. '
+                'Sum of the digits of {number}: {digit_sum}',
+            'criterios_divisibilidad.rule5':
+                'A number is divisible by 5 if it ends in 0 or 5. {number} {divisible:meets|does not meet} this rule.',
+            'criterios_divisibilidad.rule10':
+                'A number is divisible by 10 if it ends in 0. {number} {divisible:meets|does not meet} this rule.',
+            'criterios_divisibilidad.explanation': '{number} {divisible:is|is not} divisible by {divisor}'
+        }
+    }
+    REGISTRY = ExerciseRegistry([
+        ExerciseType('identificar_primo', '_generate_identificar_primo', '_batch_identificar_primo',
+                     '_check_boolean', 'bool', {'number': 'int'}, record=NumberRecord),
+        ExerciseType('calcular_mcd', '_generate_calcular_mcd', '_batch_calcular_mcd',
+                     '_check_integer', 'int', {'numbers': 'List[int]'}, record=NumberListRecord),
+        ExerciseType('calcular_mcm', '_generate_calcular_mcm', '_batch_calcular_mcm',
+                     '_check_integer', 'int', {'numbers': 'List[int]'}, record=NumberListRecord),
+        ExerciseType('criterios_divisibilidad', '_generate_criterios_divisibilidad',
+                     '_batch_criterios_divisibilidad', '_check_boolean', 'bool',
+                     {'number': 'int', 'divisor': 'int'}, record=DivisibilityRecord)
+    ], TEMPLATES)
+    EXERCISE_TYPES = REGISTRY.names
     
-    def _generate_identificar_primo(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio de identificación de números primos"""
+    DIVISORS = [2, 3, 4, 5, 6, 8, 9, 10, 11]
+    # Divisores con criterio propio en la explicación
+    DIVISIBILITY_RULES = (2, 3, 5, 10)
+    
+    def __init__(self, store: Optional[ExerciseStore] = None,
+                 ids: Optional[ExerciseIdAllocator] = None,
+                 primes: Optional[PrimeOracle] = None, seed: Optional[int] = None,
+                 rng: Optional[Any] = None, locale: str = DEFAULT_LOCALE,
+                 tables: Optional[AnswerTables] = None, memo: Optional['ExerciseMemo'] = None):
+        self.primes = primes if primes is not None else PRIME_ORACLE
+        # Tablas de respuestas precalculadas opcionales (None: se calculan en cada ejercicio)
+        self.tables = tables
+        super().__init__(store, ids, seed, rng, locale, memo)
+    
+    def _identificar_range(self, difficulty: int) -> Tuple[int, int]:
+        """Rango de números candidatos a primo según la dificultad"""
         if difficulty == 1:
-            number = random.randint(2, 30)
+            return 2, 30
         elif difficulty == 2:
-            number = random.randint(31, 100)
+            return 31, 100
         else:
-            number = random.randint(101, 300)
-        
+            return 101, 300
+    
+    def _generate_identificar_primo(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio de identificación de números primos"""
+        number = rng.randint(*self._identificar_range(difficulty))
+        return self._records['identificar_primo'](exercise_id, difficulty, number)
+    
+    def _batch_identificar_primo(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de identificación de números primos"""
+        low, high = self._identificar_range(difficulty)
+        numbers = sampler.randint(low, high, len(ids))
+        build = self._records['identificar_primo']
+        return [build(exercise_id, difficulty, number) for exercise_id, number in zip(ids, numbers)]
+    
+    def _build_identificar_primo(self, exercise_id: str, difficulty: int, number: int) -> Dict[str, Any]:
+        """Construye el ejercicio de identificación para number"""
         exercise = {
             'id': exercise_id,
             'type': 'identificar_primo',
-            'question': f'¿Es {number} un número primo? Justifica tu respuesta.',
+            'question': _text('identificar_primo.question', number=number),
             'number': number,
             'difficulty': difficulty
         }
@@ -277,102 +3921,153 @@ class NumerosPrimos:
         exercise['correct_answer'] = is_prime
         
         if is_prime:
-            exercise['explanation'] = f'{number} es primo porque solo es divisible por 1 y por sí mismo.'
+            exercise['explanation'] = _text('identificar_primo.prime', number=number)
         else:
-            factors = self._find_factors(number)
-            exercise['explanation'] = f'{number} no es primo. Sus factores son: {factors}'
+            # Los divisores solo se calculan si se llega a leer la explicación
+            exercise['explanation'] = _text('identificar_primo.composite',
+                                            {'factors': functools.partial(self._find_factors, number)},
+                                            number=number)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
-    def _generate_calcular_mcd(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio de cálculo de MCD"""
+    def _mcd_spec(self, difficulty: int) -> Tuple[int, int, int]:
+        """Rango y cantidad de números para el MCD según la dificultad"""
+        if difficulty == 1:
+            return 6, 30, 2
+        elif difficulty == 2:
+            return 20, 100, 2
+        else:
+            return 50, 200, 3
+    
+    def _mcm_spec(self, difficulty: int) -> Tuple[int, int, int]:
+        """Rango y cantidad de números para el MCM según la dificultad"""
         if difficulty == 1:
-            a, b = random.randint(6, 30), random.randint(6, 30)
+            return 3, 15, 2
         elif difficulty == 2:
-            a, b = random.randint(20, 100), random.randint(20, 100)
+            return 10, 50, 2
         else:
-            a, b, c = random.randint(50, 200), random.randint(50, 200), random.randint(50, 200)
+            return 20, 100, 3
+    
+    def _generate_calcular_mcd(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio de cálculo de MCD"""
+        low, high, count = self._mcd_spec(difficulty)
+        numbers = [rng.randint(low, high) for _ in range(count)]
+        return self._records['calcular_mcd'](exercise_id, difficulty, numbers)
+    
+    def _batch_calcular_mcd(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de cálculo de MCD"""
+        low, high, count = self._mcd_spec(difficulty)
+        columns = [sampler.randint(low, high, len(ids)) for _ in range(count)]
+        build = self._records['calcular_mcd']
+        return [build(exercise_id, difficulty, list(numbers)) for exercise_id, numbers in zip(ids, zip(*columns))]
+    
+    def _build_calcular_mcd(self, exercise_id: str, difficulty: int, numbers: List[int]) -> Dict[str, Any]:
+        """Construye el ejercicio de MCD para dos o tres números"""
+        if len(numbers) == 3:
+            a, b, c = numbers
             exercise = {
                 'id': exercise_id,
                 'type': 'calcular_mcd',
-                'question': f'Calcula el MCD de {a}, {b} y {c}',
-                'numbers': [a, b, c],
+                'question': _text('calcular_mcd.question3', a=a, b=b, c=c),
+                'numbers': numbers,
                 'difficulty': difficulty
             }
             mcd = math.gcd(math.gcd(a, b), c)
             exercise['correct_answer'] = mcd
-            exercise['explanation'] = f'MCD({a}, {b}, {c}) = {mcd}'
-            self.exercises[exercise_id] = exercise
+            exercise['explanation'] = _text('calcular_mcd.explanation3', a=a, b=b, c=c, result=mcd)
             return exercise
         
+        a, b = numbers
         exercise = {
             'id': exercise_id,
             'type': 'calcular_mcd',
-            'question': f'Calcula el MCD de {a} y {b}',
-            'numbers': [a, b],
+            'question': _text('calcular_mcd.question', a=a, b=b),
+            'numbers': numbers,
             'difficulty': difficulty
         }
         
         mcd = math.gcd(a, b)
         exercise['correct_answer'] = mcd
-        exercise['explanation'] = f'MCD({a}, {b}) = {mcd}'
+        exercise['explanation'] = _text('calcular_mcd.explanation', a=a, b=b, result=mcd)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
-    def _generate_calcular_mcm(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_calcular_mcm(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de cálculo de MCM"""
-        if difficulty == 1:
-            a, b = random.randint(3, 15), random.randint(3, 15)
-        elif difficulty == 2:
-            a, b = random.randint(10, 50), random.randint(10, 50)
-        else:
-            a, b, c = random.randint(20, 100), random.randint(20, 100), random.randint(20, 100)
+        low, high, count = self._mcm_spec(difficulty)
+        numbers = [rng.randint(low, high) for _ in range(count)]
+        return self._records['calcular_mcm'](exercise_id, difficulty, numbers)
+    
+    def _batch_calcular_mcm(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de cálculo de MCM"""
+        low, high, count = self._mcm_spec(difficulty)
+        columns = [sampler.randint(low, high, len(ids)) for _ in range(count)]
+        build = self._records['calcular_mcm']
+        return [build(exercise_id, difficulty, list(numbers)) for exercise_id, numbers in zip(ids, zip(*columns))]
+    
+    def _build_calcular_mcm(self, exercise_id: str, difficulty: int, numbers: List[int]) -> Dict[str, Any]:
+        """Construye el ejercicio de MCM para dos o tres números"""
+        if len(numbers) == 3:
+            a, b, c = numbers
             exercise = {
                 'id': exercise_id,
                 'type': 'calcular_mcm',
-                'question': f'Calcula el MCM de {a}, {b} y {c}',
-                'numbers': [a, b, c],
+                'question': _text('calcular_mcm.question3', a=a, b=b, c=c),
+                'numbers': numbers,
                 'difficulty': difficulty
             }
             mcm = abs(a * b * c) // math.gcd(math.gcd(a, b), c)
             exercise['correct_answer'] = mcm
-            exercise['explanation'] = f'MCM({a}, {b}, {c}) = {mcm}'
-            self.exercises[exercise_id] = exercise
+            exercise['explanation'] = _text('calcular_mcm.explanation3', a=a, b=b, c=c, result=mcm)
             return exercise
         
+        a, b = numbers
         exercise = {
             'id': exercise_id,
             'type': 'calcular_mcm',
-            'question': f'Calcula el MCM de {a} y {b}',
-            'numbers': [a, b],
+            'question': _text('calcular_mcm.question', a=a, b=b),
+            'numbers': numbers,
             'difficulty': difficulty
         }
         
         mcm = abs(a * b) // math.gcd(a, b)
         exercise['correct_answer'] = mcm
-        exercise['explanation'] = f'MCM({a}, {b}) = {mcm}'
+        exercise['explanation'] = _text('calcular_mcm.explanation', a=a, b=b, result=mcm)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
-    def _generate_criterios_divisibilidad(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio sobre criterios de divisibilidad"""
-        divisors = [2, 3, 4, 5, 6, 8, 9, 10, 11]
-        divisor = random.choice(divisors)
-        
+    def _divisibilidad_range(self, difficulty: int) -> Tuple[int, int]:
+        """Rango de números para criterios de divisibilidad según la dificultad"""
         if difficulty == 1:
-            number = random.randint(100, 999)
+            return 100, 999
         elif difficulty == 2:
-            number = random.randint(1000, 9999)
+            return 1000, 9999
         else:
-            number = random.randint(10000, 99999)
-        
+            return 10000, 99999
+    
+    def _generate_criterios_divisibilidad(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio sobre criterios de divisibilidad"""
+        divisor = rng.choice(self.DIVISORS)
+        number = rng.randint(*self._divisibilidad_range(difficulty))
+        return self._records['criterios_divisibilidad'](exercise_id, difficulty, number, divisor)
+    
+    def _batch_criterios_divisibilidad(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios sobre criterios de divisibilidad"""
+        n = len(ids)
+        divisors = sampler.choice(self.DIVISORS, n)
+        low, high = self._divisibilidad_range(difficulty)
+        numbers = sampler.randint(low, high, n)
+        build = self._records['criterios_divisibilidad']
+        return [build(exercise_id, difficulty, number, divisor)
+                for exercise_id, number, divisor in zip(ids, numbers, divisors)]
+    
+    def _build_criterios_divisibilidad(self, exercise_id: str, difficulty: int,
+                                       number: int, divisor: int) -> Dict[str, Any]:
+        """Construye el ejercicio de divisibilidad de number entre divisor"""
         exercise = {
             'id': exercise_id,
             'type': 'criterios_divisibilidad',
-            'question': f'¿Es {number} divisible por {divisor}? Aplica el criterio de divisibilidad correspondiente.',
+            'question': _text('criterios_divisibilidad.question', number=number, divisor=divisor),
             'number': number,
             'divisor': divisor,
             'difficulty': difficulty
@@ -382,369 +4077,474 @@ class NumerosPrimos:
         exercise['correct_answer'] = is_divisible
         exercise['explanation'] = self._get_divisibility_explanation(number, divisor, is_divisible)
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
     def _is_prime(self, n: int) -> bool:
         """Verifica si un número es primo"""
-        if n < 2:
-            return False
-        for i in range(2, int(n**0.5) + 1):
-            if n % i == 0:
-                return False
-        return True
+        if self.tables is not None:
+            is_prime = self.tables.is_prime(n)
+            if is_prime is not None:
+                return is_prime
+        return self.primes.is_prime(n)
     
     def _find_factors(self, n: int) -> List[int]:
         """Encuentra todos los factores de un número"""
-        factors = []
-        for i in range(1, n + 1):
-            if n % i == 0:
-                factors.append(i)
-        return factors
-    
-    def _get_divisibility_explanation(self, number: int, divisor: int, is_divisible: bool) -> str:
-        """Genera explicación para criterios de divisibilidad"""
-        explanations = {
-            2: f"Un número es divisible por 2 si termina en cifra par. {number} {'sí' if is_divisible else 'no'} cumple este criterio.",
-            3: f"Un número es divisible por 3 si la suma de sus cifras es divisible por 3. Suma de cifras de {number}: {sum(int(d) for d in str(number))}",
-            5: f"Un número es divisible por 5 si termina en 0 o 5. {number} {'sí' if is_divisible else 'no'} cumple este criterio.",
-            10: f"Un número es divisible por 10 si termina en 0. {number} {'sí' if is_divisible else 'no'} cumple este criterio."
-        }
-        
-        return explanations.get(divisor, f"{number} {'es' if is_divisible else 'no es'} divisible por {divisor}")
+        if self.tables is not None:
+            divisors = self.tables.divisors(n)
+            if divisors is not None:
+                return divisors
+        return self.primes.divisors(n)
     
-    def check_answer(self, exercise_id: str, user_answer: Any) -> Dict[str, Any]:
-        """Verifica la respuesta del usuario"""
-        if exercise_id not in self.exercises:
-            return {'error': 'Ejercicio no encontrado'}
-        
-        exercise = self.exercises[exercise_id]
-        correct = exercise['correct_answer']
-        
-        is_correct = False
-        feedback = ""
-        
-        if exercise['type'] in ['identificar_primo', 'criterios_divisibilidad']:
-            is_correct = bool(user_answer) == bool(correct)
-        else:  # calcular_mcd, calcular_mcm
-            try:
-                is_correct = int(user_answer) == int(correct)
-            except (ValueError, TypeError):
-                is_correct = False
-        
-        if is_correct:
-            feedback = "¡Correcto! " + exercise.get('explanation', '')
+    def _get_divisibility_explanation(self, number: int, divisor: int, is_divisible: bool) -> LazyText:
+        """Explicación del criterio de divisibilidad: solo la del divisor pedido, generada al leerla"""
+        if divisor in self.DIVISIBILITY_RULES:
+            key = f'criterios_divisibilidad.rule{divisor}'
         else:
-            feedback = "Incorrecto. " + exercise.get('explanation', '')
-        
-        return {
-            'correct': is_correct,
-            'feedback': feedback,
-            'explanation': exercise.get('explanation', ''),
-            'user_answer': user_answer,
-            'correct_answer': correct
-        }
+            key = 'criterios_divisibilidad.explanation'
+        # Solo el criterio del 3 muestra la suma de las cifras
+        deferred = {'digit_sum': lambda: sum(int(d) for d in str(number))} if divisor == 3 else None
+        return _text(key, deferred, number=number, divisor=divisor, divisible=is_divisible)
+    
+    def _check_boolean(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Respuestas de sí/no (identificar_primo, criterios_divisibilidad)"""
+        return bool(user_answer) == bool(exercise['correct_answer'])
+    
+    def _check_integer(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Respuestas enteras (calcular_mcd, calcular_mcm)"""
+        try:
+            return int(user_answer) == int(exercise['correct_answer'])
+        except (ValueError, TypeError):
+            return False
 
-class Fraccionarios:
+class Fraccionarios(ExerciseTopic):
     """Clase para ejercicios de números fraccionarios"""
     
-    def __init__(self):
-        self.exercises = {}
-    
-    def generate_exercise(self, difficulty: int = 1) -> Dict[str, Any]:
-        """Genera ejercicios sobre fracciones"""
-        exercise_types = [
-            'suma_fracciones',
-            'resta_fracciones',
-            'multiplicacion_fracciones',
-            'division_fracciones',
-            'simplificar_fraccion',
-            'comparar_fracciones'
-        ]
-        
-        exercise_type = random.choice(exercise_types)
-        exercise_id = f"fr_{random.randint(1000, 9999)}"
-        
-        if exercise_type == 'suma_fracciones':
-            return self._generate_suma_fracciones(exercise_id, difficulty)
-        elif exercise_type == 'resta_fracciones':
-            return self._generate_resta_fracciones(exercise_id, difficulty)
-        elif exercise_type == 'multiplicacion_fracciones':
-            return self._generate_multiplicacion_fracciones(exercise_id, difficulty)
-        elif exercise_type == 'division_fracciones':
-            return self._generate_division_fracciones(exercise_id, difficulty)
-        elif exercise_type == 'simplificar_fraccion':
-            return self._generate_simplificar_fraccion(exercise_id, difficulty)
-        else:
-            return self._generate_comparar_fracciones(exercise_id, difficulty)
+    ID_PREFIX = 'fr'
+    _PAIR = {'num1': 'int', 'den1': 'int', 'num2': 'int', 'den2': 'int'}
+    # Textos de los ejercicios por idioma (ver TemplateCatalog)
+    TEMPLATES = {
+        'es': {
+            'suma_fracciones.question': 'Calcula: {frac1} + {frac2}',
+            'suma_fracciones.explanation': '{frac1} + {frac2} = {result}',
+            'resta_fracciones.question': 'Calcula: {frac1} - {frac2}',
+            'resta_fracciones.explanation': '{frac1} - {frac2} = {result}',
+            'multiplicacion_fracciones.question': 'Calcula: {frac1} × {frac2}',
+            'multiplicacion_fracciones.explanation': '{frac1} × {frac2} = {result}',
+            'division_fracciones.question': 'Calcula: {frac1} ÷ {frac2}',
+            'division_fracciones.explanation': '{frac1} ÷ {frac2} = {frac1} × {reciprocal} = {result}',
+            'simplificar_fraccion.question': 'Simplifica la fracción: {num}/{den}',
+            'simplificar_fraccion.explanation': '{num}/{den} = {result}',
+            'comparar_fracciones.question': 'Compara las fracciones: {frac1} ___ {frac2} (usa >, < o =)',
+            'comparar_fracciones.explanation': '{frac1} {comparison} {frac2}'
+        },
+        'en': {
+            'suma_fracciones.question': 'Calculate: {frac1} + {frac2}',
+            'resta_fracciones.question': 'Calculate: {frac1} - {frac2}',
+            'multiplicacion_fracciones.question': 'Calculate: {frac1} × {frac2}',
+            'division_fracciones.question': 'Calculate: {frac1} ÷ {frac2}',
+            'simplificar_fraccion.question': 'Simplify the fraction: {num}/{den}',
+            'comparar_fracciones.question': 'Compare the fractions: {frac1} ___ {frac2} (use >, < or =)'
+        }
+    }
+    REGISTRY = ExerciseRegistry([
+        ExerciseType('suma_fracciones', '_generate_suma_fracciones', '_batch_suma_fracciones',
+                     '_check_fraction', 'fraction', _PAIR, record=FractionPairRecord),
+        ExerciseType('resta_fracciones', '_generate_resta_fracciones', '_batch_resta_fracciones',
+                     '_check_fraction', 'fraction', _PAIR, record=FractionPairRecord),
+        ExerciseType('multiplicacion_fracciones', '_generate_multiplicacion_fracciones',
+                     '_batch_multiplicacion_fracciones', '_check_fraction', 'fraction', _PAIR,
+                     record=FractionPairRecord),
+        ExerciseType('division_fracciones', '_generate_division_fracciones', '_batch_division_fracciones',
+                     '_check_fraction', 'fraction', _PAIR, record=FractionPairRecord),
+        ExerciseType('simplificar_fraccion', '_generate_simplificar_fraccion', '_batch_simplificar_fraccion',
+                     '_check_fraction', 'fraction', {'num': 'int', 'den': 'int'}, record=FractionRecord),
+        ExerciseType('comparar_fracciones', '_generate_comparar_fracciones', '_batch_comparar_fracciones',
+                     '_check_comparison', 'text', _PAIR, record=FractionPairRecord)
+    ], TEMPLATES)
+    EXERCISE_TYPES = REGISTRY.names
     
-    def _generate_suma_fracciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_suma_fracciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de suma de fracciones"""
         if difficulty == 1:
             # Mismo denominador
-            den = random.randint(2, 10)
-            num1 = random.randint(1, den-1)
-            num2 = random.randint(1, den-1)
-            frac1 = Fraction(num1, den)
-            frac2 = Fraction(num2, den)
+            den = rng.randint(2, 10)
+            num1 = rng.randint(1, den-1)
+            num2 = rng.randint(1, den-1)
+            den1 = den2 = den
         else:
             # Diferentes denominadores
-            num1, den1 = random.randint(1, 10), random.randint(2, 12)
-            num2, den2 = random.randint(1, 10), random.randint(2, 12)
-            frac1 = Fraction(num1, den1)
-            frac2 = Fraction(num2, den2)
-        
-        result = frac1 + frac2
+            num1, den1 = rng.randint(1, 10), rng.randint(2, 12)
+            num2, den2 = rng.randint(1, 10), rng.randint(2, 12)
+        return self._records['suma_fracciones'](exercise_id, difficulty, num1, den1, num2, den2)
+    
+    def _batch_suma_fracciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de suma de fracciones"""
+        n = len(ids)
+        if difficulty == 1:
+            den1 = den2 = sampler.randint(2, 10, n)
+            upper = [den - 1 for den in den1]
+            num1, num2 = sampler.randint(1, upper, n), sampler.randint(1, upper, n)
+        else:
+            num1, den1 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+            num2, den2 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        build = self._records['suma_fracciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), num1, den1, num2, den2)]
+    
+    def _build_suma_fracciones(self, exercise_id: str, difficulty: int,
+                               num1: int, den1: int, num2: int, den2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de suma num1/den1 + num2/den2"""
+        num1, den1 = _frac_normalize(num1, den1)
+        num2, den2 = _frac_normalize(num2, den2)
+        frac1, frac2 = Fraction(num1, den1), Fraction(num2, den2)
+        result = Fraction(*_frac_add(num1, den1, num2, den2))
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'suma_fracciones',
-            'question': f'Calcula: {frac1} + {frac2}',
+            'question': _text('suma_fracciones.question', frac1=frac1, frac2=frac2),
             'fractions': [frac1, frac2],
             'difficulty': difficulty,
             'correct_answer': result,
-            'explanation': f'{frac1} + {frac2} = {result}'
+            'explanation': _text('suma_fracciones.explanation', frac1=frac1, frac2=frac2, result=result)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_resta_fracciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_resta_fracciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de resta de fracciones"""
         if difficulty == 1:
-            den = random.randint(2, 10)
-            num1 = random.randint(2, den)
-            num2 = random.randint(1, num1-1)
-            frac1 = Fraction(num1, den)
-            frac2 = Fraction(num2, den)
+            den = rng.randint(2, 10)
+            num1 = rng.randint(2, den)
+            num2 = rng.randint(1, num1-1)
+            den1 = den2 = den
         else:
-            num1, den1 = random.randint(2, 15), random.randint(2, 12)
-            num2, den2 = random.randint(1, 10), random.randint(2, 12)
-            frac1 = Fraction(num1, den1)
-            frac2 = Fraction(num2, den2)
-        
-        result = frac1 - frac2
+            num1, den1 = rng.randint(2, 15), rng.randint(2, 12)
+            num2, den2 = rng.randint(1, 10), rng.randint(2, 12)
+        return self._records['resta_fracciones'](exercise_id, difficulty, num1, den1, num2, den2)
+    
+    def _batch_resta_fracciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de resta de fracciones"""
+        n = len(ids)
+        if difficulty == 1:
+            den1 = den2 = sampler.randint(2, 10, n)
+            num1 = sampler.randint(2, den1, n)
+            num2 = sampler.randint(1, [num - 1 for num in num1], n)
+        else:
+            num1, den1 = sampler.randint(2, 15, n), sampler.randint(2, 12, n)
+            num2, den2 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        build = self._records['resta_fracciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), num1, den1, num2, den2)]
+    
+    def _build_resta_fracciones(self, exercise_id: str, difficulty: int,
+                                num1: int, den1: int, num2: int, den2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de resta num1/den1 - num2/den2"""
+        num1, den1 = _frac_normalize(num1, den1)
+        num2, den2 = _frac_normalize(num2, den2)
+        frac1, frac2 = Fraction(num1, den1), Fraction(num2, den2)
+        result = Fraction(*_frac_sub(num1, den1, num2, den2))
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'resta_fracciones',
-            'question': f'Calcula: {frac1} - {frac2}',
+            'question': _text('resta_fracciones.question', frac1=frac1, frac2=frac2),
             'fractions': [frac1, frac2],
             'difficulty': difficulty,
             'correct_answer': result,
-            'explanation': f'{frac1} - {frac2} = {result}'
+            'explanation': _text('resta_fracciones.explanation', frac1=frac1, frac2=frac2, result=result)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_multiplicacion_fracciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_multiplicacion_fracciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de multiplicación de fracciones"""
-        num1, den1 = random.randint(1, 8), random.randint(2, 10)
-        num2, den2 = random.randint(1, 8), random.randint(2, 10)
-        
-        frac1 = Fraction(num1, den1)
-        frac2 = Fraction(num2, den2)
-        result = frac1 * frac2
+        num1, den1 = rng.randint(1, 8), rng.randint(2, 10)
+        num2, den2 = rng.randint(1, 8), rng.randint(2, 10)
+        return self._records['multiplicacion_fracciones'](exercise_id, difficulty, num1, den1, num2, den2)
+    
+    def _batch_multiplicacion_fracciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de multiplicación de fracciones"""
+        n = len(ids)
+        num1, den1 = sampler.randint(1, 8, n), sampler.randint(2, 10, n)
+        num2, den2 = sampler.randint(1, 8, n), sampler.randint(2, 10, n)
+        build = self._records['multiplicacion_fracciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), num1, den1, num2, den2)]
+    
+    def _build_multiplicacion_fracciones(self, exercise_id: str, difficulty: int,
+                                         num1: int, den1: int, num2: int, den2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de multiplicación num1/den1 × num2/den2"""
+        num1, den1 = _frac_normalize(num1, den1)
+        num2, den2 = _frac_normalize(num2, den2)
+        frac1, frac2 = Fraction(num1, den1), Fraction(num2, den2)
+        result = Fraction(*_frac_mul(num1, den1, num2, den2))
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'multiplicacion_fracciones',
-            'question': f'Calcula: {frac1} × {frac2}',
+            'question': _text('multiplicacion_fracciones.question', frac1=frac1, frac2=frac2),
             'fractions': [frac1, frac2],
             'difficulty': difficulty,
             'correct_answer': result,
-            'explanation': f'{frac1} × {frac2} = {result}'
+            'explanation': _text('multiplicacion_fracciones.explanation', frac1=frac1, frac2=frac2, result=result)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_division_fracciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_division_fracciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de división de fracciones"""
-        num1, den1 = random.randint(1, 10), random.randint(2, 12)
-        num2, den2 = random.randint(1, 10), random.randint(2, 12)
-        
-        frac1 = Fraction(num1, den1)
-        frac2 = Fraction(num2, den2)
-        result = frac1 / frac2
+        num1, den1 = rng.randint(1, 10), rng.randint(2, 12)
+        num2, den2 = rng.randint(1, 10), rng.randint(2, 12)
+        return self._records['division_fracciones'](exercise_id, difficulty, num1, den1, num2, den2)
+    
+    def _batch_division_fracciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de división de fracciones"""
+        n = len(ids)
+        num1, den1 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        num2, den2 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        build = self._records['division_fracciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), num1, den1, num2, den2)]
+    
+    def _build_division_fracciones(self, exercise_id: str, difficulty: int,
+                                   num1: int, den1: int, num2: int, den2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de división num1/den1 ÷ num2/den2"""
+        num1, den1 = _frac_normalize(num1, den1)
+        num2, den2 = _frac_normalize(num2, den2)
+        frac1, frac2 = Fraction(num1, den1), Fraction(num2, den2)
+        result = Fraction(*_frac_div(num1, den1, num2, den2))
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'division_fracciones',
-            'question': f'Calcula: {frac1} ÷ {frac2}',
+            'question': _text('division_fracciones.question', frac1=frac1, frac2=frac2),
             'fractions': [frac1, frac2],
             'difficulty': difficulty,
             'correct_answer': result,
-            'explanation': f'{frac1} ÷ {frac2} = {frac1} × {Fraction(den2, num2)} = {result}'
+            'explanation': _text('division_fracciones.explanation', {'reciprocal': functools.partial(Fraction, den2, num2)},
+                                 frac1=frac1, frac2=frac2, result=result)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_simplificar_fraccion(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_simplificar_fraccion(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de simplificación de fracciones"""
         if difficulty == 1:
             # Fracciones fáciles de simplificar
-            base_num = random.randint(2, 6)
-            base_den = random.randint(2, 6)
-            multiplier = random.randint(2, 5)
+            base_num = rng.randint(2, 6)
+            base_den = rng.randint(2, 6)
+            multiplier = rng.randint(2, 5)
             num = base_num * multiplier
             den = base_den * multiplier
         else:
             # Fracciones más complejas
-            num = random.randint(12, 60)
-            den = random.randint(12, 60)
-        
-        original = Fraction(num, den)
-        simplified = original  # Fraction se simplifica automáticamente
+            num = rng.randint(12, 60)
+            den = rng.randint(12, 60)
+        return self._records['simplificar_fraccion'](exercise_id, difficulty, num, den)
+    
+    def _batch_simplificar_fraccion(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de simplificación de fracciones"""
+        n = len(ids)
+        if difficulty == 1:
+            base_num, base_den = sampler.randint(2, 6, n), sampler.randint(2, 6, n)
+            multiplier = sampler.randint(2, 5, n)
+            num = [x * m for x, m in zip(base_num, multiplier)]
+            den = [x * m for x, m in zip(base_den, multiplier)]
+        else:
+            num, den = sampler.randint(12, 60, n), sampler.randint(12, 60, n)
+        build = self._records['simplificar_fraccion']
+        return [build(exercise_id, difficulty, a, b) for exercise_id, a, b in zip(ids, num, den)]
+    
+    def _build_simplificar_fraccion(self, exercise_id: str, difficulty: int, num: int, den: int) -> Dict[str, Any]:
+        """Construye el ejercicio de simplificación de num/den"""
+        simplified = Fraction(*_frac_normalize(num, den))
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'simplificar_fraccion',
-            'question': f'Simplifica la fracción: {num}/{den}',
+            'question': _text('simplificar_fraccion.question', num=num, den=den),
             'original_fraction': f"{num}/{den}",
             'difficulty': difficulty,
             'correct_answer': simplified,
-            'explanation': f'{num}/{den} = {simplified}'
+            'explanation': _text('simplificar_fraccion.explanation', num=num, den=den, result=simplified)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_comparar_fracciones(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_comparar_fracciones(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de comparación de fracciones"""
-        num1, den1 = random.randint(1, 10), random.randint(2, 12)
-        num2, den2 = random.randint(1, 10), random.randint(2, 12)
-        
-        frac1 = Fraction(num1, den1)
-        frac2 = Fraction(num2, den2)
-        
-        if frac1 > frac2:
-            comparison = ">"
-        elif frac1 < frac2:
-            comparison = "<"
-        else:
-            comparison = "="
+        num1, den1 = rng.randint(1, 10), rng.randint(2, 12)
+        num2, den2 = rng.randint(1, 10), rng.randint(2, 12)
+        return self._records['comparar_fracciones'](exercise_id, difficulty, num1, den1, num2, den2)
+    
+    def _batch_comparar_fracciones(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de comparación de fracciones"""
+        n = len(ids)
+        num1, den1 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        num2, den2 = sampler.randint(1, 10, n), sampler.randint(2, 12, n)
+        build = self._records['comparar_fracciones']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), num1, den1, num2, den2)]
+    
+    def _build_comparar_fracciones(self, exercise_id: str, difficulty: int,
+                                   num1: int, den1: int, num2: int, den2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de comparación entre num1/den1 y num2/den2"""
+        num1, den1 = _frac_normalize(num1, den1)
+        num2, den2 = _frac_normalize(num2, den2)
+        frac1, frac2 = Fraction(num1, den1), Fraction(num2, den2)
+        comparison = ('=', '>', '<')[_frac_compare(num1, den1, num2, den2)]
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'comparar_fracciones',
-            'question': f'Compara las fracciones: {frac1} ___ {frac2} (usa >, < o =)',
+            'question': _text('comparar_fracciones.question', frac1=frac1, frac2=frac2),
             'fractions': [frac1, frac2],
             'difficulty': difficulty,
             'correct_answer': comparison,
-            'explanation': f'{frac1} {comparison} {frac2}'
+            'explanation': _text('comparar_fracciones.explanation', frac1=frac1, frac2=frac2,
+                                 comparison=comparison)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def check_answer(self, exercise_id: str, user_answer: Any) -> Dict[str, Any]:
-        """Verifica la respuesta del usuario"""
-        if exercise_id not in self.exercises:
-            return {'error': 'Ejercicio no encontrado'}
-        
-        exercise = self.exercises[exercise_id]
+    def _check_comparison(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Respuestas de comparación ('<', '>', '=')"""
+        return str(user_answer).strip() == str(exercise['correct_answer'])
+    
+    def _check_fraction(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Respuestas fraccionarias como 'a/b', enteros, decimales o Fraction"""
+        pair = _parse_fraction(user_answer)
+        if pair is None:
+            return False
         correct = exercise['correct_answer']
-        
-        is_correct = False
-        feedback = ""
-        
-        if exercise['type'] == 'comparar_fracciones':
-            is_correct = str(user_answer).strip() == str(correct)
-        else:
-            try:
-                if isinstance(user_answer, str) and '/' in user_answer:
-                    parts = user_answer.split('/')
-                    user_fraction = Fraction(int(parts[0]), int(parts[1]))
-                else:
-                    user_fraction = Fraction(user_answer)
-                
-                is_correct = user_fraction == correct
-            except (ValueError, TypeError, ZeroDivisionError):
-                is_correct = False
-        
-        if is_correct:
-            feedback = "¡Correcto! " + exercise.get('explanation', '')
-        else:
-            feedback = "Incorrecto. " + exercise.get('explanation', '')
-        
-        return {
-            'correct': is_correct,
-            'feedback': feedback,
-            'explanation': exercise.get('explanation', ''),
-            'user_answer': user_answer,
-            'correct_answer': str(correct)
-        }
+        # a/b == c/d  <=>  a·d == c·b, sin construir la Fraction de la respuesta
+        return pair[0] * correct.denominator == correct.numerator * pair[1]
+    
+    def _shown_answer(self, exercise: Dict[str, Any]) -> Any:
+        """La fracción correcta se devuelve como texto 'a/b'"""
+        return str(exercise['correct_answer'])
 
-class PotenciacionRadicacion:
+class PotenciacionRadicacion(ExerciseTopic):
     """Clase para ejercicios de potenciación y radicación"""
     
-    def __init__(self):
-        self.exercises = {}
-    
-    def generate_exercise(self, difficulty: int = 1) -> Dict[str, Any]:
-        """Genera ejercicios sobre potenciación y radicación"""
-        exercise_types = [
-            'calcular_potencia',
-            'leyes_exponentes',
-            'calcular_raiz',
-            'simplificar_radicales',
-            'operaciones_radicales'
-        ]
-        
-        exercise_type = random.choice(exercise_types)
-        exercise_id = f"pr_{random.randint(1000, 9999)}"
-        
-        if exercise_type == 'calcular_potencia':
-            return self._generate_calcular_potencia(exercise_id, difficulty)
-        elif exercise_type == 'leyes_exponentes':
-            return self._generate_leyes_exponentes(exercise_id, difficulty)
-        elif exercise_type == 'calcular_raiz':
-            return self._generate_calcular_raiz(exercise_id, difficulty)
-        elif exercise_type == 'simplificar_radicales':
-            return self._generate_simplificar_radicales(exercise_id, difficulty)
-        else:
-            return self._generate_operaciones_radicales(exercise_id, difficulty)
+    ID_PREFIX = 'pr'
+    # Textos de los ejercicios por idioma (ver TemplateCatalog)
+    TEMPLATES = {
+        'es': {
+            'calcular_potencia.question': 'Calcula: {base}^{exp}',
+            'calcular_potencia.explanation': '{base}^{exp} = {result}',
+            'leyes_exponentes.product.question': 'Simplifica: {base}^{exp1} × {base}^{exp2}',
+            'leyes_exponentes.product.explanation':
+                '{base}^{exp1} × {base}^{exp2} = {base}^{exp1}+{exp2} = {base}^{result}',
+            'leyes_exponentes.quotient.question': 'Simplifica: {base}^{exp1} ÷ {base}^{exp2}',
+            'leyes_exponentes.quotient.explanation':
+                '{base}^{exp1} ÷ {base}^{exp2} = {base}^{exp1}-{exp2} = {base}^{result}',
+            'leyes_exponentes.power.question': 'Simplifica: ({base}^{exp1})^{exp2}',
+            'leyes_exponentes.power.explanation': '({base}^{exp1})^{exp2} = {base}^{exp1}×{exp2} = {base}^{result}',
+            'leyes_exponentes.negative.question': 'Simplifica: {base}^(-{exp1})',
+            'leyes_exponentes.negative.explanation': '{base}^(-{exp1}) = 1/{base}^{exp1}',
+            'calcular_raiz.question2': 'Calcula: √{number}',
+            'calcular_raiz.question3': 'Calcula: ∛{number}',
+            'calcular_raiz.question': 'Calcula: {number}^(1/{index})',
+            'calcular_raiz.explanation': 'La raíz {index}-ésima de {number} es {result}',
+            'simplificar_radicales.question': 'Simplifica: √{number}',
+            'simplificar_radicales.explanation': '√{number} = {result}',
+            'operaciones_radicales.suma.question': 'Calcula: {coef1}√{factor} + {coef2}√{factor}',
+            'operaciones_radicales.suma.explanation':
+                '{coef1}√{factor} + {coef2}√{factor} = ({coef1} + {coef2})√{factor} = {total}√{factor}',
+            'operaciones_radicales.multiplicacion.question': 'Calcula: √{num1} × √{num2}',
+            'operaciones_radicales.multiplicacion.explanation': '√{num1} × √{num2} = √({num1} × {num2}) = √{product}'
+        },
+        'en': {
+            'calcular_potencia.question': 'Calculate: {base}^{exp}',
+            'leyes_exponentes.product.question': 'Simplify: {base}^{exp1} × {base}^{exp2}',
+            'leyes_exponentes.quotient.question': 'Simplify: {base}^{exp1} ÷ {base}^{exp2}',
+            'leyes_exponentes.power.question': 'Simplify: ({base}^{exp1})^{exp2}',
+            'leyes_exponentes.negative.question': 'Simplify: {base}^(-{exp1})',
+            'calcular_raiz.question2': 'Calculate: √{number}',
+            'calcular_raiz.question3': 'Calculate: ∛{number}',
+            'calcular_raiz.question': 'Calculate: {number}^(1/{index})',
+            'calcular_raiz.explanation': 'The root of index {index} of {number} is {result}',
+            'simplificar_radicales.question': 'Simplify: √{number}',
+            'operaciones_radicales.suma.question': 'Calculate: {coef1}√{factor} + {coef2}√{factor}',
+            'operaciones_radicales.multiplicacion.question': 'Calculate: √{num1} × √{num2}'
+        }
+    }
+    REGISTRY = ExerciseRegistry([
+        ExerciseType('calcular_potencia', '_generate_calcular_potencia', '_batch_calcular_potencia',
+                     '_check_numeric', 'float', {'base': 'int', 'exp': 'int'}, record=PowerRecord),
+        ExerciseType('leyes_exponentes', '_generate_leyes_exponentes', '_batch_leyes_exponentes',
+                     '_check_expression', 'expression',
+                     {'law': 'str', 'base': 'int', 'exp1': 'int', 'exp2': 'int'}, record=ExponentLawRecord),
+        ExerciseType('calcular_raiz', '_generate_calcular_raiz', '_batch_calcular_raiz',
+                     '_check_numeric', 'float', {'number': 'int', 'index': 'int'}, record=RootRecord),
+        ExerciseType('simplificar_radicales', '_generate_simplificar_radicales',
+                     '_batch_simplificar_radicales', '_check_expression', 'expression',
+                     {'number': 'int'}, record=NumberRecord),
+        ExerciseType('operaciones_radicales', '_generate_operaciones_radicales',
+                     '_batch_operaciones_radicales', '_check_expression', 'expression',
+                     {'operation': 'str', 'operands': 'Tuple[int, ...]'}, record=RadicalOperationRecord)
+    ], TEMPLATES)
+    EXERCISE_TYPES = REGISTRY.names
     
-    def _generate_calcular_potencia(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
-        """Genera ejercicio de cálculo de potencias"""
+    LAWS = ['product', 'quotient', 'power', 'negative']
+    PERFECT_SQUARES = [4, 9, 16, 25, 36, 49, 64, 81, 100, 121, 144]
+    PERFECT_CUBES = [8, 27, 64, 125, 216]
+    ROOT_BASES = [2, 3, 4, 5, 6]
+    
+    def __init__(self, store: Optional[ExerciseStore] = None,
+                 ids: Optional[ExerciseIdAllocator] = None,
+                 primes: Optional[PrimeOracle] = None, seed: Optional[int] = None,
+                 rng: Optional[Any] = None, locale: str = DEFAULT_LOCALE,
+                 tables: Optional[AnswerTables] = None, memo: Optional['ExerciseMemo'] = None):
+        self.primes = primes if primes is not None else PRIME_ORACLE
+        # Tablas de respuestas precalculadas opcionales (None: se calculan en cada ejercicio)
+        self.tables = tables
+        super().__init__(store, ids, seed, rng, locale, memo)
+    
+    def _potencia_spec(self, difficulty: int) -> Tuple[int, int, int, int]:
+        """Rangos de base y exponente según la dificultad"""
         if difficulty == 1:
-            base = random.randint(2, 10)
-            exp = random.randint(2, 4)
+            return 2, 10, 2, 4
         elif difficulty == 2:
-            base = random.randint(2, 15)
-            exp = random.randint(2, 6)
+            return 2, 15, 2, 6
         else:
-            base = random.randint(2, 20)
-            exp = random.randint(3, 8)
-        
+            return 2, 20, 3, 8
+    
+    def _generate_calcular_potencia(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
+        """Genera ejercicio de cálculo de potencias"""
+        base_low, base_high, exp_low, exp_high = self._potencia_spec(difficulty)
+        base = rng.randint(base_low, base_high)
+        exp = rng.randint(exp_low, exp_high)
+        return self._records['calcular_potencia'](exercise_id, difficulty, base, exp)
+    
+    def _batch_calcular_potencia(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de cálculo de potencias"""
+        n = len(ids)
+        base_low, base_high, exp_low, exp_high = self._potencia_spec(difficulty)
+        bases, exps = sampler.randint(base_low, base_high, n), sampler.randint(exp_low, exp_high, n)
+        build = self._records['calcular_potencia']
+        return [build(exercise_id, difficulty, base, exp) for exercise_id, base, exp in zip(ids, bases, exps)]
+    
+    def _build_calcular_potencia(self, exercise_id: str, difficulty: int, base: int, exp: int) -> Dict[str, Any]:
+        """Construye el ejercicio de cálculo de base^exp"""
         result = base ** exp
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'calcular_potencia',
-            'question': f'Calcula: {base}^{exp}',
+            'question': _text('calcular_potencia.question', base=base, exp=exp),
             'base': base,
             'exponent': exp,
             'difficulty': difficulty,
             'correct_answer': result,
-            'explanation': f'{base}^{exp} = {result}'
+            'explanation': _text('calcular_potencia.explanation', base=base, exp=exp, result=result)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_leyes_exponentes(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_leyes_exponentes(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio sobre leyes de exponentes"""
-        laws = ['product', 'quotient', 'power', 'negative']
-        law = random.choice(laws)
-        
-        base = random.randint(2, 8)
-        exp1 = random.randint(2, 6)
-        exp2 = random.randint(2, 6)
+        law = rng.choice(self.LAWS)
         
+        base = rng.randint(2, 8)
+        exp1 = rng.randint(2, 6)
+        exp2 = rng.randint(2, 6)
+        return self._records['leyes_exponentes'](exercise_id, difficulty, law, base, exp1, exp2)
+    
+    def _batch_leyes_exponentes(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios sobre leyes de exponentes"""
+        n = len(ids)
+        laws = sampler.choice(self.LAWS, n)
+        bases, exps1, exps2 = sampler.randint(2, 8, n), sampler.randint(2, 6, n), sampler.randint(2, 6, n)
+        build = self._records['leyes_exponentes']
+        return [build(*row) for row in zip(ids, itertools.repeat(difficulty), laws, bases, exps1, exps2)]
+    
+    def _build_leyes_exponentes(self, exercise_id: str, difficulty: int, law: str,
+                                base: int, exp1: int, exp2: int) -> Dict[str, Any]:
+        """Construye el ejercicio de la ley de exponentes indicada"""
         exercise = {
             'id': exercise_id,
             'type': 'leyes_exponentes',
@@ -753,136 +4553,169 @@ class PotenciacionRadicacion:
         }
         
         if law == 'product':
-            exercise['question'] = f'Simplifica: {base}^{exp1} × {base}^{exp2}'
-            exercise['correct_answer'] = f'{base}^{exp1 + exp2}'
-            exercise['explanation'] = f'{base}^{exp1} × {base}^{exp2} = {base}^{exp1}+{exp2} = {base}^{exp1 + exp2}'
+            result = exp1 + exp2
+            exercise['correct_answer'] = f'{base}^{result}'
         
         elif law == 'quotient':
             if exp1 <= exp2:
                 exp1, exp2 = exp2, exp1  # Asegurar que exp1 > exp2
-            exercise['question'] = f'Simplifica: {base}^{exp1} ÷ {base}^{exp2}'
-            exercise['correct_answer'] = f'{base}^{exp1 - exp2}'
-            exercise['explanation'] = f'{base}^{exp1} ÷ {base}^{exp2} = {base}^{exp1}-{exp2} = {base}^{exp1 - exp2}'
+            result = exp1 - exp2
+            exercise['correct_answer'] = f'{base}^{result}'
         
         elif law == 'power':
-            exercise['question'] = f'Simplifica: ({base}^{exp1})^{exp2}'
-            exercise['correct_answer'] = f'{base}^{exp1 * exp2}'
-            exercise['explanation'] = f'({base}^{exp1})^{exp2} = {base}^{exp1}×{exp2} = {base}^{exp1 * exp2}'
+            result = exp1 * exp2
+            exercise['correct_answer'] = f'{base}^{result}'
         
         else:  # negative
-            exercise['question'] = f'Simplifica: {base}^(-{exp1})'
+            result = exp1
             exercise['correct_answer'] = f'1/{base}^{exp1}'
-            exercise['explanation'] = f'{base}^(-{exp1}) = 1/{base}^{exp1}'
         
-        self.exercises[exercise_id] = exercise
+        values = {'base': base, 'exp1': exp1, 'exp2': exp2, 'result': result}
+        exercise['question'] = LazyText(f'leyes_exponentes.{law}.question', values)
+        exercise['explanation'] = LazyText(f'leyes_exponentes.{law}.explanation', values)
         return exercise
     
-    def _generate_calcular_raiz(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_calcular_raiz(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de cálculo de raíces"""
         if difficulty == 1:
             # Raíces cuadradas perfectas
-            perfect_squares = [4, 9, 16, 25, 36, 49, 64, 81, 100, 121, 144]
-            number = random.choice(perfect_squares)
+            number = rng.choice(self.PERFECT_SQUARES)
             index = 2
         elif difficulty == 2:
             # Raíces cúbicas perfectas
-            perfect_cubes = [8, 27, 64, 125, 216]
-            number = random.choice(perfect_cubes)
+            number = rng.choice(self.PERFECT_CUBES)
             index = 3
         else:
             # Raíces más complejas
-            bases = [2, 3, 4, 5, 6]
-            base = random.choice(bases)
-            index = random.randint(2, 4)
+            base = rng.choice(self.ROOT_BASES)
+            index = rng.randint(2, 4)
             number = base ** index
-        
+        return self._records['calcular_raiz'](exercise_id, difficulty, number, index)
+    
+    def _batch_calcular_raiz(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de cálculo de raíces"""
+        n = len(ids)
+        if difficulty == 1:
+            numbers, indices = sampler.choice(self.PERFECT_SQUARES, n), itertools.repeat(2)
+        elif difficulty == 2:
+            numbers, indices = sampler.choice(self.PERFECT_CUBES, n), itertools.repeat(3)
+        else:
+            bases, indices = sampler.choice(self.ROOT_BASES, n), sampler.randint(2, 4, n)
+            numbers = [base ** index for base, index in zip(bases, indices)]
+        build = self._records['calcular_raiz']
+        return [build(exercise_id, difficulty, number, index)
+                for exercise_id, number, index in zip(ids, numbers, indices)]
+    
+    def _build_calcular_raiz(self, exercise_id: str, difficulty: int, number: int, index: int) -> Dict[str, Any]:
+        """Construye el ejercicio de la raíz index-ésima de number"""
         result = number ** (1/index)
         
-        if index == 2:
-            question = f'Calcula: √{number}'
-        elif index == 3:
-            question = f'Calcula: ∛{number}'
+        if index in (2, 3):
+            question = _text(f'calcular_raiz.question{index}', number=number)
         else:
-            question = f'Calcula: {number}^(1/{index})'
+            question = _text('calcular_raiz.question', number=number, index=index)
+        answer = int(result) if result.is_integer() else result
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'calcular_raiz',
             'question': question,
             'number': number,
             'index': index,
             'difficulty': difficulty,
-            'correct_answer': int(result) if result.is_integer() else result,
-            'explanation': f'La raíz {index}-ésima de {number} es {int(result) if result.is_integer() else result}'
+            'correct_answer': answer,
+            'explanation': _text('calcular_raiz.explanation', number=number, index=index, result=answer)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_simplificar_radicales(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_simplificar_radicales(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de simplificación de radicales"""
         if difficulty == 1:
             # Radicales simples
-            factors = [2, 3, 5]
-            factor = random.choice(factors)
-            perfect_square = random.choice([4, 9, 16, 25])
+            factor = rng.choice([2, 3, 5])
+            perfect_square = rng.choice([4, 9, 16, 25])
             number = factor * perfect_square
         else:
             # Radicales más complejos
-            number = random.randint(12, 200)
-        
+            number = rng.randint(12, 200)
+        return self._records['simplificar_radicales'](exercise_id, difficulty, number)
+    
+    def _batch_simplificar_radicales(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de simplificación de radicales"""
+        n = len(ids)
+        if difficulty == 1:
+            factors, squares = sampler.choice([2, 3, 5], n), sampler.choice([4, 9, 16, 25], n)
+            numbers = [factor * square for factor, square in zip(factors, squares)]
+        else:
+            numbers = sampler.randint(12, 200, n)
+        build = self._records['simplificar_radicales']
+        return [build(exercise_id, difficulty, number) for exercise_id, number in zip(ids, numbers)]
+    
+    def _build_simplificar_radicales(self, exercise_id: str, difficulty: int, number: int) -> Dict[str, Any]:
+        """Construye el ejercicio de simplificación de √number"""
         # Simplificar el radical
         simplified = self._simplify_radical(number)
         
-        exercise = {
+        return {
             'id': exercise_id,
             'type': 'simplificar_radicales',
-            'question': f'Simplifica: √{number}',
+            'question': _text('simplificar_radicales.question', number=number),
             'number': number,
             'difficulty': difficulty,
             'correct_answer': simplified,
-            'explanation': f'√{number} = {simplified}'
+            'explanation': _text('simplificar_radicales.explanation', number=number, result=simplified)
         }
-        
-        self.exercises[exercise_id] = exercise
-        return exercise
     
-    def _generate_operaciones_radicales(self, exercise_id: str, difficulty: int) -> Dict[str, Any]:
+    def _generate_operaciones_radicales(self, exercise_id: str, difficulty: int, rng) -> ExerciseRecord:
         """Genera ejercicio de operaciones con radicales"""
-        operations = ['suma', 'multiplicacion']
-        operation = random.choice(operations)
+        operation = rng.choice(['suma', 'multiplicacion'])
         
         if operation == 'suma':
-            # Radicales semejantes
-            factor = random.randint(2, 8)
-            coef1 = random.randint(2, 6)
-            coef2 = random.randint(2, 6)
+            # Radicales semejantes: (radicando, coef1, coef2)
+            params = (rng.randint(2, 8), rng.randint(2, 6), rng.randint(2, 6))
+        else:  # multiplicacion: (num1, num2)
+            params = (rng.randint(2, 12), rng.randint(2, 12))
+        return self._records['operaciones_radicales'](exercise_id, difficulty, operation, *params)
+    
+    def _batch_operaciones_radicales(self, ids: List[str], difficulty: int, sampler) -> List[ExerciseRecord]:
+        """Genera en bloque ejercicios de operaciones con radicales"""
+        n = len(ids)
+        operations = sampler.choice(['suma', 'multiplicacion'], n)
+        sums = zip(sampler.randint(2, 8, n), sampler.randint(2, 6, n), sampler.randint(2, 6, n))
+        products = zip(sampler.randint(2, 12, n), sampler.randint(2, 12, n))
+        build = self._records['operaciones_radicales']
+        return [build(exercise_id, difficulty, operation, *(suma if operation == 'suma' else product))
+                for exercise_id, operation, suma, product in zip(ids, operations, sums, products)]
+    
+    def _build_operaciones_radicales(self, exercise_id: str, difficulty: int, operation: str, *params) -> Dict[str, Any]:
+        """Construye el ejercicio de operación con radicales a partir de sus parámetros"""
+        if operation == 'suma':
+            factor, coef1, coef2 = params
             
             exercise = {
                 'id': exercise_id,
                 'type': 'operaciones_radicales',
-                'question': f'Calcula: {coef1}√{factor} + {coef2}√{factor}',
+                'question': _text('operaciones_radicales.suma.question', factor=factor, coef1=coef1, coef2=coef2),
                 'operation': 'suma',
                 'difficulty': difficulty,
                 'correct_answer': f'{coef1 + coef2}√{factor}',
-                'explanation': f'{coef1}√{factor} + {coef2}√{factor} = ({coef1} + {coef2})√{factor} = {coef1 + coef2}√{factor}'
+                'explanation': _text('operaciones_radicales.suma.explanation', factor=factor,
+                                     coef1=coef1, coef2=coef2, total=coef1 + coef2)
             }
         
         else:  # multiplicacion
-            num1 = random.randint(2, 12)
-            num2 = random.randint(2, 12)
+            num1, num2 = params
             
             exercise = {
                 'id': exercise_id,
                 'type': 'operaciones_radicales',
-                'question': f'Calcula: √{num1} × √{num2}',
+                'question': _text('operaciones_radicales.multiplicacion.question', num1=num1, num2=num2),
                 'operation': 'multiplicacion',
                 'difficulty': difficulty,
                 'correct_answer': f'√{num1 * num2}',
-                'explanation': f'√{num1} × √{num2} = √({num1} × {num2}) = √{num1 * num2}'
+                'explanation': _text('operaciones_radicales.multiplicacion.explanation',
+                                     num1=num1, num2=num2, product=num1 * num2)
             }
         
-        self.exercises[exercise_id] = exercise
         return exercise
     
     def _simplify_radical(self, n: int) -> str:
@@ -890,15 +4723,18 @@ class PotenciacionRadicacion:
         if n <= 0:
             return "0"
         
-        perfect_square_factor = 1
-        remaining = n
-        
-        i = 2
-        while i * i <= remaining:
-            while remaining % (i * i) == 0:
-                perfect_square_factor *= i
-                remaining //= (i * i)
-            i += 1
+        parts = self.tables.simplified_radical(n) if self.tables is not None else None
+        if parts is not None:
+            perfect_square_factor, remaining = parts
+        else:
+            perfect_square_factor = 1
+            remaining = 1
+            
+            # √(p^e) = p^(e // 2) · √(p^(e % 2)) para cada factor primo
+            for p, exponent in self.primes.factor_exponents(n):
+                perfect_square_factor *= p ** (exponent // 2)
+                if exponent % 2:
+                    remaining *= p
         
         if perfect_square_factor == 1:
             return f"√{n}"
@@ -907,42 +4743,26 @@ class PotenciacionRadicacion:
         else:
             return f"{perfect_square_factor}√{remaining}"
     
-    def check_answer(self, exercise_id: str, user_answer: Any) -> Dict[str, Any]:
-        """Verifica la respuesta del usuario"""
-        if exercise_id not in self.exercises:
-            return {'error': 'Ejercicio no encontrado'}
-        
-        exercise = self.exercises[exercise_id]
-        correct = exercise['correct_answer']
-        
-        is_correct = False
-        feedback = ""
-        
+    def _check_expression(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Misma potencia o mismo radical simplificado ("2^(5)" vale por "2^5", pero no "32" ni "2^3·2^2")"""
+        return _expressions_equivalent(user_answer, exercise['correct_answer'])
+    
+    def _check_numeric(self, exercise: Dict[str, Any], user_answer: Any) -> bool:
+        """Comparación numérica con tolerancia"""
         try:
-            if exercise['type'] in ['leyes_exponentes', 'simplificar_radicales', 'operaciones_radicales']:
-                # Comparación de strings para expresiones algebraicas
-                is_correct = str(user_answer).replace(' ', '') == str(correct).replace(' ', '')
-            else:
-                # Comparación numérica
-                is_correct = abs(float(user_answer) - float(correct)) < 1e-6
+            return abs(float(user_answer) - float(exercise['correct_answer'])) < 1e-6
         except (ValueError, TypeError):
-            is_correct = False
-        
-        if is_correct:
-            feedback = "¡Correcto! " + exercise.get('explanation', '')
-        else:
-            feedback = "Incorrecto. " + exercise.get('explanation', '')
-        
-        return {
-            'correct': is_correct,
-            'feedback': feedback,
-            'explanation': exercise.get('explanation', ''),
-            'user_answer': user_answer,
-            'correct_answer': correct
-        }
+            return False
 
 # Función principal para testing
 if __name__ == "__main__":
+    # python math_engine.py --precompute RUTA: genera el archivo de tablas de respuestas y termina
+    if len(sys.argv) == 3 and sys.argv[1] == '--precompute':
+        tables = AnswerTables.build()
+        tables.write(sys.argv[2])
+        print(f"Tablas de respuestas guardadas en {sys.argv[2]} ({tables.nbytes} bytes)")
+        sys.exit(0)
+    
     engine = MathEngine()
     
     # Generar ejercicios de prueba
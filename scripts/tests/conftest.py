@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos de scripts/ se importan como módulos de primer nivel
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
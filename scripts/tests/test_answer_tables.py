@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import math_engine
+from math_engine import PRIME_ORACLE, AnswerTables, MathEngine
+
+SCRIPTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _radical(n: int):
+    outside = max(k for k in range(1, n + 1) if n % (k * k) == 0)
+    return outside, n // (outside * outside)
+
+def _assert_tables_match_oracle(tables: AnswerTables):
+    for n in range(tables.prime_limit + 1):
+        assert tables.is_prime(n) == PRIME_ORACLE.is_prime(n), n
+        assert tables.divisors(n) == PRIME_ORACLE.divisors(n), n
+    for n in range(1, tables.radical_limit + 1):
+        assert tables.simplified_radical(n) == _radical(n), n
+
+def test_build_write_load_round_trip(tmp_path):
+    built = AnswerTables.build()
+    path = tmp_path / 'tables.bin'
+    built.write(str(path))
+    assert path.read_bytes() == bytes(built._buffer)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    
+    loaded = AnswerTables.load(str(path))
+    try:
+        assert (loaded.prime_limit, loaded.radical_limit) == (300, 200)
+        assert loaded.nbytes == built.nbytes == path.stat().st_size
+        _assert_tables_match_oracle(loaded)
+    finally:
+        loaded.close()
+
+def test_precompute_cli_writes_loadable_tables(tmp_path):
+    path = tmp_path / 'tables.bin'
+    completed = subprocess.run([sys.executable, 'math_engine.py', '--precompute', str(path)],
+                               cwd=SCRIPTS, capture_output=True, text=True, check=True)
+    assert str(path) in completed.stdout
+    loaded = AnswerTables.load(str(path))
+    try:
+        assert path.read_bytes() == bytes(AnswerTables.build()._buffer)
+        _assert_tables_match_oracle(loaded)
+    finally:
+        loaded.close()
+
+# Firma, versión y orden de bytes de la cabecera
+@pytest.mark.parametrize('offset, value, message', [
+    (0, b'XXXX', 'compatible'),
+    (4, (AnswerTables.VERSION + 1).to_bytes(2, 'little'), 'compatible'),
+    (6, bytes([sys.byteorder == 'little']), 'orden de bytes'),
+])
+def test_rejects_incompatible_header(tmp_path, offset, value, message):
+    data = bytearray(AnswerTables.build(prime_limit=20, radical_limit=20)._buffer)
+    data[offset:offset + len(value)] = value
+    path = tmp_path / 'tables.bin'
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match=message):
+        AnswerTables.load(str(path))
+
+def test_values_outside_the_tables_fall_back_to_the_oracle():
+    tables = AnswerTables.build()
+    assert tables.is_prime(301) is None and tables.is_prime(-1) is None
+    assert tables.divisors(301) is None
+    assert tables.simplified_radical(201) is None and tables.simplified_radical(0) is None
+    
+    engine = MathEngine(answer_tables=tables)
+    primes = engine.topics['numeros_primos']
+    radicals = engine.topics['potenciacion_radicacion']
+    assert primes.tables is tables and radicals.tables is tables
+    assert primes._is_prime(307) and not primes._is_prime(301)
+    assert primes._find_factors(400) == PRIME_ORACLE.divisors(400)
+    assert radicals._simplify_radical(288) == '12√2'
+    assert radicals._simplify_radical(12) == '2√3'
+
+def test_shared_builds_missing_file_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(math_engine, '_SHARED_TABLES', {})
+    path = str(tmp_path / 'tables.bin')
+    tables = AnswerTables.shared(path)
+    assert os.path.exists(path)
+    assert AnswerTables.shared(path) is tables
+    assert MathEngine(answer_tables=path).topics['numeros_primos'].tables is tables
+    tables.close()
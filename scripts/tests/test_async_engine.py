@@ -0,0 +1,130 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_engine import AsyncMathEngine, EngineBusyError
+from math_engine import MathEngine
+
+class SlowEngine:
+    """Motor de prueba cuyas llamadas no terminan hasta que se abre la compuerta"""
+    
+    def __init__(self, fail: bool = False):
+        self.gate = threading.Event()
+        self.started = 0
+        self.finished = 0
+        self.fail = fail
+    
+    def generate_exercise(self, topic, difficulty, locale):
+        self.started += 1
+        self.gate.wait(5)
+        self.finished += 1
+        if self.fail:
+            raise ValueError("fallo tras el timeout")
+        return {'topic': topic, 'difficulty': difficulty}
+    
+    def close(self):
+        self.gate.set()
+
+async def _until(predicate, timeout: float = 5.0):
+    """Espera sin bloquear el bucle a que se cumpla predicate"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "la condición no se cumplió a tiempo"
+        await asyncio.sleep(0.001)
+
+def test_max_pending_rejects_instead_of_queueing():
+    async def scenario():
+        slow = SlowEngine()
+        engine = AsyncMathEngine(engine=slow, max_workers=1, max_pending=2)
+        running = asyncio.ensure_future(engine.generate_exercise('fraccionarios', 1))
+        waiting = asyncio.ensure_future(engine.generate_exercise('fraccionarios', 2))
+        await _until(lambda: slow.started == 1 and engine.stats()['pending'] == 2)
+        assert engine.stats()['running'] == 1
+        
+        with pytest.raises(EngineBusyError):
+            await engine.generate_exercise('fraccionarios', 3)
+        assert engine.stats()['rejected'] == 1
+        
+        slow.gate.set()
+        assert [await running, await waiting] == [{'topic': 'fraccionarios', 'difficulty': 1},
+                                                  {'topic': 'fraccionarios', 'difficulty': 2}]
+        stats = engine.stats()
+        assert (stats['pending'], stats['running'], stats['completed']) == (0, 0, 2)
+        engine.close()
+    
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_timeout_keeps_the_slot_until_the_work_finishes(fail):
+    async def scenario():
+        slow = SlowEngine(fail)
+        engine = AsyncMathEngine(engine=slow, max_workers=1, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await engine.generate_exercise('fraccionarios', 1)
+        stats = engine.stats()
+        assert stats['timeouts'] == 1
+        # El hilo sigue trabajando: la plaza no se ha liberado
+        assert (stats['pending'], stats['running'], stats['completed']) == (1, 1, 0)
+        assert engine._slots.locked()
+        
+        # Sin límite de espera, la siguiente llamada espera a que termine la anterior
+        follower = asyncio.ensure_future(engine.generate_exercise('fraccionarios', 2, timeout=None))
+        await asyncio.sleep(0.02)
+        assert slow.started == 1 and not follower.done()
+        
+        slow.gate.set()
+        await _until(lambda: follower.done())
+        if fail:
+            with pytest.raises(ValueError):
+                follower.result()
+        else:
+            assert follower.result() == {'topic': 'fraccionarios', 'difficulty': 2}
+        stats = engine.stats()
+        assert (stats['pending'], stats['running'], stats['completed'], stats['timeouts']) == (0, 0, 2, 1)
+        assert not engine._slots.locked()
+        engine.close()
+    
+    asyncio.run(scenario())
+
+def test_thread_mode_generates_and_grades():
+    async def scenario():
+        async with AsyncMathEngine(max_workers=2, seed=4) as engine:
+            exercise = await engine.generate_exercise('fraccionarios', 1)
+            result = await engine.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])
+            assert result['correct']
+            batch = await engine.generate_batch('numeros_primos', 2, n=5)
+            rows = await engine.check_batch('numeros_primos', [(item['id'], item['correct_answer']) for item in batch])
+            assert [row['correct'] for row in rows] == [True] * 5
+            assert engine.stats()['completed'] == 4
+    
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('options, message', [
+    ({'engine': MathEngine(stateless=True, secret_key='clave'), 'stateless': True, 'secret_key': 'clave'}, 'engine'),
+    ({}, 'stateless'),
+    ({'stateless': True, 'secret_key': 'clave', 'seed': 1}, 'seed'),
+    ({'stateless': True, 'secret_key': 'clave', 'rng': object()}, 'seed'),
+])
+def test_process_mode_guards(options, message):
+    with pytest.raises(ValueError, match=message):
+        AsyncMathEngine('process', **options)
+
+def test_rejects_unknown_executor():
+    with pytest.raises(ValueError, match='executor'):
+        AsyncMathEngine('fibra')
+
+def test_process_mode_grades_tokens_from_any_worker():
+    async def scenario():
+        engine = AsyncMathEngine('process', max_workers=2, stateless=True, secret_key='clave')
+        try:
+            exercises = await asyncio.gather(*(engine.generate_exercise('fraccionarios', 1) for _ in range(4)))
+            rows = await engine.check_batch('fraccionarios', [(item['id'], item['correct_answer']) for item in exercises])
+            assert [row['correct'] for row in rows] == [True] * 4
+            # El motor del proceso principal también puede calificarlos
+            assert engine.engine.check_answer('fraccionarios', exercises[0]['id'], exercises[0]['correct_answer'])['correct']
+        finally:
+            engine.close()
+    
+    asyncio.run(scenario())
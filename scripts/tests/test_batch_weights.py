@@ -0,0 +1,55 @@
+import pytest
+
+from math_engine import MathEngine, _BulkSampler, _resolve_type_weights
+
+TOPICS = ('conjuntos_numericos', 'numeros_primos', 'fraccionarios', 'potenciacion_radicacion')
+
+def _engine(stateless: bool) -> MathEngine:
+    return MathEngine(stateless=True, secret_key='clave') if stateless else MathEngine()
+
+def _tags(topic) -> dict:
+    """Nombre de cada tipo -> valor que el ejercicio guarda en 'type'"""
+    return {exercise_type.name: exercise_type.tag for exercise_type in topic.REGISTRY.types}
+
+def test_resolve_type_weights_normalizes_and_fills_missing_types():
+    assert _resolve_type_weights(['a', 'b', 'c'], None) is None
+    assert _resolve_type_weights(['a', 'b', 'c'], {'a': 1, 'c': 3}) == [0.25, 0.0, 0.75]
+
+@pytest.mark.parametrize('weights, message', [
+    ({'a': 1, 'z': 1}, 'desconocidos: z'),
+    ({'a': 0, 'b': 0}, 'no negativos'),
+    ({'a': 2, 'b': -1}, 'no negativos'),
+    ({}, 'no negativos'),
+])
+def test_resolve_type_weights_rejects_invalid_weights(weights, message):
+    with pytest.raises(ValueError, match=message):
+        _resolve_type_weights(['a', 'b', 'c'], weights)
+
+@pytest.mark.parametrize('stateless', [False, True])
+@pytest.mark.parametrize('topic', TOPICS)
+def test_types_missing_from_weights_are_never_generated(topic, stateless):
+    engine = _engine(stateless)
+    tags = _tags(engine.topics[topic])
+    omitted, *kept = tags
+    exercises = engine.generate_batch(topic, 2, 300, weights={name: 1 for name in kept}, seed=9)
+    assert {exercise['type'] for exercise in exercises} == {tags[name] for name in kept}
+    
+    only, = kept[:1]
+    exercises = engine.generate_batch(topic, 1, 50, weights={only: 5})
+    assert {exercise['type'] for exercise in exercises} == {tags[only]}
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_weights_hold_with_either_sampler(use_numpy):
+    topic = MathEngine().topics['fraccionarios']
+    tags = _tags(topic)
+    omitted, *kept = tags
+    exercises = topic.generate_batch(2, 300, {name: 1 for name in kept}, _BulkSampler(3, use_numpy=use_numpy))
+    assert tags[omitted] not in {exercise['type'] for exercise in exercises}
+
+@pytest.mark.parametrize('stateless', [False, True])
+def test_unknown_type_names_raise(stateless):
+    engine = _engine(stateless)
+    with pytest.raises(ValueError, match='desconocidos: no_existe'):
+        engine.generate_batch('fraccionarios', 1, 5, weights={'no_existe': 1})
+    with pytest.raises(ValueError, match='desconocidos: no_existe$'):
+        engine.generate_records('fraccionarios', 1, 5, weights={'simplificar_fraccion': 1, 'no_existe': 1})
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from bulk_generate import FORMATS, generate_bank
+from math_engine import MathEngine
+
+def _bank(directory) -> dict:
+    """Contenido de cada archivo del banco, por nombre"""
+    return {name: (directory / name).read_bytes() for name in sorted(os.listdir(directory))}
+
+@pytest.mark.parametrize('format', sorted(FORMATS))
+def test_bank_is_identical_for_any_worker_count(tmp_path, format):
+    options = dict(difficulties=[1, 3], n=23, seed=5, chunk_size=4, format=format)
+    single = generate_bank(str(tmp_path / 'single'), workers=1, **options)
+    parallel = generate_bank(str(tmp_path / 'parallel'), workers=2, **options)
+    
+    assert single == parallel
+    banks = _bank(tmp_path / 'single'), _bank(tmp_path / 'parallel')
+    assert banks[0] == banks[1]
+    assert sorted(banks[0]) == sorted([f"{topic}_d{difficulty}.{FORMATS[format]}"
+                                       for topic in MathEngine().topics for difficulty in (1, 3)] + ['manifest.json'])
+    
+    engine = MathEngine()
+    for name in single['counts']:
+        exercises = list(engine.read_exercises(str(tmp_path / 'single' / f"{name}.{FORMATS[format]}")))
+        assert len(exercises) == single['counts'][name] == 23
+
+def test_bank_depends_on_the_seed(tmp_path):
+    options = dict(topics=['fraccionarios'], difficulties=[2], n=10, chunk_size=4, workers=1)
+    generate_bank(str(tmp_path / 'a'), seed=1, **options)
+    generate_bank(str(tmp_path / 'b'), seed=2, **options)
+    assert (tmp_path / 'a' / 'fraccionarios_d2.jsonl').read_bytes() != (tmp_path / 'b' / 'fraccionarios_d2.jsonl').read_bytes()
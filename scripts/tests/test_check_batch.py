@@ -0,0 +1,54 @@
+import pytest
+
+from math_engine import MathEngine
+
+TOPICS = ('conjuntos_numericos', 'numeros_primos', 'fraccionarios', 'potenciacion_radicacion')
+UNGRADABLE = {'error': 'Ejercicio no calificable'}
+
+def _engine(stateless: bool) -> MathEngine:
+    if stateless:
+        return MathEngine(seed=3, stateless=True, secret_key='clave')
+    return MathEngine(seed=3)
+
+def _answers(exercise):
+    """Respuesta correcta, su texto y dos respuestas erróneas o mal formadas"""
+    correct = exercise.get('correct_answer')
+    return [correct, str(correct), 'mal', 0]
+
+def _check_one(engine, topic, exercise_id, answer):
+    try:
+        return engine.check_answer(topic, exercise_id, answer)
+    except Exception:
+        return UNGRADABLE
+
+@pytest.mark.parametrize('stateless', [False, True])
+@pytest.mark.parametrize('topic', TOPICS)
+def test_check_batch_matches_check_answer(topic, stateless):
+    engine = _engine(stateless)
+    exercises = [engine.generate_exercise(topic, difficulty) for difficulty in (1, 2, 3) for _ in range(60)]
+    assert {exercise['type'] for exercise in exercises} == {exercise_type.tag for exercise_type in engine.topics[topic].REGISTRY.types}
+    
+    submissions = [(exercise['id'], answer) for exercise in exercises for answer in _answers(exercise)]
+    submissions += [('xx_desconocido', 1)]
+    result = engine.check_batch(topic, submissions)
+    
+    assert result.to_dicts() == [_check_one(engine, topic, exercise_id, answer) for exercise_id, answer in submissions]
+    assert result.correct == [row.get('correct', False) for row in result.to_dicts()]
+
+@pytest.mark.parametrize('stateless', [False, True])
+def test_ungradable_row_does_not_sink_the_batch(stateless):
+    engine = _engine(stateless)
+    valid, broken = [], None
+    while len(valid) < 75 or broken is None:
+        exercise = engine.generate_exercise('conjuntos_numericos', 1)
+        if 'correct_answer' not in exercise:
+            broken = exercise
+        elif len(valid) < 75:
+            valid.append(exercise)
+    submissions = [(exercise['id'], exercise['correct_answer']) for exercise in valid]
+    submissions.insert(40, (broken['id'], 1))
+    
+    result = engine.check_batch('conjuntos_numericos', submissions)
+    assert result.num_correct == 75
+    assert result.errors == [None] * 40 + ['Ejercicio no calificable'] + [None] * 35
+    assert result.row(40) == UNGRADABLE and result.feedback(40) == 'Ejercicio no calificable'
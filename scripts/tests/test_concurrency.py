@@ -0,0 +1,104 @@
+import sys
+import threading
+
+import pytest
+
+from math_engine import MathEngine, ShardedExerciseStore, SQLiteExerciseStore, _generate_topic_records
+
+@pytest.fixture
+def fast_switching():
+    """Cambios de hilo mucho más frecuentes, para que las carreras aparezcan en pocas iteraciones"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+class _Entry:
+    """Registro mínimo para put_many, que lee el id de cada ejercicio"""
+    
+    def __init__(self, exercise_id: str):
+        self.id = exercise_id
+
+def _run_threads(target, count: int):
+    barrier = threading.Barrier(count)
+    errors = []
+    
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as error:
+            errors.append(error)
+    
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+@pytest.mark.parametrize('batch', [1, 7])
+def test_sharded_store_never_evicts_below_capacity(fast_switching, batch):
+    capacity, threads, puts = 200, 8, 1500
+    store = ShardedExerciseStore(capacity=capacity, ttl=None, shards=4)
+    # Lleno desde el principio: cada escritura siguiente desaloja exactamente lo que añade
+    store.put_many([_Entry(f"inicial-{i}") for i in range(capacity)])
+    smallest = []
+    
+    def put(index):
+        low = capacity
+        for i in range(0, puts, batch):
+            if batch == 1:
+                store[f"{index}-{i}"] = i
+            else:
+                store.put_many([_Entry(f"{index}-{i + j}") for j in range(batch)])
+            low = min(low, len(store))
+        smallest.append(low)
+    
+    _run_threads(put, threads)
+    # Si dos hilos desalojan a la vez por el mismo exceso, el almacén queda por debajo de la capacidad
+    assert min(smallest) == capacity
+    assert len(store) == capacity
+
+def test_concurrent_generate_and_check_loses_nothing(fast_switching):
+    engine = MathEngine(store_capacity=100000, store_shards=8)
+    topics = ['numeros_primos', 'fraccionarios', 'potenciacion_radicacion']
+    results = {}
+    
+    def work(index):
+        graded = []
+        for i in range(300):
+            topic = topics[(index + i) % len(topics)]
+            exercise = engine.generate_exercise(topic, 1 + i % 3)
+            graded.append(engine.check_answer(topic, exercise['id'], exercise['correct_answer']))
+            if i % 50 == 0:
+                batch = engine.generate_batch(topic, 2, n=20)
+                graded.extend(engine.check_answer(topic, item['id'], item['correct_answer']) for item in batch)
+        results[index] = graded
+    
+    _run_threads(work, 8)
+    graded = [result for thread_results in results.values() for result in thread_results]
+    assert len(graded) == 8 * (300 + 6 * 20)
+    assert [result for result in graded if 'error' in result] == []
+    assert all(result['correct'] for result in graded)
+    assert len(engine.store) == len(graded)
+
+def test_sqlite_store_counts_every_concurrent_read(fast_switching, tmp_path):
+    store = SQLiteExerciseStore(tmp_path / 'exercises.db', ttl=None, flush_interval=60.0)
+    engine = MathEngine(store=store)
+    try:
+        records = _generate_topic_records(engine.topics['fraccionarios'], 1, 50, None, None)
+        store.put_many(records)
+        reads = 2000
+        
+        def read(index):
+            for i in range(reads):
+                store.get(records[i % len(records)].id if i % 4 else f"desconocido-{index}")
+        
+        _run_threads(read, 8)
+        stats = store.stats()
+        assert stats['hits'] == 8 * reads * 3 // 4
+        assert stats['misses'] == 8 * reads // 4
+    finally:
+        engine.close()
@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from math_engine import MathEngine
+
+class _Unseekable(io.RawIOBase):
+    """Flujo de bytes sin peek ni seek, como una tubería"""
+    
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        return self._data.readinto(buffer)
+
+# Archivos de los que se puede leer una exportación: sin peek, con peek y sin seek
+SOURCES = {
+    'bytesio': io.BytesIO,
+    'buffered': lambda data: io.BufferedReader(_Unseekable(data)),
+    'unseekable': _Unseekable
+}
+
+@pytest.mark.parametrize('format', ['jsonl', 'binary'])
+@pytest.mark.parametrize('source', sorted(SOURCES))
+def test_read_exercises_from_any_binary_file(tmp_path, format, source):
+    engine = MathEngine()
+    path = tmp_path / f"ejercicios.{format}"
+    assert engine.export_exercises(path, 'numeros_primos', 2, n=250, seed=9, format=format, chunk_size=100) == 250
+    expected = list(engine.read_exercises(path))
+    
+    exercises = list(engine.read_exercises(SOURCES[source](path.read_bytes())))
+    assert len(exercises) == 250
+    assert exercises == expected
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from math_engine import MathEngine, _expressions_equivalent, _sympy_equivalent, optional_backend
+
+@pytest.mark.parametrize('answer, correct', [
+    ('2^(5)', '2^5'), ('2**5', '2^5'), ('(2)^5', '2^5'), ('2 ^ 5', '2^5'),
+    ('2^(-3)', '2^-3'), ('1/(2^3)', '1/2^3'), ('1/2^(3)', '1/2^3'),
+    ('6·√2', '6√2'), ('6*sqrt(2)', '6√2'), ('6×√(2)', '6√2'), ('1√2', '√2'),
+    # Respuestas correctas guardadas sin simplificar: vale su forma simplificada
+    ('10', '5√4'), ('2√6', '√24'),
+])
+def test_other_notations_of_the_same_form_are_accepted(answer, correct):
+    assert _expressions_equivalent(answer, correct)
+
+@pytest.mark.parametrize('answer, correct', [
+    # La propia pregunta o cualquier expresión que aún haya que operar o simplificar
+    ('√72', '6√2'), ('√48', '4√3'), ('6^6 ÷ 6^3', '6^3'), ('6√6 + 3√6', '9√6'), ('32', '2^5'),
+    ('√4·√3', '2√3'), ('2^3·2^2', '2^5'), ('(2^3)^2', '2^6'), ('4^2', '2^4'), ('1/8', '1/2^3'),
+    ('2^(-3)', '1/2^3'), ('1/2^(-3)', '2^3'), ('√36', '6'), ('√1', '1'), ('-6√2', '6√2'), ('(2^5', '2^5'), ('·√2', '√2'),
+])
+def test_unsimplified_or_unevaluated_answers_are_rejected(answer, correct):
+    assert not _expressions_equivalent(answer, correct)
+
+@pytest.mark.skipif(optional_backend('sympy') is None, reason='SymPy no está instalado')
+def test_sympy_slow_path_checks_the_same_structure():
+    assert _sympy_equivalent('√2·6', '6√2')
+    assert _sympy_equivalent('1/2^(3)', '1/2^3')
+    for answer, correct in [('√72', '6√2'), ('2^3·2^2', '2^5'), ('6^6/6^3', '6^3'), ('√2·√2', '2')]:
+        assert not _sympy_equivalent(answer, correct)
+
+def test_engine_grades_expression_exercises_structurally():
+    engine = MathEngine(seed=3)
+    weights = {'leyes_exponentes': 1, 'simplificar_radicales': 1, 'operaciones_radicales': 1}
+    for exercise in engine.generate_batch('potenciacion_radicacion', 2, n=200, weights=weights):
+        correct = exercise['correct_answer']
+        assert engine.check_answer('potenciacion_radicacion', exercise['id'], correct)['correct']
+        # El enunciado pegado como respuesta ("Simplifica: √72") nunca es correcto
+        pasted = exercise['question'].split(': ', 1)[1]
+        if pasted != correct:
+            assert not engine.check_answer('potenciacion_radicacion', exercise['id'], pasted)['correct']
+
+def test_huge_radicand_is_rejected_without_factoring():
+    # Producto de dos primos de 25 cifras: Pollard rho tardaría mucho en separarlos
+    answer = '√' + str(1000000000000000000000007 * 1000000000000000000000049)
+    start = time.perf_counter()
+    assert not _expressions_equivalent(answer, '6√2')
+    assert not _expressions_equivalent(answer, answer[:-1] + '0')
+    assert time.perf_counter() - start < 1.0
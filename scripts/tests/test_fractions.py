@@ -0,0 +1,58 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+from math_engine import (_SMALL_FRACTION_LIMIT, _frac_add, _frac_compare, _frac_div, _frac_mul,
+                         _frac_normalize, _frac_sub, _parse_fraction, MathEngine)
+
+def _random_fractions(seed: int, n: int, limit: int):
+    """Pares de fracciones irreducibles (den > 0), con y sin las tablas de valores pequeños"""
+    rng = random.Random(seed)
+    for _ in range(n):
+        top = rng.choice((_SMALL_FRACTION_LIMIT, limit))
+        first = Fraction(rng.randint(-top, top), rng.randint(1, top))
+        second = Fraction(rng.randint(-top, top), rng.randint(1, top))
+        yield first, second
+
+def _pair(value: Fraction):
+    return value.numerator, value.denominator
+
+@pytest.mark.parametrize('limit', [10, 10 ** 6, 10 ** 30])
+def test_pair_arithmetic_matches_fraction(limit):
+    for first, second in _random_fractions(limit, 2000, limit):
+        args = _pair(first) + _pair(second)
+        assert _frac_add(*args) == _pair(first + second)
+        assert _frac_sub(*args) == _pair(first - second)
+        assert _frac_mul(*args) == _pair(first * second)
+        assert _frac_compare(*args) == (first > second) - (first < second)
+        if second:
+            assert _frac_div(*args) == _pair(first / second)
+
+def test_normalize_matches_fraction():
+    rng = random.Random(1)
+    for _ in range(2000):
+        num, den = rng.randint(-300, 300), rng.randint(1, 300)
+        assert _frac_normalize(num, den) == _pair(Fraction(num, den))
+
+@pytest.mark.parametrize('answer', ['3/4', '6/8', '-3/4', '0/5', '12/1', '1_000/3', ' 7/2 ', '5', '-2',
+                                    '0.75', '1e-3', 4, -7, 0.5, Fraction(5, 10)])
+def test_parse_fraction_matches_fraction(answer):
+    num, den = _parse_fraction(answer)
+    assert Fraction(num, den) == Fraction(answer)
+
+@pytest.mark.parametrize('answer', ['1/0', '1/2/3', 'a/b', '/', '3/', '1.5/2', '', 'tres', None, [1, 2],
+                                    float('nan'), float('inf')])
+def test_parse_fraction_rejects_invalid_answers(answer):
+    assert _parse_fraction(answer) is None
+
+def test_fraction_exercises_accept_equivalent_answers():
+    engine = MathEngine(seed=5)
+    weights = {'suma_fracciones': 1, 'resta_fracciones': 1, 'multiplicacion_fracciones': 1,
+               'division_fracciones': 1, 'simplificar_fraccion': 1}
+    for exercise in engine.generate_batch('fraccionarios', 3, n=200, weights=weights):
+        correct = exercise['correct_answer']
+        scaled = f"{correct.numerator * 3}/{correct.denominator * 3}"
+        assert engine.check_answer('fraccionarios', exercise['id'], scaled)['correct']
+        wrong = f"{correct.numerator + 1}/{correct.denominator}"
+        assert not engine.check_answer('fraccionarios', exercise['id'], wrong)['correct']
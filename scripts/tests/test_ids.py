@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from math_engine import ExerciseIdAllocator, ExerciseStore, MathEngine, ShardedExerciseStore
+
+def test_ids_are_unique_and_carry_the_node_prefix():
+    allocator = ExerciseIdAllocator(node_id=0xABC)
+    assert allocator.node == '0000000abc'
+    ids = [allocator.next_id('fr') for _ in range(300)] + allocator.next_ids('fr', 300)
+    assert len(set(ids)) == 600
+    assert all(exercise_id.startswith('fr_0000000abc') for exercise_id in ids)
+    assert ids[:3] == ['fr_0000000abc0', 'fr_0000000abc1', 'fr_0000000abc2']
+    assert ids[300] == 'fr_0000000abc12c'
+
+def test_ids_never_repeat_across_node_prefixes():
+    # El prefijo tiene ancho fijo: ni un contador largo alcanza el espacio de otro nodo
+    allocators = [ExerciseIdAllocator(node_id) for node_id in (0, 1, 0x10, (1 << 40) - 1)]
+    for allocator in allocators:
+        allocator.next_ids('cn', 5000)
+    ids = [exercise_id for allocator in allocators for exercise_id in allocator.next_ids('cn', 500)]
+    assert len(set(ids)) == len(ids)
+    assert ExerciseIdAllocator().node != ExerciseIdAllocator().node
+
+@pytest.mark.parametrize('node_id', [-1, 1 << 40])
+def test_rejects_node_ids_outside_40_bits(node_id):
+    with pytest.raises(ValueError):
+        ExerciseIdAllocator(node_id)
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="requiere os.fork")
+def test_child_process_gets_a_new_node_prefix():
+    allocator = ExerciseIdAllocator()
+    allocator.next_ids('np', 10)
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read)
+            ids = [allocator.node] + allocator.next_ids('np', 100)
+            os.write(write, '\n'.join(ids).encode())
+        finally:
+            os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as handle:
+        child_node, *child_ids = handle.read().split('\n')
+    os.waitpid(pid, 0)
+    
+    parent_ids = allocator.next_ids('np', 100)
+    assert child_node != allocator.node
+    assert child_ids[0] == f"np_{child_node}0"
+    assert not set(child_ids) & set(parent_ids)
+
+@pytest.mark.parametrize('store', [ExerciseStore(capacity=1000, ttl=None),
+                                   ShardedExerciseStore(capacity=1000, ttl=None, shards=4)])
+def test_store_counts_id_collisions(store):
+    # Dos motores con el mismo node_id sobre un almacén compartido repiten ids
+    first, second = (MathEngine(store=store, node_id=7) for _ in range(2))
+    first.generate_batch('fraccionarios', 1, n=10)
+    second.generate_exercise('fraccionarios', 1)
+    second.generate_batch('fraccionarios', 1, n=4)
+    assert store.stats()['collisions'] == 5
+    
+    MathEngine(store=store, node_id=8).generate_batch('fraccionarios', 1, n=10)
+    assert store.stats()['collisions'] == 5
@@ -0,0 +1,23 @@
+from math_engine import ExerciseMemo, MathEngine
+
+def test_stats_count_hits_misses_and_size_per_type():
+    engine = MathEngine(seed=7, memo=ExerciseMemo(size=4))
+    for _ in range(200):
+        engine.generate_exercise('numeros_primos', 1)
+    
+    stats = engine.memo_metrics()
+    assert stats['hits'] + stats['misses'] == 200 and stats['hits'] > 0
+    for entry in stats['types'].values():
+        assert entry['size'] <= entry['limit'] == 4
+        assert entry['size'] <= entry['misses']
+    # lru_cache no cuenta los desalojos: el campo no se publica
+    assert 'evictions' not in stats and not any('evictions' in entry for entry in stats['types'].values())
+
+def test_prometheus_exports_memo_series_without_evictions():
+    engine = MathEngine(seed=7, memo=True, metrics=True)
+    exercise = engine.generate_exercise('fraccionarios', 1)
+    engine.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])
+    
+    text = engine.metrics_prometheus()
+    assert 'mathmaster_memo_hits_total{' in text and 'mathmaster_memo_size{' in text
+    assert 'memo_evictions' not in text
@@ -0,0 +1,110 @@
+import re
+
+import pytest
+
+from math_engine import EngineMetrics, MathEngine
+
+_NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+_SAMPLE = re.compile(rf'^({_NAME})(?:\{{(.*)\}})? (\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"(?:,|$)')
+_UNESCAPE = {'\\\\': '\\', '\\"': '"', '\\n': '\n'}
+
+def _parse_prometheus(text: str):
+    """Valida el formato de texto 0.0.4 y devuelve (tipos por familia, muestras (nombre, etiquetas, valor))"""
+    assert text.endswith('\n')
+    helps, types, samples = set(), {}, []
+    for line in text[:-1].split('\n'):
+        if line.startswith('# HELP '):
+            name = line.split(' ')[2]
+            assert re.fullmatch(_NAME, name) and name not in helps and name not in types, line
+            helps.add(name)
+        elif line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name in helps and name not in types, line
+            assert kind in ('counter', 'gauge', 'histogram', 'summary', 'untyped'), line
+            types[name] = kind
+        else:
+            match = _SAMPLE.match(line)
+            assert match, line
+            name, rendered, value = match.groups()
+            if name not in types:
+                assert types.get(re.sub(r'_(bucket|sum|count)$', '', name)) == 'histogram', line
+            labels = {}
+            if rendered is not None:
+                position = 0
+                for label in _LABEL.finditer(rendered):
+                    assert label.start() == position and label.group(1) not in labels, line
+                    labels[label.group(1)] = re.sub(r'\\[\\"n]', lambda m: _UNESCAPE[m.group()], label.group(2))
+                    position = label.end()
+                assert position == len(rendered), line
+            samples.append((name, labels, float(value)))
+    return types, samples
+
+def _engine() -> MathEngine:
+    engine = MathEngine(seed=1, metrics=True, store_capacity=100, store_shards=1)
+    exercises = [engine.generate_exercise('fraccionarios', 1) for _ in range(3)]
+    engine.check_answer('fraccionarios', exercises[0]['id'], exercises[0]['correct_answer'])
+    engine.check_answer('fraccionarios', exercises[1]['id'], 'mal')
+    engine.check_answer('fraccionarios', 'fr_desconocido', 1)
+    return engine
+
+def test_snapshot_counts_calls_outcomes_and_errors():
+    engine = _engine()
+    snapshot = engine.metrics_snapshot()
+    
+    assert snapshot['buckets'] == list(EngineMetrics.BUCKETS)
+    assert sum(entry['count'] for entry in snapshot['generate']) == 3
+    assert sum(entry['count'] for entry in snapshot['check']) == 2
+    for entry in snapshot['generate'] + snapshot['check']:
+        assert entry['topic'] == 'fraccionarios' and entry['difficulty'] == 1
+        assert len(entry['buckets']) == len(EngineMetrics.BUCKETS) + 1
+        assert sum(entry['buckets']) == entry['count']
+        assert entry['mean_us'] == pytest.approx(entry['seconds'] / entry['count'] * 1e6)
+    outcomes = [entry['outcomes'] for entry in snapshot['check']]
+    assert sum(outcome['correct'] for outcome in outcomes) == 1
+    assert sum(outcome['incorrect'] for outcome in outcomes) == 1
+    assert snapshot['check_errors'] == [{'topic': 'fraccionarios', 'reason': 'not_found', 'count': 1}]
+    assert snapshot['store']['size'] == 3 and snapshot['pool'] == {} and snapshot['memo'] == {}
+    
+    engine.metrics.reset()
+    assert engine.metrics.snapshot() == {'generate': [], 'check': [], 'check_errors': [],
+                                         'buckets': list(EngineMetrics.BUCKETS)}
+
+def test_prometheus_text_format():
+    engine = _engine()
+    types, samples = _parse_prometheus(engine.metrics_prometheus())
+    
+    assert types['mathmaster_generate_seconds'] == types['mathmaster_check_seconds'] == 'histogram'
+    assert types['mathmaster_check_results_total'] == types['mathmaster_store_hits_total'] == 'counter'
+    assert types['mathmaster_store_size'] == 'gauge'
+    
+    # Cada histograma: límites crecientes, cuentas acumuladas y +Inf igual a _count
+    histograms = {}
+    for name, labels, value in samples:
+        if name.endswith('_bucket'):
+            key = (name[:-len('_bucket')], tuple(sorted((k, v) for k, v in labels.items() if k != 'le')))
+            histograms.setdefault(key, []).append((float(labels['le']), value))
+    counts = {(name[:-len('_count')], tuple(sorted(labels.items()))): value
+              for name, labels, value in samples if name.endswith('_seconds_count')}
+    assert len(histograms) == len(counts) >= 2
+    for key, buckets in histograms.items():
+        bounds = [bound for bound, _ in buckets]
+        assert bounds == sorted(bounds) and bounds[-1] == float('inf')
+        assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+        assert buckets[-1][1] == counts[key]
+    
+    results = {(labels['result'], value) for name, labels, value in samples if name == 'mathmaster_check_results_total'}
+    assert ('correct', 1) in results and ('incorrect', 1) in results
+    assert ('mathmaster_check_errors_total', {'topic': 'fraccionarios', 'reason': 'not_found'}, 1) in samples
+
+def test_prometheus_escapes_label_values_and_honours_prefix():
+    metrics = EngineMetrics(buckets=(0.5, 0.001))
+    metrics.observe_check_error('tema "raro"', 'ruta\\con\nsalto')
+    metrics.observe_generate('fraccionarios', 'suma_fracciones', 2, 0.01)
+    text = metrics.to_prometheus(prefix='mm')
+    
+    types, samples = _parse_prometheus(text)
+    assert set(types) == {'mm_generate_seconds', 'mm_check_seconds', 'mm_check_results_total', 'mm_check_errors_total'}
+    assert ('mm_check_errors_total', {'topic': 'tema "raro"', 'reason': 'ruta\\con\nsalto'}, 1) in samples
+    buckets = [(labels['le'], value) for name, labels, value in samples if name == 'mm_generate_seconds_bucket']
+    assert buckets == [('0.001', 0), ('0.5', 1), ('+Inf', 1)]
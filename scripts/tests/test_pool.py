@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from math_engine import ExercisePool, MathEngine
+
+class Producer:
+    """Productor numerado: cada elemento es (tema, dificultad, número de orden)"""
+    
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+        self._next = 0
+    
+    def __call__(self, topic, difficulty, count):
+        self.calls.append(count)
+        if self.fail:
+            raise RuntimeError("generador roto")
+        with self._lock:
+            start, self._next = self._next, self._next + count
+        return [(topic, difficulty, i) for i in range(start, start + count)]
+
+def _until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "la condición no se cumplió a tiempo"
+        time.sleep(0.001)
+
+def test_take_counts_hits_and_misses_without_background_refill():
+    producer = Producer()
+    pool = ExercisePool(producer, size=6, refill_batch=4, background=False)
+    assert pool.take('fraccionarios', 1) is None
+    
+    pool.warm('fraccionarios', 1)
+    assert producer.calls == [4, 2]
+    assert [pool.take('fraccionarios', 1) for _ in range(6)] == [('fraccionarios', 1, i) for i in range(6)]
+    assert pool.take('fraccionarios', 1) is None
+    
+    stats = pool.stats()
+    assert stats['queues']['fraccionarios:1'] == {'ready': 0, 'hits': 6, 'misses': 2, 'refilled': 6}
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (6, 2, 0.75)
+    assert stats['low_water'] == 1 and stats['errors'] == 0
+
+def test_background_refill_below_low_water():
+    producer = Producer()
+    pool = ExercisePool(producer, size=8, low_water=4, refill_batch=3, refill_interval=0)
+    try:
+        assert pool.take('numeros_primos', 2) is None
+        _until(lambda: pool.stats()['queues']['numeros_primos:2']['ready'] == 8)
+        
+        # Por encima de low_water no se repone
+        for _ in range(4):
+            assert pool.take('numeros_primos', 2) is not None
+        time.sleep(0.02)
+        assert pool.stats()['queues']['numeros_primos:2']['ready'] == 4
+        
+        pool.take('numeros_primos', 2)
+        _until(lambda: pool.stats()['queues']['numeros_primos:2']['ready'] == 8)
+        queue = pool.stats()['queues']['numeros_primos:2']
+        assert (queue['hits'], queue['misses'], queue['refilled']) == (5, 1, 13)
+        assert max(producer.calls) <= 3
+    finally:
+        pool.close(timeout=5)
+
+def test_producer_errors_are_counted_and_take_falls_back():
+    pool = ExercisePool(Producer(fail=True), size=4, refill_interval=0)
+    try:
+        assert pool.take('fraccionarios', 1) is None
+        _until(lambda: pool.stats()['errors'] >= 1)
+        assert pool.take('fraccionarios', 1) is None
+    finally:
+        pool.close(timeout=5)
+
+def test_closed_pool_keeps_serving_without_refilling():
+    producer = Producer()
+    pool = ExercisePool(producer, size=4, refill_interval=0)
+    pool.warm('fraccionarios', 3)
+    pool.close(timeout=5)
+    calls = len(producer.calls)
+    assert [pool.take('fraccionarios', 3) for _ in range(5)][-1] is None
+    time.sleep(0.02)
+    assert len(producer.calls) == calls
+
+def test_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        ExercisePool(Producer(), size=0)
+
+@pytest.mark.parametrize('stateless', [False, True])
+def test_engine_serves_gradable_exercises_from_the_pool(stateless):
+    options = {'stateless': True, 'secret_key': 'clave'} if stateless else {}
+    engine = MathEngine(pool_size=16, pool_refill_interval=0, **options)
+    try:
+        engine.pool.warm('fraccionarios', 2)
+        exercises = [engine.generate_exercise('fraccionarios', 2) for _ in range(10)]
+        for exercise in exercises:
+            assert engine.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])['correct']
+        assert len({exercise['id'] for exercise in exercises}) == 10
+        queue = engine.pool_metrics()['queues']['fraccionarios:2']
+        assert queue['hits'] == 10 and queue['misses'] == 0
+        # Otro idioma no pasa por la reserva (guarda textos en el idioma del motor)
+        engine.generate_exercise('fraccionarios', 2, locale='en')
+        assert engine.pool_metrics()['queues']['fraccionarios:2']['hits'] == 10
+    finally:
+        engine.close()
@@ -0,0 +1,90 @@
+import pytest
+
+from math_engine import PRIME_ORACLE, PrimeOracle
+
+def _trial_factors(n: int):
+    """Factorización por división de prueba, como referencia"""
+    factors, p = [], 2
+    while p * p <= n:
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+        p += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+def _next_prime(n: int) -> int:
+    while len(_trial_factors(n)) != 1:
+        n += 1
+    return n
+
+@pytest.fixture
+def oracle():
+    # Tabla pequeña: por encima de 2048 se usan Miller-Rabin y Pollard rho
+    return PrimeOracle(bound=1000, max_bound=2048)
+
+def test_matches_trial_division_up_to_5000(oracle):
+    for n in range(-2, 5001):
+        factors = _trial_factors(n) if n >= 2 else []
+        assert oracle.factorize(n) == factors, n
+        assert oracle.is_prime(n) == (len(factors) == 1), n
+        if n >= 1:
+            assert oracle.divisors(n) == [d for d in range(1, n + 1) if n % d == 0], n
+    assert oracle.bound == 2048
+
+def test_sieve_grows_on_demand_up_to_max_bound(oracle):
+    assert oracle.bound == -1  # la primera criba se difiere hasta la primera consulta
+    oracle.ensure(10)
+    assert oracle.bound == 1000
+    oracle.ensure(1500)
+    assert oracle.bound == 2000
+    oracle.ensure(10 ** 9)
+    assert oracle.bound == 2048
+    assert oracle.is_prime(2039) and not oracle.is_prime(2047)
+
+@pytest.mark.parametrize('p', [2053, 65537, 1000003, 4194319])
+def test_squares_of_primes_above_the_bound(oracle, p):
+    assert _next_prime(p) == p
+    assert oracle.factorize(p * p) == [p, p]
+    assert oracle.factor_exponents(p * p) == [(p, 2)]
+    assert oracle.divisors(p * p) == [1, p, p * p]
+    assert oracle.is_prime(p) and not oracle.is_prime(p * p)
+    assert PRIME_ORACLE.factorize(p * p) == [p, p]
+
+@pytest.mark.parametrize('factors', [
+    [1000000007, 1000000009],
+    [2147483647, 2305843009213693951],
+    [999999937, 999999937, 1000000007],
+    [2, 3, 3, 4294967291, 4294967311],
+])
+def test_large_semiprimes(oracle, factors):
+    n = 1
+    for p in factors:
+        n *= p
+    assert oracle.factorize(n) == factors
+    assert not oracle.is_prime(n)
+    assert all(oracle.is_prime(p) for p in factors)
+
+@pytest.mark.parametrize('n, factors', [
+    (2047, [23, 89]),
+    (1373653, [829, 1657]),
+    (25326001, [2251, 11251]),
+    (3215031751, [151, 751, 28351]),
+    (2152302898747, [6763, 10627, 29947]),
+    (3474749660383, [1303, 16927, 157543]),
+    (341550071728321, [10670053, 32010157]),
+    (3825123056546413051, [149491, 747451, 34233211]),
+    # Pseudoprimo fuerte para todas las bases primas hasta 37
+    (318665857834031151167461, [399165290221, 798330580441]),
+])
+def test_strong_pseudoprimes_are_composite(oracle, n, factors):
+    assert not oracle.is_prime(n)
+    assert oracle.factorize(n) == factors
+
+def test_large_primes(oracle):
+    for p in (2 ** 31 - 1, 2 ** 61 - 1, 2 ** 89 - 1, 1000000000000000003):
+        assert oracle.is_prime(p)
+        assert oracle.factorize(p) == [p]
+    assert not oracle.is_prime(2 ** 67 - 1)
+    assert oracle.factorize(2 ** 67 - 1) == [193707721, 761838257287]
@@ -0,0 +1,79 @@
+import io
+import re
+import time
+
+import pytest
+
+from math_engine import EngineProfiler, MathEngine
+
+# Pila plegada: operación;tema;tipo;dN;marco;...;marco peso
+_LINE = re.compile(r'^(generate|check);([a-z_]+);([a-z_0-9]+);d([123]);(.+) (\d+)$')
+
+def _busy(seconds: float):
+    time.sleep(seconds)
+
+def test_cprofile_collapsed_stacks():
+    profiler = EngineProfiler(rate=1, mode='cprofile', seed=0)
+    engine = MathEngine(seed=1, profile=profiler)
+    for _ in range(5):
+        exercise = engine.generate_exercise('fraccionarios', 2)
+        engine.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])
+    
+    text = profiler.collapsed()
+    assert text.endswith('\n')
+    lines = text[:-1].split('\n')
+    operations = set()
+    for line in lines:
+        match = _LINE.match(line)
+        assert match, line
+        operation, topic, _, difficulty, stack, weight = match.groups()
+        assert topic == 'fraccionarios' and difficulty == '2' and int(weight) > 0
+        assert all(frame for frame in stack.split(';'))
+        operations.add(operation)
+    assert operations == {'generate', 'check'}
+    assert any('_generate_exercise (math_engine.py:' in line for line in lines)
+    
+    checks = profiler.collapsed(operation='check')
+    assert checks and all(line.startswith('check;') for line in checks.splitlines())
+    assert profiler.collapsed(topic='numeros_primos') == ''
+    
+    handle = io.StringIO()
+    assert profiler.dump(handle, operation='check') == len(checks.splitlines())
+    assert handle.getvalue() == checks
+    
+    summary = profiler.summary()
+    assert sum(row['calls'] for row in summary) == 10
+    assert [row['mean_us'] for row in summary] == sorted((row['mean_us'] for row in summary), reverse=True)
+    row = summary[0]
+    assert profiler.stats(row['operation'], row['topic'], row['type'], row['difficulty']) is not None
+    
+    profiler.reset()
+    assert profiler.collapsed() == '' and profiler.summary() == []
+
+def test_sample_mode_collapses_the_stack_below_the_caller():
+    profiler = EngineProfiler(rate=1, mode='sample', interval=0.001)
+    try:
+        session = profiler.start()
+        _busy(0.1)
+        profiler.stop(session, 'generate', 'fraccionarios', 'suma_fracciones', 1)
+    finally:
+        profiler.close()
+    
+    lines = profiler.collapsed().splitlines()
+    assert len(lines) == 1
+    prefix, weight = lines[0].rsplit(' ', 1)
+    assert re.fullmatch(r'generate;fraccionarios;suma_fracciones;d1;_busy \(test_profiler\.py:\d+\)', prefix)
+    assert int(weight) >= 5
+    assert profiler.summary()[0]['samples'] == int(weight)
+
+def test_rate_zero_never_profiles():
+    profiler = EngineProfiler(rate=0)
+    assert profiler.start() is None
+    engine = MathEngine(profile=profiler)
+    engine.generate_exercise('fraccionarios', 1)
+    assert profiler.summary() == [] and profiler.collapsed() == ''
+
+@pytest.mark.parametrize('options', [{'mode': 'trace'}, {'rate': 1.5}, {'rate': -0.1}, {'interval': 0}])
+def test_rejects_invalid_options(options):
+    with pytest.raises(ValueError):
+        EngineProfiler(**options)
@@ -0,0 +1,51 @@
+import pytest
+
+from math_engine import MathEngine
+
+TOPICS = ('conjuntos_numericos', 'numeros_primos', 'fraccionarios', 'potenciacion_radicacion')
+
+def _without_id(exercises):
+    """Ejercicios sin el id, que cambia de un motor a otro (contador o token con su emisión)"""
+    return [{key: value for key, value in exercise.items() if key != 'id'} for exercise in exercises]
+
+def _engine(stateless: bool, **options) -> MathEngine:
+    if stateless:
+        return MathEngine(stateless=True, secret_key='clave', **options)
+    return MathEngine(**options)
+
+@pytest.mark.parametrize('stateless', [False, True])
+@pytest.mark.parametrize('topic', TOPICS)
+def test_seeded_batch_is_reproducible(topic, stateless):
+    first = _engine(stateless).generate_batch(topic, 2, 5, seed=7)
+    second = _engine(stateless).generate_batch(topic, 2, 5, seed=7)
+    assert _without_id(first) == _without_id(second)
+    assert _without_id(first) != _without_id(_engine(stateless).generate_batch(topic, 2, 5, seed=8))
+
+@pytest.mark.parametrize('stateless', [False, True])
+def test_seeded_session_is_reproducible(stateless):
+    engines = [_engine(stateless, seed=11) for _ in range(2)]
+    sessions = [[engine.generate_exercise(topic, difficulty) for topic in TOPICS for difficulty in (1, 2, 3)]
+                + engine.generate_batch('fraccionarios', 3, 4) for engine in engines]
+    assert _without_id(sessions[0]) == _without_id(sessions[1])
+
+def test_stateless_seeded_batch_grades_by_token():
+    engine = _engine(True)
+    other = _engine(True)
+    for exercise in engine.generate_batch('fraccionarios', 2, 5, seed=7):
+        assert other.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])['correct']
+
+@pytest.mark.parametrize('topic', TOPICS)
+def test_replay_exercise_matches_the_session(topic):
+    engine = MathEngine(seed=5)
+    session = [engine.generate_exercise(topic, 2) for _ in range(6)]
+    replayer = MathEngine(seed=5)
+    for index in (0, 3, 5):
+        replayed = replayer.replay_exercise(topic, 2, index)
+        assert replayed['id'] != session[index]['id']
+        assert _without_id([replayed]) == _without_id([session[index]])
+
+def test_replay_exercise_requires_seed_and_state():
+    with pytest.raises(ValueError):
+        MathEngine().replay_exercise('fraccionarios', 1, 0)
+    with pytest.raises(ValueError):
+        _engine(True, seed=5).replay_exercise('fraccionarios', 1, 0)
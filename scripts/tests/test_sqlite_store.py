@@ -0,0 +1,76 @@
+import atexit
+
+from math_engine import MathEngine, SQLiteExerciseStore, _generate_topic_records
+
+def test_exercises_survive_close_and_reopen(tmp_path):
+    path = tmp_path / 'exercises.db'
+    engine = MathEngine(store_path=str(path))
+    exercises = [engine.generate_exercise(topic, 2) for topic in ('fraccionarios', 'numeros_primos', 'potenciacion_radicacion')]
+    engine.close()
+    
+    reopened = MathEngine(store_path=str(path))
+    try:
+        assert reopened.store.stats()['pending'] == 0
+        for topic, exercise in zip(('fraccionarios', 'numeros_primos', 'potenciacion_radicacion'), exercises):
+            assert reopened.check_answer(topic, exercise['id'], exercise['correct_answer'])['correct']
+        assert reopened.store.disk_reads == 3
+    finally:
+        reopened.close()
+
+def test_reads_see_unflushed_writes(tmp_path):
+    # Caché de un registro y sin confirmar: el primero solo queda en lo pendiente
+    store = SQLiteExerciseStore(tmp_path / 'exercises.db', cache_size=1, flush_interval=60.0)
+    engine = MathEngine(store=store)
+    try:
+        first = engine.generate_exercise('fraccionarios', 1)
+        second = engine.generate_exercise('fraccionarios', 1)
+        assert store.stats()['pending'] == 2 and store.flushes == 0
+        
+        assert engine.check_answer('fraccionarios', first['id'], first['correct_answer'])['correct']
+        assert engine.check_answer('fraccionarios', second['id'], second['correct_answer'])['correct']
+        assert store.disk_reads == 0
+        # Sin desalojos ni capacidad: lo que sale de la caché sigue en disco
+        assert 'evictions' not in store.stats() and 'capacity' not in store.stats()
+    finally:
+        engine.close()
+    assert store.flushed == 2
+
+def test_put_many_counts_collisions_outside_the_cache(tmp_path):
+    store = SQLiteExerciseStore(tmp_path / 'exercises.db', cache_size=1, flush_interval=60.0)
+    engine = MathEngine(store=store)
+    try:
+        records = _generate_topic_records(engine.topics['fraccionarios'], 1, 2, None, None)
+        store.put_many(records)
+        # El primero salió de la caché pero sigue pendiente; después, en el lote que se confirma
+        store.put_many(records[:1])
+        assert store.collisions == 1
+        
+        store._flushing, store._pending = store._pending, {}
+        store.put(records[1].id, records[1])
+        store.put_many(records[:1])
+        assert store.collisions == 3
+    finally:
+        engine.close()
+
+def test_clear_drops_the_batch_being_flushed(tmp_path):
+    store = SQLiteExerciseStore(tmp_path / 'exercises.db', cache_size=1, flush_interval=60.0)
+    engine = MathEngine(store=store)
+    try:
+        record, = _generate_topic_records(engine.topics['fraccionarios'], 1, 1, None, None)
+        store.put_many([record])
+        store._flushing, store._pending = store._pending, {}
+        store._cache.clear()
+        assert record.id in store
+        
+        store.clear()
+        assert record.id not in store and len(store) == 0
+    finally:
+        engine.close()
+
+def test_close_unregisters_the_exit_handler(tmp_path, monkeypatch):
+    unregistered = []
+    monkeypatch.setattr(atexit, 'unregister', unregistered.append)
+    store = SQLiteExerciseStore(tmp_path / 'exercises.db')
+    store.close()
+    store.close()
+    assert unregistered == [store._atexit]
@@ -0,0 +1,61 @@
+from math_engine import ExerciseStore, MathEngine
+
+class FakeClock:
+    """Reloj manual para probar la caducidad sin esperar"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def test_lru_evicts_least_recently_used():
+    store = ExerciseStore(capacity=2, ttl=None)
+    store['a'] = 1
+    store['b'] = 2
+    assert store.get('a') == 1  # 'a' pasa a ser el más reciente
+    store['c'] = 3
+    
+    assert store.get('b') is None
+    assert store.get('a') == 1 and store.get('c') == 3
+    assert store.is_expired('b') and not store.is_expired('zz')
+    assert store.stats()['evictions'] == 1
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    store = ExerciseStore(capacity=10, ttl=60, clock=clock)
+    store['a'] = 1
+    clock.now += 59
+    assert 'a' in store and store.get('a') == 1
+    
+    clock.now += 1
+    assert 'a' not in store
+    assert store.get('a') is None
+    assert store.is_expired('a')
+    assert store.stats()['expirations'] == 1
+
+def test_put_many_evicts_once_for_the_block():
+    store = ExerciseStore(capacity=3, ttl=None)
+    engine = MathEngine(store=store)
+    exercises = engine.generate_batch('numeros_primos', 1, n=5)
+    
+    assert len(store) == 3
+    assert [exercise['id'] in store for exercise in exercises] == [False, False, True, True, True]
+
+def test_check_answer_reports_expired_exercise():
+    clock = FakeClock()
+    engine = MathEngine(store=ExerciseStore(capacity=100, ttl=30, clock=clock))
+    exercise = engine.generate_exercise('fraccionarios', 1)
+    clock.now += 31
+    
+    result = engine.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])
+    assert result == {'error': 'Ejercicio expirado', 'expired': True}
+    assert engine.check_answer('fraccionarios', 'fr_desconocido', 1) == {'error': 'Ejercicio no encontrado'}
+
+def test_check_answer_reports_evicted_exercise():
+    engine = MathEngine(store=ExerciseStore(capacity=1, ttl=None))
+    first = engine.generate_exercise('fraccionarios', 1)
+    second = engine.generate_exercise('fraccionarios', 1)
+    
+    assert engine.check_answer('fraccionarios', first['id'], first['correct_answer'])['expired']
+    assert engine.check_answer('fraccionarios', second['id'], second['correct_answer'])['correct']
@@ -0,0 +1,55 @@
+from fractions import Fraction
+
+import pytest
+
+from math_engine import DEFAULT_LOCALE, LazyText, MathEngine, TemplateCatalog, _text
+
+@pytest.mark.parametrize('template, values, text', [
+    ('Sin campos {{x}} al 100%', {}, 'Sin campos {x} al 100%'),
+    ('{a}', {'a': Fraction(3, 4)}, '3/4'),
+    ('{a}', {'a': (1, 2)}, '(1, 2)'),
+    ('Calcula: {a}/{b} + {a}/{c}', {'a': 1, 'b': 2, 'c': 4}, 'Calcula: 1/2 + 1/4'),
+    ('{ok:Sí|No}', {'ok': 0}, 'No'),
+    ('{xs:* × } = {n}', {'xs': [2, 2, 3], 'n': 12}, '2 × 2 × 3 = 12'),
+    ('{x:.2f}% y {y:>3}', {'x': 1.5, 'y': 7}, '1.50% y   7'),
+])
+def test_compiled_template_matches_str_format(template, values, text):
+    assert TemplateCatalog._compile(template)(values) == text
+
+@pytest.mark.parametrize('template', ['{a.b}', '{a[0]}', '{0}', '{a!r}'])
+def test_compile_rejects_unsupported_fields(template):
+    with pytest.raises(ValueError):
+        TemplateCatalog._compile(template)
+
+def test_lookup_falls_back_to_default_locale_and_parent():
+    parent = TemplateCatalog({DEFAULT_LOCALE: {'comun': 'Hola {name}'}})
+    catalog = TemplateCatalog({DEFAULT_LOCALE: {'solo_es': 'Adiós'}, 'en': {}}, parent)
+    assert catalog.render('solo_es', 'en') == 'Adiós'
+    assert catalog.render('comun', 'en', {'name': 'Ana'}) == 'Hola Ana'
+    with pytest.raises(KeyError):
+        catalog.render('no_existe')
+
+def test_compiled_template_lists_its_fields():
+    assert TemplateCatalog._compile('Sin campos').fields == frozenset()
+    assert TemplateCatalog._compile('{a}/{b} y {a:>3}').fields == {'a', 'b'}
+
+def test_render_text_only_evaluates_referenced_deferred_values():
+    calls = []
+    
+    def deferred(name):
+        return lambda: calls.append(name) or len(calls)
+    
+    catalog = TemplateCatalog({'es': {'con': 'Suma: {total}', 'sin': 'Número {n}'}})
+    assert catalog.render_text(_text('sin', {'total': deferred('sin')}, n=4), 'es') == 'Número 4'
+    assert calls == []
+    assert catalog.render_text(_text('con', {'total': deferred('con')}, n=4), 'es') == 'Suma: 1'
+    assert calls == ['con']
+
+@pytest.mark.parametrize('divisor, digit_sum', [(2, False), (3, True), (5, False), (7, False), (10, False)])
+def test_divisibility_explanation_defers_digit_sum_only_for_rule_3(divisor, digit_sum):
+    topic = MathEngine().topics['numeros_primos']
+    explanation = topic._get_divisibility_explanation(1234, divisor, False)
+    assert type(explanation) is LazyText
+    assert ('digit_sum' in explanation.deferred) == digit_sum
+    text = topic.REGISTRY.catalog.render_text(explanation, 'es')
+    assert ('Suma de cifras de 1234: 10' in text) == digit_sum
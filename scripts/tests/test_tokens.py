@@ -0,0 +1,75 @@
+import base64
+import time
+
+import pytest
+
+import math_engine
+from math_engine import ExerciseTokenCodec, InvalidTokenError, MathEngine, TokenExpiredError
+
+def _flip_byte(token: str, position: int) -> str:
+    """Token con un byte del cuerpo alterado, conservando el prefijo"""
+    prefix, encoded = token.rsplit('.', 1)
+    raw = bytearray(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+    raw[position] ^= 0x01
+    return f"{prefix}.{base64.urlsafe_b64encode(bytes(raw)).rstrip(b'=').decode('ascii')}"
+
+def test_codec_round_trip():
+    codec = ExerciseTokenCodec('clave')
+    token = codec.encode('fr', 2, 1, 3, 2 ** 64 - 1)
+    assert token.startswith('fr.')
+    assert codec.decode(token) == (2, 1, 3, 2 ** 64 - 1)
+
+@pytest.mark.parametrize('position', [0, 1, 3, 8, 15, 20, 25])
+def test_codec_rejects_tampered_tokens(position):
+    codec = ExerciseTokenCodec('clave')
+    token = codec.encode('fr', 2, 1, 3, 12345)
+    with pytest.raises(InvalidTokenError):
+        codec.decode(_flip_byte(token, position))
+
+@pytest.mark.parametrize('token', ['', 'fr.', 'fr.@@@', 'fr.AAAA', None, 42])
+def test_codec_rejects_malformed_tokens(token):
+    with pytest.raises(InvalidTokenError):
+        ExerciseTokenCodec('clave').decode(token)
+
+def test_codec_rejects_other_keys():
+    token = ExerciseTokenCodec('clave').encode('fr', 2, 1, 3, 12345)
+    with pytest.raises(InvalidTokenError):
+        ExerciseTokenCodec('otra clave').decode(token)
+
+def test_codec_expiry(monkeypatch):
+    codec = ExerciseTokenCodec('clave', ttl=60)
+    token = codec.encode('fr', 2, 1, 3, 12345)
+    now = time.time()
+    monkeypatch.setattr(math_engine.time, 'time', lambda: now + 30)
+    assert codec.decode(token) == (2, 1, 3, 12345)
+    
+    monkeypatch.setattr(math_engine.time, 'time', lambda: now + 120)
+    with pytest.raises(TokenExpiredError):
+        codec.decode(token)
+    # Sin ttl el token no caduca
+    assert ExerciseTokenCodec('clave').decode(token) == (2, 1, 3, 12345)
+
+def test_stateless_engine_grades_from_token():
+    engine = MathEngine(stateless=True, secret_key='clave')
+    exercise = engine.generate_exercise('fraccionarios', 2)
+    other = MathEngine(stateless=True, secret_key='clave')
+    assert other.check_answer('fraccionarios', exercise['id'], exercise['correct_answer'])['correct']
+
+def test_stateless_engine_rejects_tampered_and_expired_tokens(monkeypatch):
+    engine = MathEngine(stateless=True, secret_key='clave', token_ttl=60)
+    exercise = engine.generate_exercise('numeros_primos', 1)
+    
+    tampered = _flip_byte(exercise['id'], 10)
+    assert engine.check_answer('numeros_primos', tampered, exercise['correct_answer']) == {'error': 'Token inválido'}
+    
+    now = time.time()
+    monkeypatch.setattr(math_engine.time, 'time', lambda: now + 120)
+    assert engine.check_answer('numeros_primos', exercise['id'], exercise['correct_answer']) == {
+        'error': 'Ejercicio expirado', 'expired': True}
+
+def test_stateless_engine_rejects_tokens_from_another_topic():
+    engine = MathEngine(stateless=True, secret_key='clave')
+    exercise = engine.generate_exercise('fraccionarios', 1)
+    for topic in ('numeros_primos', 'conjuntos_numericos', 'potenciacion_radicacion'):
+        assert engine.check_answer(topic, exercise['id'], exercise['correct_answer']) == {
+            'error': 'Ejercicio no encontrado'}